@@ -61,11 +61,15 @@ def quantum_similarity(a, b):
 # -------------------------------------------------
 # 4. Results
 # -------------------------------------------------
+# All pairwise fidelities at once: one complex matrix product of the stacked wavefunctions
+psi_matrix = np.stack([embeddings[w] for w in words])
+fidelity_matrix = np.abs(psi_matrix.conj() @ psi_matrix.T * (20.0 / psi_matrix.shape[1])) ** 2
+
 print("\n" + "="*60)
 print("Quantum semantic similarity (higher = more similar via field overlap)")
 print("="*60)
-for w in words:
-    scores = [(o, quantum_similarity(w, o)) for o in words if o != w]
+for i, w in enumerate(words):
+    scores = [(o, fidelity_matrix[i, j]) for j, o in enumerate(words) if o != w]
     scores.sort(key=lambda x: -x[1])
     top1, top2 = scores[0], scores[1]
     print(f"{w:8} → {top1[0]:8} ({top1[1]:.4f}) | {top2[0]:8} ({top2[1]:.4f})")
@@ -85,7 +89,7 @@ if len(words) >= 2:
     ax1.legend()
     
     # Fidelity visualization (bar chart)
-    sims = [quantum_similarity("cat", o) for o in words if o != "cat"]
+    sims = [fidelity_matrix[words.index("cat"), j] for j, o in enumerate(words) if o != "cat"]
     ax2.bar(range(len(words)-1), sims)
     ax2.set_title("Fidelity from 'cat'")
     ax2.set_xticks(range(len(words)-1))
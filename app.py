@@ -2,20 +2,54 @@
 FastAPI application for Quantum Embedding Visualization
 Provides REST API endpoints for quantum embedding operations
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+from typing import List, Optional, Dict, Any, Literal, Tuple
+import asyncio
+import codecs
+import json
 import os
+import struct
 
+from compression import CompressionMiddleware, Compressor
+from corpus_scoring import CorpusScorer
+from executor import ExecutorOverloaded, ServiceExecutor, SingleFlight
+from metrics import Metrics, MetricsMiddleware, render_counter, render_gauge, stage
 from pattern_embedding_service import PatternEmbeddingService
+from response_cache import ResponseCache
+from space_lod import MAX_LEVEL
+from space_session import SessionFull, SpaceSession, apply_update
+from static_assets import StaticAssets
+from wavefunction_codec import BINARY_MEDIA_TYPE, encode_binary, to_jsonable, wants_binary
+
+cache_flush_interval = float(os.environ.get("CACHE_FLUSH_INTERVAL", "60"))
+
+async def flush_cache_periodically():
+    """Persist newly computed parameters every cache_flush_interval seconds."""
+    while True:
+        await asyncio.sleep(cache_flush_interval)
+        await asyncio.to_thread(service.flush_cache)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the periodic cache flush and flush once more on shutdown."""
+    flush_task = asyncio.create_task(flush_cache_periodically()) if cache_flush_interval > 0 else None
+    try:
+        yield
+    finally:
+        if flush_task is not None:
+            flush_task.cancel()
+        executor.shutdown()
+        service.flush_cache()
 
 app = FastAPI(
     title="Quantum Embedding Visualization API",
     description="API for quantum semantic embeddings based on PATTERN3.py",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend access
@@ -27,29 +61,209 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve static files
+# gzip/brotli for clients that accept it, on responses of at least COMPRESSION_MIN_SIZE bytes
+compressor = Compressor(
+    gzip_level=int(os.environ.get("GZIP_LEVEL", "1")),
+    brotli_quality=int(os.environ.get("BROTLI_QUALITY", "1")),
+    minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+) if os.environ.get("COMPRESSION", "1") == "1" else None
+if compressor is not None:
+    app.add_middleware(CompressionMiddleware, compressor=compressor)
+
+# Request latency and per-stage timing, exposed on /metrics
+metrics = Metrics()
+app.add_middleware(
+    MetricsMiddleware,
+    metrics=metrics,
+    server_timing=os.environ.get("SERVER_TIMING", "0") == "1"
+)
+
+# Static files, read and precompressed once and served from memory
 static_dir = os.path.join(os.path.dirname(__file__), "static")
+static_assets = StaticAssets(
+    static_dir,
+    compressor=compressor or Compressor(),
+    max_age=int(os.environ.get("STATIC_MAX_AGE", "3600"))
+)
 if os.path.exists(static_dir):
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    static_assets.load()
 
 # Initialize the service
-service = PatternEmbeddingService()
+cache_dir = os.environ.get("EMBEDDINGS_CACHE_DIR", os.path.dirname(os.path.abspath(__file__)))
+index_type = os.environ.get("SIMILARITY_INDEX", "kdtree") or None
+service = PatternEmbeddingService(
+    glove_file=os.environ.get("GLOVE_FILE", os.path.join(cache_dir, "glove-wiki-gigaword-300.kv")),
+    lazy=os.environ.get("GLOVE_LAZY", "0") == "1",
+    cache_file=os.path.join(cache_dir, "parameter_cache.npy"),
+    cache_max_bytes=int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    precision=os.environ.get("WAVEFUNCTION_PRECISION", "double"),
+    shared_store_file=os.path.join(cache_dir, "shared_parameters.npy") if os.environ.get("SHARED_STORE", "1") == "1" else None,
+    shared_store_capacity=int(os.environ.get("SHARED_STORE_CAPACITY", str(1 << 18))),
+    build_lock_file=os.path.join(cache_dir, ".build.lock"),
+    parameter_table_file=os.path.join(cache_dir, "glove_parameters.npy"),
+    knn_graph_file=os.environ.get("KNN_GRAPH", os.path.join(cache_dir, "knn_graph")) or None,
+    subword_file=os.path.join(cache_dir, "oov_subwords.npy"),
+    subword_buckets=int(os.environ.get("OOV_NGRAM_BUCKETS", str(1 << 16))),
+    subword_vocab_size=int(os.environ.get("OOV_NGRAM_WORDS", "100000")),
+    index_type=index_type,
+    index_file=os.path.join(cache_dir, f"similarity_index_{index_type}.npz") if index_type else None,
+    index_options={
+        "min_fidelity": float(os.environ.get("SIMILARITY_INDEX_MIN_FIDELITY", "1e-6")),
+        "recall_sample_rate": float(os.environ.get("SIMILARITY_INDEX_RECALL_SAMPLE_RATE", "0.01")),
+        "max_added": int(os.environ.get("SIMILARITY_INDEX_MAX_ADDED", "4096"))
+    }
+)
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """Parse "endpoint=limit,endpoint=limit" into a dictionary."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
+
+# CPU-bound service calls run on a thread pool so they never block the event loop
+executor = ServiceExecutor(
+    max_workers=int(os.environ.get("SERVICE_WORKERS", "4")),
+    default_limit=int(os.environ.get("ENDPOINT_CONCURRENCY", "4")),
+    limits=parse_limits(os.environ.get("ENDPOINT_LIMITS", "similar=2,embeddings_batch=1,embeddings_stream=2")),
+    max_queue=int(os.environ["ENDPOINT_MAX_QUEUE"]) if os.environ.get("ENDPOINT_MAX_QUEUE") else None
+)
+
+# Concurrent requests for the same word or word pair share one computation
+single_flight = SingleFlight()
+
+# Pre-serialized responses of deterministic endpoints, with ETags
+response_cache_max_bytes = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+response_cache = ResponseCache(
+    max_bytes=response_cache_max_bytes,
+    max_age=int(os.environ.get("RESPONSE_CACHE_MAX_AGE", "3600")),
+    compressor=compressor
+) if response_cache_max_bytes > 0 else None
+
+# Largest number of words one WebSocket session may hold
+session_max_words = int(os.environ.get("SESSION_MAX_WORDS", "10000"))
 
 # Request/Response models
 class WordRequest(BaseModel):
     word: str
+    num_samples: Optional[int] = Field(default=None, ge=2)
+    params_only: bool = False
 
 class WordsRequest(BaseModel):
     words: List[str]
 
+class StreamWordsRequest(BaseModel):
+    words: List[str]
+    chunk_size: int = Field(default=256, gt=0, le=10000)
+    num_samples: Optional[int] = Field(default=None, ge=2)
+    params_only: bool = False
+
+class SimilarityMatrixRequest(BaseModel):
+    words: List[str]
+    output: Literal["dense", "upper", "sparse"] = "dense"
+    threshold: float = Field(default=0.0, ge=0.0, le=1.0)
+    block_size: int = Field(default=1024, gt=0)
+
 class SimilarWordsRequest(BaseModel):
     word: str
     top_k: int = 10
     exclude_words: Optional[List[str]] = None
+    scope: Literal["cache", "vocabulary", "index", "graph"] = "cache"
+    block_size: Optional[int] = Field(default=None, gt=0)
 
 class InteractionRequest(BaseModel):
     word1: str
     word2: str
+    num_samples: Optional[int] = Field(default=None, ge=2)
+    params_only: bool = False
+
+class InteractionsBatchRequest(BaseModel):
+    pairs: List[Tuple[str, str]] = Field(max_length=10000)
+    num_samples: Optional[int] = Field(default=None, ge=2)
+    params_only: bool = False
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose content is produced while the request body is read.
+    
+    StreamingResponse normally polls receive() for a client disconnect while
+    it streams, which would take body messages away from Request.stream();
+    here only the body reader calls receive() and sees the disconnect.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def negotiate(binary: bool, payload: Dict[str, Any]) -> Response:
+    """Render a payload as binary when the client accepts it, otherwise as JSON."""
+    with stage("serialization"):
+        if binary:
+            return Response(content=encode_binary(payload), media_type=BINARY_MEDIA_TYPE)
+        return JSONResponse(content=to_jsonable(payload))
+
+def cacheable() -> bool:
+    """Whether responses can come from the response cache (parameters are deterministic once loaded)."""
+    return response_cache is not None and service.is_ready
+
+async def cached_response(http_request: Request, endpoint: str, key: tuple, compute,
+                          variant: int = 0) -> Response:
+    """
+    Serve a response from the response cache, computing and storing it on a miss.
+    
+    Args:
+        http_request: Incoming request (for If-None-Match)
+        endpoint: Executor endpoint name used on a miss
+        key: Normalized request inputs
+        compute: Synchronous callable returning the rendered Response, or a
+            list of Responses for variants of one computation
+        variant: Index of the variant to send when compute returns a list
+        
+    Returns:
+        The cached body in the encoding the client accepts, or 304 if the
+        client's ETag matches
+    """
+    cached = response_cache.get(key)
+    if cached is None:
+        # Rendered and compressed on the pool, once per entry. The key is
+        # namespaced: coalesced() shares Responses, not cache entries, under
+        # the same request keys
+        cached = await single_flight.run(
+            endpoint, ("cached",) + key, lambda: executor.run(endpoint, lambda: response_cache.prepare(compute()))
+        )
+        response_cache.put(key, cached)
+    if isinstance(cached, tuple):
+        cached = cached[variant]
+    return response_cache.respond(cached, http_request.headers.get("if-none-match"),
+                                  http_request.headers.get("accept-encoding"))
+
+async def coalesced(endpoint: str, key: tuple, compute, variant: int = 0) -> Response:
+    """
+    Run compute once for all concurrent requests with the same key.
+    
+    Args:
+        endpoint: Executor endpoint name
+        key: Normalized request inputs
+        compute: Synchronous callable returning the rendered Response, or a
+            list of Responses for variants of one computation
+        variant: Index of the variant to send when compute returns a list
+        
+    Returns:
+        A fresh Response carrying the shared body (middleware may modify
+        headers of the response object it sends, so it is not shared)
+    """
+    shared = await single_flight.run(endpoint, ("plain",) + key, lambda: executor.run(endpoint, compute))
+    if isinstance(shared, list):
+        shared = shared[variant]
+    return Response(content=shared.body, status_code=shared.status_code, media_type=shared.media_type)
+
+def swap_interaction(interaction: Dict[str, Any]) -> Dict[str, Any]:
+    """The interaction_data payload of (word2, word1), given that of (word1, word2)."""
+    swapped = dict(interaction, word1=interaction["word2"], word2=interaction["word1"])
+    swapped["params1"], swapped["params2"] = interaction["params2"], interaction["params1"]
+    return swapped
 
 # API Endpoints
 
@@ -63,38 +277,76 @@ async def root():
             "GET /api/word/{word}": "Get quantum parameters for a word",
             "POST /api/embedding": "Load a quantum embedding",
             "POST /api/embeddings/batch": "Load multiple embeddings",
+            "POST /api/embeddings/stream": "Stream multiple embeddings as NDJSON",
             "POST /api/interaction": "Compute quantum interaction between two words",
+            "POST /api/interactions/batch": "Interactions for many word pairs in one pass",
             "GET /api/space/3d": "Get 3D embedding space coordinates",
-            "POST /api/similar": "Find similar words"
+            "WS /ws/session": "Session word set with incremental 3D-space and neighbour deltas",
+            "POST /api/score/stream": "Score an uploaded text corpus against query words as NDJSON",
+            "POST /api/similar": "Find similar words",
+            "POST /api/similarity/matrix": "Pairwise similarity matrix for a word list",
+            "GET /api/index/stats": "Similarity index recall and latency statistics",
+            "GET /api/stats": "Embedding cache statistics",
+            "GET /metrics": "Prometheus latency, stage timing and cache metrics",
+            "GET /api/health": "Liveness check",
+            "GET /api/ready": "Readiness check (GloVe loaded)"
         }
     }
 
 @app.get("/api/word/{word}")
-async def get_word_parameters(word: str):
+async def get_word_parameters(word: str, http_request: Request):
     """
     Get the quantum pattern parameters (alpha, beta, gamma) for a word.
     
+    Responses are cached and carry an ETag.
+    
     Returns:
         Dictionary with word and its quantum parameters
     """
     try:
-        params = service.get_word_parameters(word)
-        return params
+        if cacheable():
+            return await cached_response(
+                http_request, "word", ("word", word.lower()),
+                lambda: JSONResponse(content=service.get_word_parameters(word))
+            )
+        return await coalesced("word", ("word", word.lower()),
+                               lambda: JSONResponse(content=service.get_word_parameters(word)))
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/embedding")
-async def load_embedding(request: WordRequest):
+async def load_embedding(request: WordRequest, http_request: Request):
     """
     Load a quantum embedding for a word.
     Returns full wavefunction data and parameters for 3D visualization.
     
+    Send "Accept: application/octet-stream" for the binary format, in which
+    the x samples are omitted (they follow from "grid"). Responses are
+    cached and carry an ETag.
+    
     Returns:
         Dictionary with embedding data including wavefunction and parameters
     """
+    binary = wants_binary(http_request.headers.get("accept"))
+    
+    def compute():
+        embedding_data = service.embedding_data(
+            request.word,
+            num_samples=request.num_samples,
+            include_wavefunction=not request.params_only,
+            include_x=not binary
+        )
+        return negotiate(binary, embedding_data)
+    
+    key = ("embedding", request.word.lower(), request.num_samples, request.params_only, binary)
     try:
-        embedding_data = service.add_embedding(request.word)
-        return embedding_data
+        if cacheable():
+            return await cached_response(http_request, "embedding", key, compute)
+        return await coalesced("embedding", key, compute)
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -103,51 +355,321 @@ async def load_embeddings_batch(request: WordsRequest):
     """
     Load multiple quantum embeddings at once.
     
+    The JSON document is streamed one embedding at a time, each encoded on
+    the pool by its own json.dumps call: encoding a whole batch in one call
+    holds the GIL, and with it the event loop, for hundreds of milliseconds.
+    
     Returns:
         Dictionary with all embeddings
     """
+    words = list(dict.fromkeys(w.lower() for w in request.words))
+    
+    def render():
+        opening = b'{"embeddings":{'
+        for i, (key, record) in enumerate(service.iter_batch_embeddings(words)):
+            with stage("serialization"):
+                # Same encoding as JSONResponse; "{...}"[1:-1] is the "key":record member
+                member = json.dumps({key: to_jsonable(record)}, ensure_ascii=False, allow_nan=False,
+                                    separators=(",", ":")).encode("utf-8")[1:-1]
+            yield (opening if i == 0 else b",") + member
+        yield (b"" if words else opening) + f'}},"count":{len(words)}}}'.encode("utf-8")
+    
+    chunks = executor.iterate("embeddings_batch", render())
     try:
-        result = service.batch_load_embeddings(request.words)
-        return result
+        # The first chunk is computed before responding, so errors still map to a status code
+        first = await chunks.__anext__()
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    
+    return StreamingResponse(body(), media_type="application/json")
+
+@app.post("/api/embeddings/stream")
+async def stream_embeddings_batch(request: StreamWordsRequest, http_request: Request):
+    """
+    Stream quantum embeddings for a large word list, one record per word.
+    
+    Records are NDJSON lines by default. With "Accept: application/octet-stream"
+    each record is the binary format of /api/embedding, prefixed with its
+    length as a little-endian uint32. Parameters are computed per chunk of
+    chunk_size words; the response is produced only as fast as the client
+    reads it, so memory stays bounded by one chunk.
+    """
+    binary = wants_binary(http_request.headers.get("accept"))
+    records = service.iter_embeddings(
+        request.words,
+        chunk_size=request.chunk_size,
+        num_samples=request.num_samples,
+        include_wavefunction=not request.params_only,
+        include_x=not binary
+    )
+    
+    async def encode():
+        async for record in executor.iterate("embeddings_stream", records):
+            with stage("serialization"):
+                if binary:
+                    body = encode_binary(record)
+                    chunk = struct.pack("<I", len(body)) + body
+                else:
+                    chunk = json.dumps(to_jsonable(record)).encode("utf-8") + b"\n"
+            yield chunk
+    
+    media_type = BINARY_MEDIA_TYPE if binary else "application/x-ndjson"
+    return StreamingResponse(encode(), media_type=media_type)
 
 @app.post("/api/interaction")
-async def compute_interaction(request: InteractionRequest):
+async def compute_interaction(request: InteractionRequest, http_request: Request):
     """
     Compute quantum interaction between two embeddings.
     Shows quantum computation/superposition of embeddings.
     
+    Supports the same binary format and options as /api/embedding. The two
+    words and their parameters are returned in request order; responses are
+    cached and carry an ETag.
+    
     Returns:
         Dictionary with interaction data including similarity and combined wavefunction
     """
+    binary = wants_binary(http_request.headers.get("accept"))
+    word1, word2 = request.word1.lower(), request.word2.lower()
+    # The interaction is symmetric, so (a, b) and (b, a) share one key and one
+    # computation; the body lists the words in request order, so both orders
+    # are rendered and the cache entry holds them as two variants
+    first, second = sorted((word1, word2))
+    
+    def compute():
+        interaction = service.interaction_data(
+            first,
+            second,
+            num_samples=request.num_samples,
+            include_wavefunction=not request.params_only,
+            include_x=not binary
+        )
+        if first == second:
+            return [negotiate(binary, interaction)]
+        return [negotiate(binary, interaction), negotiate(binary, swap_interaction(interaction))]
+    
+    key = ("interaction", first, second, request.num_samples, request.params_only, binary)
+    variant = int(word1 != first)
+    try:
+        if cacheable():
+            return await cached_response(http_request, "interaction", key, compute, variant)
+        return await coalesced("interaction", key, compute, variant)
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/interactions/batch")
+async def compute_interactions_batch(request: InteractionsBatchRequest, http_request: Request):
+    """
+    Compute interactions for many word pairs in one vectorized pass.
+    
+    Words shared between pairs are looked up and synthesized once; the
+    payload holds each distinct word's parameters and wavefunction plus the
+    similarity and combined wavefunction of every pair, so a client needs no
+    separate /api/embedding calls. Supports the binary format of
+    /api/embedding via the Accept header.
+    
+    Returns:
+        Dictionary with words, parameters, pair indices, similarities and
+        individual and combined wavefunctions (one row per word or pair)
+    """
+    binary = wants_binary(http_request.headers.get("accept"))
+    
+    def compute():
+        interactions = service.interactions_batch(
+            request.pairs,
+            num_samples=request.num_samples,
+            include_wavefunction=not request.params_only,
+            include_x=not binary
+        )
+        return negotiate(binary, interactions)
+    
     try:
-        interaction = service.compute_embedding_interaction(request.word1, request.word2)
-        return interaction
+        return await executor.run("interactions_batch", compute)
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/space/3d")
-async def get_embedding_space_3d(words: Optional[str] = None):
+async def get_embedding_space_3d(http_request: Request, words: Optional[str] = None, bounds: Optional[str] = None,
+                                 level: Optional[int] = Query(default=None, ge=0, le=MAX_LEVEL),
+                                 max_points: int = Query(default=5000, gt=0)):
     """
     Get 3D coordinates for embedding space visualization.
     Uses (alpha, beta, gamma) as (x, y, z) coordinates.
     
-    Query parameter:
-        words: Comma-separated list of words (optional, uses all cached if not provided)
+    Query parameters:
+        words: Comma-separated list of words (optional; if omitted, the words
+            currently in the LRU wavefunction cache, which depends on recent
+            traffic and EMBEDDING_CACHE_MAX_BYTES rather than on what was loaded)
+        bounds: Viewport as "xmin,ymin,zmin,xmax,ymax,zmax" (optional)
+        level: Octree level of the clusters (optional, chosen from max_points)
+        max_points: Raw points are returned only when the viewport holds at
+            most this many words; otherwise at most this many clusters
+    
+    Supports the binary format of /api/embedding via the Accept header.
     
     Returns:
-        Dictionary with 3D points for visualization
+        Columnar dictionary with raw points or cluster centroids and counts
     """
+    binary = wants_binary(http_request.headers.get("accept"))
+    
+    def compute():
+        word_list = [w.strip() for w in words.split(",")] if words else None
+        viewport = [float(v) for v in bounds.split(",")] if bounds else None
+        space_data = service.get_embedding_space_3d(word_list, bounds=viewport, level=level, max_points=max_points)
+        return negotiate(binary, space_data)
+    
     try:
-        word_list = None
-        if words:
-            word_list = [w.strip() for w in words.split(",")]
+        return await executor.run("space_3d", compute)
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.websocket("/ws/session")
+async def space_session(websocket: WebSocket, top_k: int = Query(default=5, gt=0, le=100)):
+    """
+    Keep a per-connection word set and push incremental updates.
+    
+    Client messages are JSON objects with an "op" and an optional "id" that
+    is echoed back:
+        {"op": "add", "words": [...]}     add words to the session
+        {"op": "remove", "words": [...]}  remove words from the session
+        {"op": "clear"}                   remove every word
+        {"op": "snapshot"}                resend the whole session
+    
+    Every add/remove/clear is answered with one "delta" message holding the
+    removed words, each added point with its top_k neighbours and its
+    fidelities to the other members, and the neighbour lists of members that
+    changed, so an update costs O(session size) rather than a full
+    /api/space/3d reload. Failures are reported as "error" messages and
+    leave the connection open.
+    """
+    await websocket.accept()
+    session = SpaceSession(service.sigma, top_k=top_k, max_words=session_max_words)
+    
+    def update(message: Dict[str, Any]) -> Dict[str, Any]:
+        op = message.get("op")
+        words = [str(w).strip().lower() for w in message.get("words") or []]
+        words = [w for w in words if w]
+        if op == "snapshot":
+            return dict(session.snapshot(), type="snapshot")
+        if op == "clear":
+            delta = {"removed": list(session.words), "added": [], "updated": {}, "size": 0}
+            session.clear()
+        elif op == "add":
+            words = [w for w in dict.fromkeys(words) if w not in session]
+            params = service.get_parameters_batch(words) if words else None
+            delta = apply_update(session, add=words, params=params)
+        elif op == "remove":
+            delta = apply_update(session, remove=words)
+        else:
+            raise ValueError(f"Unknown op: {op!r}")
+        return dict(delta, type="delta")
+    
+    while True:
+        try:
+            message = await websocket.receive_json()
+        except WebSocketDisconnect:
+            return
+        except ValueError:
+            await websocket.send_json({"type": "error", "status": 400, "detail": "Messages must be JSON objects"})
+            continue
+        if not isinstance(message, dict):
+            await websocket.send_json({"type": "error", "status": 400, "detail": "Messages must be JSON objects"})
+            continue
         
-        space_data = service.get_embedding_space_3d(word_list)
-        return space_data
+        try:
+            reply = await executor.run("session", lambda: to_jsonable(update(message)))
+        except ExecutorOverloaded as e:
+            reply = {"type": "error", "status": 503, "detail": str(e)}
+        except SessionFull as e:
+            reply = {"type": "error", "status": 409, "detail": str(e)}
+        except ValueError as e:
+            reply = {"type": "error", "status": 400, "detail": str(e)}
+        except Exception as e:
+            reply = {"type": "error", "status": 500, "detail": str(e)}
+        if "id" in message:
+            reply["id"] = message["id"]
+        try:
+            await websocket.send_json(reply)
+        except WebSocketDisconnect:
+            return
+
+@app.post("/api/score/stream")
+async def score_corpus_stream(http_request: Request, queries: str,
+                              chunk_size: int = Query(default=65536, gt=0, le=1 << 20),
+                              top_n: int = Query(default=10, gt=0, le=1000),
+                              threshold: float = Query(default=0.0, ge=0.0, le=1.0),
+                              summary_only: bool = False, include_oov: bool = False):
+    """
+    Score a text corpus sent as the request body against query words.
+    
+    The body is read incrementally and decoded as UTF-8; tokens are scored in
+    chunks of chunk_size as they arrive (see corpus_scoring.py), so memory
+    does not grow with the size of the upload. The response is NDJSON: one
+    "chunk" record per scored chunk with its distinct tokens, counts and
+    fidelity to every query, then a "summary" record with totals, tokens per
+    second, mean fidelities and the top_n corpus words per query.
+    
+    Query parameters:
+        queries: Comma-separated query words
+        chunk_size: Tokens per scored chunk
+        top_n: Top corpus words per query in the summary
+        threshold: Only list tokens whose best fidelity reaches this value
+        summary_only: Omit per-token scores from chunk records
+        include_oov: Also score out-of-vocabulary tokens
+    """
+    query_words = [q.strip() for q in queries.split(",") if q.strip()]
+    if not query_words:
+        raise HTTPException(status_code=400, detail="At least one query word is required")
+    try:
+        scorer = await executor.run(
+            "score_stream",
+            CorpusScorer,
+            service,
+            query_words,
+            chunk_size=chunk_size,
+            top_n=top_n,
+            threshold=threshold,
+            include_words=not summary_only,
+            include_oov=include_oov
+        )
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    def encode(records: List[Dict[str, Any]]) -> bytes:
+        with stage("serialization"):
+            return b"".join(json.dumps(to_jsonable(record)).encode("utf-8") + b"\n" for record in records)
+    
+    def feed(text: str, final: bool = False) -> bytes:
+        records = scorer.feed(text)
+        if final:
+            records += scorer.finish()
+        return encode(records)
+    
+    async def score():
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        async for data in http_request.stream():
+            if data:
+                chunk = await executor.run("score_stream", feed, decoder.decode(data))
+                if chunk:
+                    yield chunk
+        yield await executor.run("score_stream", feed, decoder.decode(b"", final=True), final=True)
+    
+    return BodyStreamingResponse(score(), media_type="application/x-ndjson")
 
 @app.post("/api/similar")
 async def get_similar_words(request: SimilarWordsRequest):
@@ -158,28 +680,146 @@ async def get_similar_words(request: SimilarWordsRequest):
         List of similar words with similarity scores
     """
     try:
-        similar = service.get_similar_words(
+        similar = await executor.run(
+            "similar",
+            service.get_similar_words,
             request.word,
             top_k=request.top_k,
-            exclude_words=request.exclude_words
+            exclude_words=request.exclude_words,
+            scope=request.scope,
+            block_size=request.block_size
         )
         return {"word": request.word, "similar_words": similar}
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/similarity/matrix")
+async def get_similarity_matrix(request: SimilarityMatrixRequest, http_request: Request):
+    """
+    Compute the pairwise quantum similarity (fidelity) matrix for a word list.
+    
+    Supports the binary format of /api/embedding via the Accept header.
+    
+    Returns:
+        Dictionary with the words and the dense matrix, its upper triangle or
+        a thresholded sparse form
+    """
+    binary = wants_binary(http_request.headers.get("accept"))
+    
+    def compute():
+        matrix = service.similarity_matrix(
+            request.words,
+            output=request.output,
+            threshold=request.threshold,
+            block_size=request.block_size
+        )
+        return negotiate(binary, matrix)
+    
+    try:
+        return await executor.run("similarity_matrix", compute)
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/index/stats")
+async def get_index_stats():
+    """
+    Get recall and latency statistics of the similarity index.
+    
+    Returns:
+        Dictionary with index size, pruning radius, latency percentiles and sampled recall
+    """
+    if service.index is None:
+        raise HTTPException(status_code=404, detail="No similarity index configured")
+    return service.index.stats()
+
+@app.get("/api/stats")
+async def get_stats():
+    """
+    Get cache statistics.
+    
+    Returns:
+        Dictionary with hit/miss/eviction counters and memory use of the embedding caches,
+        plus thread pool queue depths per endpoint
+    """
+    stats = service.cache_stats()
+    if response_cache is not None:
+        stats["responses"] = response_cache.stats()
+    stats["executor"] = executor.stats()
+    stats["single_flight"] = single_flight.stats()
+    return stats
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics.
+    
+    Returns:
+        Request latency and per-stage histograms, cache hit ratios and sizes,
+        the number of wavefunctions held in memory, executor queue depths and
+        single-flight coalescing counters in the Prometheus text format
+    """
+    caches = service.cache_stats()
+    if response_cache is not None:
+        caches["responses"] = response_cache.stats()
+    cache_names = [name for name in ("embeddings", "parameters", "responses") if name in caches]
+    executor_stats = executor.stats()
+    lines = []
+    lines += render_gauge("embedding_cache_hit_ratio", "Hit ratio of the in-memory caches.",
+                          [({"cache": name}, caches[name]["hit_ratio"]) for name in cache_names])
+    lines += render_gauge("embedding_cache_entries", "Entries in the in-memory caches.",
+                          [({"cache": name}, caches[name]["entries"]) for name in cache_names])
+    lines += render_gauge("embedding_cache_bytes", "Bytes held by the in-memory caches.",
+                          [({"cache": name}, caches[name]["bytes"]) for name in cache_names])
+    lines += render_gauge("embeddings_in_memory", "Wavefunctions held in memory.",
+                          [({}, caches["embeddings"]["entries"])])
+    lines += render_gauge("executor_active_calls", "Service calls running per endpoint.",
+                          [({"endpoint": name}, e["active"]) for name, e in executor_stats["endpoints"].items()])
+    lines += render_gauge("executor_waiting_calls", "Service calls waiting for a slot per endpoint.",
+                          [({"endpoint": name}, e["waiting"]) for name, e in executor_stats["endpoints"].items()])
+    flights = single_flight.stats()
+    lines += render_counter("single_flight_computations_total", "Computations started by the single-flight layer.",
+                            [({"endpoint": name}, c["leaders"]) for name, c in flights["endpoints"].items()])
+    lines += render_counter("single_flight_coalesced_total", "Requests that joined an in-flight computation.",
+                            [({"endpoint": name}, c["coalesced"]) for name, c in flights["endpoints"].items()])
+    lines += render_gauge("single_flight_in_flight", "Computations currently in flight.",
+                          [({}, flights["in_flight"])])
+    lines += render_gauge("service_ready", "Whether GloVe and the derived tables are loaded.",
+                          [({}, 1 if service.is_ready else 0)])
+    return Response(content=metrics.render(lines), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "service": "quantum_embedding"}
+    """Liveness check endpoint; also reports whether GloVe has been loaded."""
+    return {"status": "healthy", "service": "quantum_embedding", "ready": service.is_ready}
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness check endpoint; 503 until GloVe and the derived tables are loaded."""
+    if not service.is_ready:
+        raise HTTPException(status_code=503, detail="GloVe vectors not loaded yet")
+    return {"status": "ready", "service": "quantum_embedding"}
 
 @app.get("/ui", response_class=HTMLResponse)
-async def serve_ui():
-    """Serve the main UI."""
-    ui_path = os.path.join(static_dir, "index.html")
-    if os.path.exists(ui_path):
-        with open(ui_path, "r") as f:
-            return f.read()
-    return HTMLResponse(content="<h1>UI not found</h1>", status_code=404)
+async def serve_ui(http_request: Request):
+    """Serve the main UI from memory, precompressed and with an ETag."""
+    response = static_assets.respond("index.html", http_request.headers.get("if-none-match"),
+                                     http_request.headers.get("accept-encoding"))
+    if response is None:
+        return HTMLResponse(content="<h1>UI not found</h1>", status_code=404)
+    return response
+
+@app.get("/static/{path:path}")
+async def serve_static(path: str, http_request: Request):
+    """Serve a static file from memory, precompressed and with an ETag."""
+    response = static_assets.respond(path, http_request.headers.get("if-none-match"),
+                                     http_request.headers.get("accept-encoding"))
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return response
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,338 @@
+"""
+Offline benchmark suite for the PatternEmbeddingService hot paths.
+
+The service is built on a synthetic KeyedVectors stand-in (seeded Gaussian
+vectors), so no GloVe download is needed and every run sees the same
+vocabulary. Each benchmark is timed over several rounds; results are written
+as JSON and can be compared against a stored baseline:
+
+    python benchmark.py --output benchmark_results.json --baseline benchmark_baseline.json
+    python benchmark.py --save-baseline benchmark_baseline.json
+
+The baseline file keeps one baseline per configuration (vocabulary size and
+cache sweep, see config_key), so a --quick run is only compared against a
+baseline recorded with --quick; a run whose configuration has no baseline
+skips the comparison. A benchmark regresses when its median time per
+operation exceeds the baseline median by more than the threshold (default
+25%, overridable per benchmark under "thresholds" in the baseline file); the
+exit status is then 1. Timings only mean something on the machine that
+recorded them, so record the baselines on the machine that runs the
+comparison.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional
+from gensim.models import KeyedVectors
+
+from pattern_embedding_service import PatternEmbeddingService
+
+DEFAULT_THRESHOLD = 0.25
+CACHE_SIZES = [10, 100, 1000, 10000, 100000]
+QUICK_CACHE_SIZES = [10, 100, 1000]
+
+
+def synthetic_vectors(vocab_size: int, dim: int = 300, seed: int = 0) -> KeyedVectors:
+    """
+    Build a KeyedVectors stand-in for GloVe.
+
+    Args:
+        vocab_size: Number of words ("w0", "w1", ...)
+        dim: Vector dimension
+        seed: Random seed
+
+    Returns:
+        KeyedVectors with Gaussian vectors scaled like GloVe's
+    """
+    rng = np.random.default_rng(seed)
+    kv = KeyedVectors(dim)
+    kv.add_vectors([f"w{i}" for i in range(vocab_size)],
+                   (rng.standard_normal((vocab_size, dim)) * 0.4).astype(np.float32))
+    return kv
+
+
+def measure(run: Callable[[], Any], ops: int, setup: Optional[Callable[[], Any]] = None,
+            min_rounds: int = 3, max_rounds: int = 50, budget: float = 1.0) -> Dict[str, Any]:
+    """
+    Time run() over several rounds.
+
+    Args:
+        run: Callable performing ops operations per call
+        ops: Operations per call, used to report time per operation
+        setup: Optional untimed callable run before every round
+        min_rounds: Rounds always run
+        max_rounds: Upper bound on rounds
+        budget: Seconds after which no further rounds are started once
+            min_rounds are done
+
+    Returns:
+        Dictionary with per-operation median/mean/min/p95 in milliseconds
+    """
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_rounds:
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - t0) / ops)
+        if len(times) >= min_rounds and time.perf_counter() - started > budget:
+            break
+
+    times_ms = np.array(times) * 1000.0
+    return {
+        "median_ms": float(np.median(times_ms)),
+        "mean_ms": float(np.mean(times_ms)),
+        "min_ms": float(np.min(times_ms)),
+        "p95_ms": float(np.percentile(times_ms, 95)),
+        "rounds": len(times),
+        "ops": ops
+    }
+
+
+def make_service(glove: KeyedVectors, workdir: str, **kwargs) -> PatternEmbeddingService:
+    """Create a loaded service whose files live in workdir."""
+    service = PatternEmbeddingService(
+        cache_file=os.path.join(workdir, "parameter_cache.npy"),
+        parameter_table_file=os.path.join(workdir, "glove_parameters.npy"),
+        glove=glove,
+        **kwargs
+    )
+    service.load()
+    return service
+
+
+def fill_cache(service: PatternEmbeddingService, words: List[str], chunk_size: int = 4096):
+    """Put wavefunctions for words into the service's embedding cache."""
+    for start in range(0, len(words), chunk_size):
+        chunk = words[start:start + chunk_size]
+        psi, _ = service.wavefunctions_batch(chunk)
+        for word, row in zip(chunk, psi):
+            service.embeddings[word] = row.copy()
+
+
+def run_benchmarks(vocab_size: int, cache_sizes: List[int], budget: float,
+                   only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run the suite.
+
+    Args:
+        vocab_size: Size of the synthetic vocabulary (at least max(cache_sizes))
+        cache_sizes: Cache sizes for the get_similar_words sweep
+        budget: Time budget per benchmark in seconds
+        only: Optional list of benchmark name prefixes to run
+
+    Returns:
+        Mapping of benchmark name to timing statistics
+    """
+    glove = synthetic_vectors(vocab_size)
+    words = list(glove.index_to_key)
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def bench(name: str, run: Callable[[], Any], ops: int, setup: Optional[Callable[[], Any]] = None):
+        if only and not any(name.startswith(prefix) for prefix in only):
+            return
+        results[name] = measure(run, ops, setup, budget=budget)
+        print(f"{name:40s} {results[name]['median_ms']:10.4f} ms/op  ({results[name]['rounds']} rounds)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        service = make_service(glove, workdir, cache_max_bytes=1 << 30)
+        sample = words[:200]
+
+        bench("quantum_embedding_cold",
+              lambda: [service.quantum_embedding(w) for w in sample], len(sample),
+              setup=service.embeddings.clear)
+
+        fill_cache(service, sample)
+        bench("quantum_embedding_cached",
+              lambda: [service.quantum_embedding(w) for w in sample], len(sample))
+
+        pairs = list(zip(words[:1000], words[1000:2000]))
+        bench("quantum_similarity",
+              lambda: [service.quantum_similarity(a, b) for a, b in pairs], len(pairs))
+
+        batch = words[:1000]
+        bench("batch_load_embeddings_1000",
+              lambda: service.batch_load_embeddings(batch), 1,
+              setup=service.embeddings.clear)
+
+        fill_cache(service, batch)
+        bench("get_embedding_space_3d_1000",
+              lambda: service.get_embedding_space_3d(batch), 1)
+
+        json_words = words[:100]
+        bench("add_embedding_payload",
+              lambda: [service.add_embedding(w) for w in json_words], len(json_words))
+        payloads = [service.add_embedding(w) for w in json_words]
+        bench("add_embedding_json_dumps",
+              lambda: [json.dumps(p) for p in payloads], len(payloads))
+
+        # The cache-scope search only needs parameters, so a coarse grid keeps
+        # 100k cached wavefunctions affordable
+        search = make_service(glove, workdir, num_points=64, cache_max_bytes=1 << 30)
+        for size in cache_sizes:
+            search.embeddings.clear()
+            fill_cache(search, words[:size])
+            queries = words[:5]
+            bench(f"get_similar_words_cache_{size}",
+                  lambda: [search.get_similar_words(q, top_k=10) for q in queries], len(queries))
+
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Compare results against a baseline.
+
+    Args:
+        results: Output of run_benchmarks
+        baseline: Baseline document with "results" and optional "thresholds"
+        threshold: Allowed relative slowdown of the median when the baseline
+            sets no threshold for a benchmark
+
+    Returns:
+        One row per benchmark present in both, with the ratio of medians and
+        whether it counts as a regression
+    """
+    thresholds = baseline.get("thresholds", {})
+    rows = []
+    for name, current in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        limit = thresholds.get(name, threshold)
+        ratio = current["median_ms"] / reference["median_ms"] if reference["median_ms"] > 0 else float("inf")
+        rows.append({
+            "name": name,
+            "baseline_ms": reference["median_ms"],
+            "current_ms": current["median_ms"],
+            "ratio": ratio,
+            "threshold": limit,
+            "regression": ratio > 1.0 + limit
+        })
+    return rows
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    """
+    Key of a run configuration in the baseline file.
+
+    Args:
+        config: "config" section of a results document
+
+    Returns:
+        Key such as "vocab=2000,caches=10-100-1000"
+    """
+    caches = "-".join(str(size) for size in config["cache_sizes"])
+    return f"vocab={config['vocab_size']},caches={caches}"
+
+
+def load_baselines(path: str) -> Dict[str, Any]:
+    """
+    Read a baseline file.
+
+    Args:
+        path: Baseline JSON file
+
+    Returns:
+        Document with "baselines" (config_key -> results document) and
+        "thresholds"; a file holding a single results document, as written
+        before baselines were keyed by configuration, is converted
+    """
+    if not os.path.exists(path):
+        return {"baselines": {}, "thresholds": {}}
+    with open(path) as f:
+        document = json.load(f)
+    if "baselines" not in document:
+        thresholds = document.pop("thresholds", {})
+        document = {"baselines": {config_key(document["config"]): document}, "thresholds": thresholds}
+    document.setdefault("thresholds", {})
+    return document
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and library versions a run was made on."""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the embedding service hot paths")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write JSON results")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="Also write the results as a new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown of the median (default 0.25)")
+    parser.add_argument("--quick", action="store_true", help="Smaller vocabulary and cache sweep")
+    parser.add_argument("--vocab-size", type=int, help="Synthetic vocabulary size")
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds per benchmark")
+    parser.add_argument("--only", nargs="*", help="Run only benchmarks whose names start with these prefixes")
+    args = parser.parse_args(argv)
+
+    cache_sizes = QUICK_CACHE_SIZES if args.quick else CACHE_SIZES
+    vocab_size = args.vocab_size or max(max(cache_sizes), 2000)
+    if vocab_size < max(max(cache_sizes), 2000):
+        parser.error("--vocab-size must cover the largest cache size and at least 2000 words")
+
+    results = run_benchmarks(vocab_size, cache_sizes, args.budget, args.only)
+    document = {
+        "environment": environment(),
+        "config": {"vocab_size": vocab_size, "cache_sizes": cache_sizes, "budget": args.budget},
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    key = config_key(document["config"])
+    if args.save_baseline:
+        # Replaces only this configuration's baseline; the others and the
+        # hand-tuned per-benchmark thresholds are kept
+        baselines = load_baselines(args.save_baseline)
+        baselines["baselines"][key] = document
+        with open(args.save_baseline, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline for {key} written to {args.save_baseline}")
+
+    if not args.baseline:
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} not found; run with --save-baseline first")
+        return 0
+
+    baselines = load_baselines(args.baseline)
+    baseline = baselines["baselines"].get(key)
+    if baseline is None:
+        recorded = ", ".join(sorted(baselines["baselines"])) or "none"
+        print(f"No baseline for {key} in {args.baseline} (recorded: {recorded}); "
+              f"skipping the comparison. Record one with the same options and --save-baseline.")
+        return 0
+    if baseline.get("environment", {}).get("platform") != document["environment"]["platform"]:
+        print(f"Note: the baseline was recorded on {baseline.get('environment', {}).get('platform')}; "
+              f"timings are only comparable on the machine that recorded them.")
+    rows = compare(results, dict(baseline, thresholds=baselines["thresholds"]), args.threshold)
+    print(f"\n{'benchmark':40s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:40s} {row['baseline_ms']:10.4f} {row['current_ms']:10.4f} {row['ratio']:7.2f}{flag}")
+    regressions = [row["name"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
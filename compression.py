@@ -0,0 +1,286 @@
+"""
+Negotiated gzip/brotli compression of HTTP responses.
+
+JSON wavefunction payloads shrink to about 40% of their size (the key
+names and punctuation compress well, the float digits are close to
+random), the UI's HTML and JavaScript to under a quarter.
+Compressor picks an encoding from the client's Accept-Encoding (brotli when
+the optional brotli package is installed, gzip otherwise) and compresses
+bodies of compressible media types above a minimum size. The binary float32
+format is left alone: it is already compact and gains only a few percent.
+
+CompressionMiddleware applies it to whatever the application sends: whole
+bodies in one call, streamed bodies (NDJSON) chunk by chunk with a flush
+after every chunk so records still reach the client as they are produced.
+Responses that already carry a Content-Encoding (the response cache and the
+static assets compress once, ahead of time) are passed through untouched.
+"""
+import asyncio
+import zlib
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml"
+)
+# Bodies at least this large are compressed on a worker thread (zlib and
+# brotli release the GIL) rather than on the event loop
+OFFLOAD_SIZE = 64 * 1024
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header.
+
+    Args:
+        header: Header value, e.g. "gzip, br;q=0.9, *;q=0"
+
+    Returns:
+        Lowercased coding -> q-value (1.0 if not given, 0.0 if malformed)
+    """
+    codings: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def is_compressible(media_type: Optional[str]) -> bool:
+    """Whether a Content-Type is worth compressing (text, JSON, NDJSON, JavaScript, SVG)."""
+    return bool(media_type) and media_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    ETag of an encoded variant of a representation.
+
+    A strong ETag names exact bytes, so each content coding needs its own:
+    '"abc"' becomes '"abc-gzip"'. Weak ETags and the identity coding are
+    returned unchanged.
+    """
+    if not encoding or not etag.endswith('"') or etag.startswith("W/"):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+class _GzipStream:
+    """Incremental gzip encoder whose output is complete after every chunk."""
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    """Incremental brotli encoder whose output is complete after every chunk."""
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class Compressor:
+    """Content-coding negotiation and gzip/brotli compression settings."""
+
+    def __init__(self, gzip_level: int = 1, brotli_quality: int = 1, minimum_size: int = 1024):
+        """
+        The fastest settings are the default: on float-heavy JSON, gzip level
+        6 is four times slower than level 1 for a ratio of 0.45 instead of
+        0.48, and brotli quality 4 three times slower than quality 1.
+
+        Args:
+            gzip_level: zlib level 1-9
+            brotli_quality: Brotli quality 0-11 (ignored without the brotli package)
+            minimum_size: Bodies shorter than this many bytes are sent as is
+        """
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.minimum_size = minimum_size
+        # In order of preference when the client accepts several equally
+        self.encodings: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def choose(self, accept_encoding: Optional[str]) -> Optional[str]:
+        """
+        Pick the content coding for a request.
+
+        Args:
+            accept_encoding: Value of the Accept-Encoding request header
+
+        Returns:
+            The supported coding with the highest q-value (ties go to the
+            preferred one), or None for identity
+        """
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = None, 0.0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compress(self, body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+        """
+        Compress a whole body.
+
+        Args:
+            body: Uncompressed bytes
+            encoding: "gzip" or "br"
+            level: Overrides the configured gzip level or brotli quality
+
+        Returns:
+            The encoded body (gzip output has a zero mtime, so it is
+            deterministic)
+        """
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality if level is None else level)
+        compressor = zlib.compressobj(self.gzip_level if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(body) + compressor.flush()
+
+    def stream(self, encoding: str):
+        """Incremental encoder with process(chunk) and finish() methods."""
+        if encoding == "br":
+            return _BrotliStream(self.brotli_quality)
+        return _GzipStream(self.gzip_level)
+
+    def variants(self, body: bytes, media_type: Optional[str],
+                 levels: Optional[Dict[str, int]] = None) -> Dict[str, bytes]:
+        """
+        Encoded variants of a body worth storing next to it.
+
+        Args:
+            body: Uncompressed bytes
+            media_type: Content-Type of the body
+            levels: Coding -> level overriding the configured gzip level or
+                brotli quality
+
+        Returns:
+            Coding -> encoded body, for every supported coding that makes
+            the body smaller; empty for small or incompressible bodies
+        """
+        if len(body) < self.minimum_size or not is_compressible(media_type):
+            return {}
+        levels = levels or {}
+        encoded = {encoding: self.compress(body, encoding, levels.get(encoding)) for encoding in self.encodings}
+        return {encoding: data for encoding, data in encoded.items() if len(data) < len(body)}
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses the client accepts compressed.
+
+    A response is compressed if its media type is compressible, it has no
+    Content-Encoding yet, it does not ask for no-transform, and it is either
+    streamed or at least minimum_size bytes long.
+    """
+
+    def __init__(self, app, compressor: Compressor):
+        """
+        Args:
+            app: ASGI application to wrap
+            compressor: Negotiation and compression settings
+        """
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.compressor.choose(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if passthrough or message["type"] not in ("http.response.start", "http.response.body"):
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether the body is worth compressing
+                start = message
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is not None:
+                data = await self._run(encoder.process, body)
+                if not more_body:
+                    data += encoder.finish()
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            headers = MutableHeaders(scope=start)
+            if not self._should_compress(headers) or (not more_body and len(body) < self.compressor.minimum_size):
+                if is_compressible(headers.get("content-type")) and "content-encoding" not in headers:
+                    headers.add_vary_header("Accept-Encoding")
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            if more_body:
+                encoder = self.compressor.stream(encoding)
+                del headers["content-length"]
+                data = await self._run(encoder.process, body)
+            else:
+                data = await self._run(self.compressor.compress, body, encoding)
+                headers["Content-Length"] = str(len(data))
+            await send(start)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    async def _run(fn, body: bytes, *args) -> bytes:
+        if len(body) >= OFFLOAD_SIZE:
+            return await asyncio.to_thread(fn, body, *args)
+        return fn(body, *args)
+
+    @staticmethod
+    def _should_compress(headers: MutableHeaders) -> bool:
+        return (
+            is_compressible(headers.get("content-type"))
+            and "content-encoding" not in headers
+            and "no-transform" not in headers.get("cache-control", "").lower()
+        )
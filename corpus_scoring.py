@@ -0,0 +1,271 @@
+"""
+Streaming corpus scoring against a handful of query words.
+
+Text is consumed as a sequence of blocks (file reads or request body
+chunks), lowercased and tokenized. Tokens are buffered into chunks of
+chunk_size; each chunk is deduplicated into a vocabulary of distinct tokens
+with counts, their parameters are looked up in one PatternEmbeddingService
+call and all distinct tokens are scored against every query word in one
+vectorized fidelity computation. Memory is bounded by one chunk plus the
+per-query top lists, independent of corpus size.
+
+Every chunk produces a record with its distinct tokens, counts and
+fidelities; the final summary holds totals, tokens per second, the
+count-weighted mean fidelity per query and the top_n corpus words per query
+with their counts. A word's fidelity never changes, so once it drops out of
+a top list it can never re-enter it, and the counts of the words that
+remain are exact.
+
+Usage:
+    python corpus_scoring.py dump.txt --queries quantum physics > scores.ndjson
+    python corpus_scoring.py - --queries love --summary-only < dump.txt
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+import numpy as np
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from wavefunction_codec import to_jsonable
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:['\-][^\W_]+)*")
+# A block ending in a run of non-space characters longer than this is cut
+# there rather than carried over to the next block
+MAX_TOKEN_LENGTH = 1024
+
+
+def read_blocks(stream: TextIO, block_size: int = 1 << 20) -> Iterator[str]:
+    """Read a text stream in blocks of block_size characters."""
+    return iter(lambda: stream.read(block_size), "")
+
+
+class CorpusScorer:
+    """Incremental scorer fed with blocks of text."""
+
+    def __init__(self, service, queries: List[str], chunk_size: int = 65536, top_n: int = 10,
+                 threshold: float = 0.0, include_words: bool = True, include_oov: bool = False):
+        """
+        Args:
+            service: Loaded PatternEmbeddingService
+            queries: Query words
+            chunk_size: Tokens per scored chunk
+            top_n: Corpus words kept per query in the summary
+            threshold: Chunk records only list tokens whose best fidelity
+                against any query reaches this value
+            include_words: If False, chunk records carry only counters
+            include_oov: Score out-of-vocabulary tokens too (they get
+                generated parameters); by default they are only counted
+        """
+        if not queries:
+            raise ValueError("At least one query word is required")
+        self.service = service
+        self.queries = list(dict.fromkeys(q.strip().lower() for q in queries))
+        self.query_params = service.get_parameters_batch(self.queries)
+        self.chunk_size = chunk_size
+        self.top_n = top_n
+        self.threshold = threshold
+        self.include_words = include_words
+        self.include_oov = include_oov
+
+        self.tokens = 0
+        self.scored_tokens = 0
+        self.oov_tokens = 0
+        self.chunks = 0
+        self.score_sums = np.zeros(len(self.queries))
+        self._top: List[Dict[str, List[float]]] = [{} for _ in self.queries]
+        self._pending: List[str] = []
+        self._carry = ""
+        self._started = time.perf_counter()
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Consume a block of text.
+
+        A token cut off at the end of the block is kept until the next
+        block arrives.
+
+        Args:
+            text: Next block of the corpus
+
+        Returns:
+            Records of the chunks completed by this block
+        """
+        text = self._carry + text
+        end = len(text)
+        limit = max(0, end - MAX_TOKEN_LENGTH)
+        while end > limit and not text[end - 1].isspace():
+            end -= 1
+        if end == limit and limit > 0:
+            end = len(text)
+        self._carry = text[end:]
+        self._pending.extend(TOKEN_PATTERN.findall(text[:end].lower()))
+
+        records = []
+        while len(self._pending) >= self.chunk_size:
+            chunk = self._pending[:self.chunk_size]
+            self._pending = self._pending[self.chunk_size:]
+            records.append(self._score_chunk(chunk))
+        return records
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """
+        Score the remaining tokens.
+
+        Returns:
+            Record of the last partial chunk (if any) followed by the summary
+        """
+        self._pending.extend(TOKEN_PATTERN.findall(self._carry.lower()))
+        self._carry = ""
+        records = [self._score_chunk(self._pending)] if self._pending else []
+        self._pending = []
+        records.append(self.summary())
+        return records
+
+    def score(self, blocks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Score a whole corpus.
+
+        Args:
+            blocks: Blocks of text, e.g. from read_blocks
+
+        Yields:
+            Chunk records, then the summary
+        """
+        for block in blocks:
+            yield from self.feed(block)
+        yield from self.finish()
+
+    def _score_chunk(self, tokens: List[str]) -> Dict[str, Any]:
+        counter = Counter(tokens)
+        words = list(counter)
+        counts = np.fromiter(counter.values(), dtype=np.int64, count=len(words))
+
+        oov = 0
+        if not self.include_oov:
+            key_to_index = self.service.glove.key_to_index
+            known = np.fromiter((w in key_to_index for w in words), dtype=bool, count=len(words))
+            oov = int(counts[~known].sum())
+            words = [w for w, k in zip(words, known) if k]
+            counts = counts[known]
+
+        if words:
+            params = self.service.get_parameters_batch(words)
+            scores = self.service.score_parameters(params, self.query_params)
+        else:
+            scores = np.empty((0, len(self.queries)))
+        self._update_top(words, counter, counts, scores)
+
+        record: Dict[str, Any] = {
+            "type": "chunk",
+            "offset": self.tokens,
+            "tokens": len(tokens),
+            "distinct": len(counter),
+            "oov_tokens": oov
+        }
+        if self.include_words:
+            keep = np.flatnonzero(scores.max(axis=1, initial=0.0) >= self.threshold) if self.threshold > 0 \
+                else np.arange(len(words))
+            record["words"] = [words[i] for i in keep]
+            record["counts"] = counts[keep]
+            record["scores"] = {q: scores[keep, j] for j, q in enumerate(self.queries)}
+
+        self.tokens += len(tokens)
+        self.scored_tokens += int(counts.sum())
+        self.oov_tokens += oov
+        self.chunks += 1
+        self.score_sums += counts @ scores
+        return record
+
+    def _update_top(self, words: List[str], counter: Counter, counts: np.ndarray, scores: np.ndarray):
+        """Merge a chunk into the per-query top lists."""
+        k = min(self.top_n, len(words))
+        for j, top in enumerate(self._top):
+            for word, entry in top.items():
+                entry[1] += counter.get(word, 0)
+            if k == 0:
+                continue
+            candidates = np.argpartition(-scores[:, j], k - 1)[:k]
+            for i in candidates:
+                if words[i] not in top:
+                    top[words[i]] = [float(scores[i, j]), int(counts[i])]
+            if len(top) > self.top_n:
+                best = sorted(top.items(), key=lambda item: -item[1][0])[:self.top_n]
+                self._top[j] = dict(best)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totals so far.
+
+        Returns:
+            Token counters, elapsed time, throughput, mean fidelity and the
+            top corpus words for every query
+        """
+        seconds = time.perf_counter() - self._started
+        mean = self.score_sums / self.scored_tokens if self.scored_tokens else np.zeros(len(self.queries))
+        return {
+            "type": "summary",
+            "queries": self.queries,
+            "tokens": self.tokens,
+            "scored_tokens": self.scored_tokens,
+            "oov_tokens": self.oov_tokens,
+            "chunks": self.chunks,
+            "seconds": seconds,
+            "tokens_per_second": self.tokens / seconds if seconds > 0 else 0.0,
+            "mean_fidelity": {q: float(mean[j]) for j, q in enumerate(self.queries)},
+            "top": {
+                q: [{"word": word, "similarity": score, "count": int(count)}
+                    for word, (score, count) in sorted(self._top[j].items(), key=lambda item: -item[1][0])]
+                for j, q in enumerate(self.queries)
+            }
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Score a text corpus against query words")
+    default_dir = os.environ.get("EMBEDDINGS_CACHE_DIR", os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("input", help="Text file to score, or - for stdin")
+    parser.add_argument("--queries", nargs="+", required=True, help="Query words")
+    parser.add_argument("--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--cache-dir", default=default_dir, help="Directory of the GloVe and parameter table files")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="Tokens per scored chunk")
+    parser.add_argument("--top-n", type=int, default=10, help="Top corpus words per query in the summary")
+    parser.add_argument("--threshold", type=float, default=0.0,
+                        help="Only list tokens whose best fidelity reaches this value")
+    parser.add_argument("--summary-only", action="store_true", help="Omit per-token scores from chunk records")
+    parser.add_argument("--include-oov", action="store_true", help="Also score out-of-vocabulary tokens")
+    parser.add_argument("--encoding", default="utf-8")
+    args = parser.parse_args(argv)
+
+    from pattern_embedding_service import PatternEmbeddingService
+
+    with contextlib.ExitStack() as stack:
+        source = sys.stdin if args.input == "-" else \
+            stack.enter_context(open(args.input, encoding=args.encoding, errors="replace"))
+        out = sys.stdout if args.output == "-" else stack.enter_context(open(args.output, "w"))
+        # Service log lines go to stderr so stdout only carries records
+        stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+
+        service = PatternEmbeddingService(
+            cache_file=os.path.join(args.cache_dir, "parameter_cache.npy"),
+            parameter_table_file=os.path.join(args.cache_dir, "glove_parameters.npy"),
+            glove_file=os.path.join(args.cache_dir, "glove-wiki-gigaword-300.kv")
+        )
+        scorer = CorpusScorer(service, args.queries, chunk_size=args.chunk_size, top_n=args.top_n,
+                              threshold=args.threshold, include_words=not args.summary_only,
+                              include_oov=args.include_oov)
+        for record in scorer.score(read_blocks(source)):
+            out.write(json.dumps(to_jsonable(record)) + "\n")
+        service.flush_cache()
+
+    print(f"Scored {record['tokens']} tokens in {record['seconds']:.2f}s "
+          f"({record['tokens_per_second']:,.0f} tokens/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Bounded in-memory caches for the embedding service.
+
+Wavefunctions are cheap to rebuild from (alpha, beta, gamma), so the service
+only keeps a small hot set of full arrays under a byte budget and evicts
+the least recently used entries beyond it.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+_MISSING = object()
+
+
+def default_sizeof(value: Any) -> int:
+    """Size in bytes of a cached value (array buffer size for NumPy arrays)."""
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Least-recently-used cache bounded by total bytes and/or entry count.
+
+    Supports the dict operations the service relies on. Lookups through
+    get() or [] count as hits or misses and refresh recency; membership
+    tests do neither. All operations hold an internal lock, so the cache can
+    be shared by the executor's worker threads.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = default_sizeof):
+        """
+        Args:
+            max_bytes: Byte budget for all values (None for unbounded)
+            max_entries: Maximum number of entries (None for unbounded)
+            sizeof: Function returning the size in bytes of a value
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+
+        self._lock = threading.RLock()
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter(list(self._data))
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Would evict everything else and still not fit
+                return
+
+            self._data[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            self._evict()
+
+    def __delitem__(self, key: Hashable):
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            self._remove(key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (refreshing its recency) or default."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove and return a value without affecting the statistics."""
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key]
+            self._remove(key)
+            return value
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def values(self):
+        with self._lock:
+            return list(self._data.values())
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+    def update(self, other: Dict[Hashable, Any]):
+        with self._lock:
+            for key, value in other.items():
+                self[key] = value
+
+    def clear(self):
+        """Remove all entries; statistics are kept."""
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics.
+
+        Returns:
+            Dictionary with entry count, bytes used, limits, hits, misses,
+            evictions and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+    def _remove(self, key: Hashable):
+        del self._data[key]
+        self.bytes -= self._sizes.pop(key)
+
+    def _evict(self):
+        while self._data and (
+            (self.max_bytes is not None and self.bytes > self.max_bytes)
+            or (self.max_entries is not None and len(self._data) > self.max_entries)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+
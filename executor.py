@@ -0,0 +1,249 @@
+"""
+Execution layer that keeps CPU-bound service calls off the asyncio event loop.
+
+PatternEmbeddingService methods are synchronous NumPy/gensim code. Calling
+them directly from async routes blocks every other request, including
+health checks, for the duration of the call. ServiceExecutor runs them on a
+thread pool instead (NumPy releases the GIL in its heavy kernels) and caps
+how many calls of each endpoint may run at once, so one expensive endpoint
+cannot occupy the whole pool.
+"""
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, Optional
+
+
+class ExecutorOverloaded(Exception):
+    """Raised when an endpoint's wait queue is full."""
+
+
+class EndpointStats:
+    """Concurrency gate and counters for one endpoint."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.errors = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "busy_seconds": self.busy_seconds,
+            "mean_wait_ms": 1000.0 * self.wait_seconds / self.completed if self.completed else 0.0
+        }
+
+
+class ServiceExecutor:
+    """
+    Thread pool with per-endpoint concurrency limits and queue-depth metrics.
+    """
+
+    def __init__(self, max_workers: int = 4, default_limit: int = 4,
+                 limits: Optional[Dict[str, int]] = None, max_queue: Optional[int] = None):
+        """
+        Args:
+            max_workers: Threads in the shared pool
+            default_limit: Concurrent calls allowed per endpoint unless overridden
+            limits: Per-endpoint overrides of default_limit
+            max_queue: Calls allowed to wait per endpoint before new ones are
+                rejected with ExecutorOverloaded (None for unbounded)
+        """
+        self.max_workers = max_workers
+        self.default_limit = default_limit
+        self.limits = limits or {}
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="service")
+        self._endpoints: Dict[str, EndpointStats] = {}
+
+    def _endpoint(self, name: str) -> EndpointStats:
+        stats = self._endpoints.get(name)
+        if stats is None:
+            stats = EndpointStats(self.limits.get(name, self.default_limit))
+            self._endpoints[name] = stats
+        return stats
+
+    async def run(self, endpoint: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on the pool once the endpoint has a free slot.
+
+        The slot stays taken until fn returns, even if the caller is
+        cancelled while fn runs.
+
+        Args:
+            endpoint: Name the concurrency limit and metrics are tracked under
+            fn: Synchronous callable
+
+        Returns:
+            The return value of fn
+
+        Raises:
+            ExecutorOverloaded: If the endpoint's wait queue is full
+        """
+        stats = self._endpoint(endpoint)
+        queued_at = time.perf_counter()
+        if stats.semaphore.locked():
+            if self.max_queue is not None and stats.waiting >= self.max_queue:
+                stats.rejected += 1
+                raise ExecutorOverloaded(f"Too many queued '{endpoint}' requests")
+
+            stats.waiting += 1
+            stats.max_waiting = max(stats.max_waiting, stats.waiting)
+            try:
+                await stats.semaphore.acquire()
+            finally:
+                stats.waiting -= 1
+        else:
+            await stats.semaphore.acquire()
+
+        started_at = time.perf_counter()
+        stats.active += 1
+        loop = asyncio.get_running_loop()
+
+        def finished(future: Future):
+            # The slot is freed when the job ends, not when the awaiting
+            # coroutine does: a caller cancelled by a client disconnect leaves
+            # its job running on the pool, and it still counts against the limit
+            finished_at = time.perf_counter()
+            try:
+                loop.call_soon_threadsafe(self._finished, stats, future, started_at - queued_at,
+                                          finished_at - started_at)
+            except RuntimeError:  # The event loop is already closed
+                pass
+
+        # Run in a copy of the caller's context so per-request state such
+        # as stage timings follows the call onto the pool thread
+        context = contextvars.copy_context()
+        try:
+            future = self._pool.submit(context.run, fn, *args, **kwargs)
+        except BaseException:
+            self._finished(stats, None, started_at - queued_at, 0.0)
+            raise
+        future.add_done_callback(finished)
+        return await asyncio.wrap_future(future, loop=loop)
+
+    @staticmethod
+    def _finished(stats: EndpointStats, future: Optional[Future], wait_seconds: float, busy_seconds: float):
+        """Account for a finished job and free its slot (on the event loop thread)."""
+        stats.active -= 1
+        stats.completed += 1
+        stats.wait_seconds += wait_seconds
+        stats.busy_seconds += busy_seconds
+        if future is None or (not future.cancelled() and future.exception() is not None):
+            stats.errors += 1
+        stats.semaphore.release()
+
+    async def iterate(self, endpoint: str, iterator: Iterator[Any]) -> AsyncIterator[Any]:
+        """
+        Drive a synchronous iterator on the pool, one item per call.
+
+        Each next() goes through run(), so long streams share the endpoint's
+        concurrency limit fairly with other requests instead of holding a
+        slot for their whole duration.
+
+        Args:
+            endpoint: Name the concurrency limit and metrics are tracked under
+            iterator: Synchronous iterator producing the items
+
+        Yields:
+            Items of the iterator
+        """
+        done = object()
+        while True:
+            item = await self.run(endpoint, next, iterator, done)
+            if item is done:
+                return
+            yield item
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool configuration and per-endpoint queue metrics.
+
+        Returns:
+            Dictionary with pool size, totals and per-endpoint counters
+        """
+        endpoints = {name: stats.as_dict() for name, stats in self._endpoints.items()}
+        return {
+            "max_workers": self.max_workers,
+            "active": sum(e["active"] for e in endpoints.values()),
+            "waiting": sum(e["waiting"] for e in endpoints.values()),
+            "endpoints": endpoints
+        }
+
+    def shutdown(self):
+        """Stop accepting work and wait for running calls to finish."""
+        self._pool.shutdown(wait=True)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one in-flight computation.
+
+    The first caller for a key starts the computation as its own task; callers
+    arriving while it runs await the same task instead of starting another.
+    The task is shielded, so a caller that disconnects does not cancel the
+    work the others are waiting for. Keys are forgotten once the task ends,
+    so later calls compute afresh.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    async def run(self, endpoint: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn(), sharing the result with concurrent calls for the same key.
+
+        Args:
+            endpoint: Name the counters are tracked under
+            key: Normalized inputs identifying the computation
+            fn: Coroutine function performing the computation
+
+        Returns:
+            The result of the (possibly shared) computation
+        """
+        counters = self._counters.setdefault(endpoint, {"leaders": 0, "coalesced": 0})
+        task = self._inflight.get(key)
+        if task is None:
+            counters["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Coalescing counters.
+
+        Returns:
+            Number of in-flight computations and, per endpoint, computations
+            started, calls that joined one and the resulting deduplication rate
+        """
+        endpoints = {}
+        for name, counters in self._counters.items():
+            total = counters["leaders"] + counters["coalesced"]
+            endpoints[name] = dict(counters, dedup_rate=counters["coalesced"] / total if total else 0.0)
+        return {"in_flight": len(self._inflight), "endpoints": endpoints}
@@ -0,0 +1,259 @@
+"""
+Offline k-nearest-neighbour graph over the GloVe vocabulary.
+
+For every word (or the N most frequent ones, which come first in GloVe) the
+graph stores its k most quantum-similar neighbours, so the service can
+answer get_similar_words for known words with a row lookup.
+
+In the scaled coordinates u = (alpha / sigma, sigma * beta) the analytic
+fidelity is exp(-|u1 - u2|^2 / 2), so the most similar words are exactly
+the Euclidean nearest neighbours in u. The vocabulary is split into shards
+that a ProcessPoolExecutor scores in parallel, either with a KD-tree
+("kdtree") or with blocked, vectorized brute force ("blocked"); both are
+exact. Every finished shard is saved to a checkpoint directory, so an
+interrupted build resumes where it stopped.
+
+Output, for the prefix P:
+    P.indices.npy   int32 (N, k) neighbour rows, most similar first
+    P.scores.npy    float16 (N, k) fidelities (about 3 significant digits)
+    P.json          metadata used to check the graph matches the table
+
+Usage:
+    python knn_graph.py --k 20 --top-n 100000 --workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Optional, Tuple
+
+from parameter_store import atomic_write_text
+
+_worker: Dict[str, Any] = {}
+
+
+def scaled_coordinates(table: np.ndarray, sigma: float) -> np.ndarray:
+    """(alpha / sigma, sigma * beta) for every row of a parameter table."""
+    table = np.asarray(table, dtype=np.float64)
+    return np.column_stack([table[:, 0] / sigma, table[:, 1] * sigma])
+
+
+def _init_worker(table_path: str, num_words: int, sigma: float, k: int, method: str, block_size: int):
+    table = np.load(table_path, mmap_mode="r")[:num_words]
+    coords = scaled_coordinates(table, sigma)
+    _worker.update(coords=coords, k=k, method=method, block_size=block_size)
+    if method == "kdtree":
+        from scipy.spatial import cKDTree
+        _worker["tree"] = cKDTree(coords)
+
+
+def _drop_self(rows: np.ndarray, neighbours: np.ndarray, distances: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Remove each row's own index from its k + 1 candidates (or the last one if absent)."""
+    is_self = neighbours == rows[:, None]
+    is_self[~is_self.any(axis=1), -1] = True
+    keep = ~is_self
+    keep[np.cumsum(keep, axis=1) > k] = False
+    return neighbours[keep].reshape(len(rows), k), distances[keep].reshape(len(rows), k)
+
+
+def _knn_blocked(start: int, stop: int, rows_per_block: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact kNN of rows [start, stop) by scoring all columns block by block."""
+    results = [_knn_blocked_rows(row, min(row + rows_per_block, stop)) for row in range(start, stop, rows_per_block)]
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def _knn_blocked_rows(start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact kNN of a small row block; peak memory is rows x block_size distances."""
+    coords, k, block_size = _worker["coords"], _worker["k"], _worker["block_size"]
+    queries = coords[start:stop]
+    query_norms = np.sum(queries**2, axis=1)[:, None]
+    best_index = np.empty((len(queries), 0), dtype=np.int64)
+    best_dist = np.empty((len(queries), 0))
+    for col in range(0, len(coords), block_size):
+        block = coords[col:col + block_size]
+        d2 = query_norms + np.sum(block**2, axis=1)[None, :] - 2.0 * queries @ block.T
+        np.maximum(d2, 0.0, out=d2)
+        take = min(k + 1, d2.shape[1])
+        part = np.argpartition(d2, take - 1, axis=1)[:, :take]
+        cand_index = np.concatenate([best_index, part + col], axis=1)
+        cand_dist = np.concatenate([best_dist, np.take_along_axis(d2, part, axis=1)], axis=1)
+        take = min(k + 1, cand_dist.shape[1])
+        keep = np.argpartition(cand_dist, take - 1, axis=1)[:, :take]
+        best_index = np.take_along_axis(cand_index, keep, axis=1)
+        best_dist = np.take_along_axis(cand_dist, keep, axis=1)
+    # Sort by distance, then by index so ties are ordered deterministically
+    order = np.lexsort((best_index, best_dist), axis=1)
+    return np.take_along_axis(best_index, order, axis=1), np.take_along_axis(best_dist, order, axis=1)
+
+
+def _knn_kdtree(start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact kNN of rows [start, stop) with the worker's KD-tree."""
+    k = _worker["k"]
+    distances, neighbours = _worker["tree"].query(_worker["coords"][start:stop], k=k + 1)
+    return neighbours.reshape(stop - start, k + 1), distances.reshape(stop - start, k + 1)**2
+
+
+def _build_shard(shard: int, start: int, stop: int, parts_dir: str) -> int:
+    """Compute one shard and save it as a checkpoint."""
+    k = _worker["k"]
+    knn = _knn_kdtree if _worker["method"] == "kdtree" else _knn_blocked
+    neighbours, d2 = knn(start, stop)
+    rows = np.arange(start, stop)
+    neighbours, d2 = _drop_self(rows, neighbours, d2, k)
+
+    path = os.path.join(parts_dir, f"shard_{shard:05d}.npz")
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, indices=neighbours.astype(np.int32), scores=np.exp(-d2 / 2.0).astype(np.float16))
+    os.replace(tmp_path, path)
+    return shard
+
+
+def build_graph(table_path: str, output: str, k: int = 20, sigma: float = 1.5, top_n: Optional[int] = None,
+                shard_size: int = 16384, block_size: int = 8192, workers: Optional[int] = None,
+                method: str = "kdtree", first_key: Optional[str] = None, last_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the kNN graph from a parameter table, resuming from checkpoints.
+
+    Args:
+        table_path: .npy parameter table aligned with GloVe's key order
+        output: Output prefix (see module docstring)
+        k: Neighbours per word
+        sigma: Width parameter the fidelities are computed for
+        top_n: Optional number of most frequent words to cover (default: all)
+        shard_size: Rows per shard (unit of work and of checkpointing)
+        block_size: Columns scored at once by the blocked method
+        workers: Worker processes (default: CPU count)
+        method: "kdtree" or "blocked"
+        first_key: Optional first vocabulary word, recorded for validation
+        last_key: Optional last covered word, recorded for validation
+
+    Returns:
+        Metadata written next to the graph
+    """
+    if method not in ("kdtree", "blocked"):
+        raise ValueError(f"method must be 'kdtree' or 'blocked', got '{method}'")
+
+    table = np.load(table_path, mmap_mode="r")
+    num_words = min(top_n or len(table), len(table))
+    if k >= num_words:
+        raise ValueError(f"k must be smaller than the number of words ({num_words})")
+
+    parts_dir = output + ".parts"
+    os.makedirs(parts_dir, exist_ok=True)
+    settings = {"num_words": num_words, "k": k, "sigma": sigma, "method": method,
+                "shard_size": shard_size, "vocab_size": len(table)}
+    settings_path = os.path.join(parts_dir, "settings.json")
+    if os.path.exists(settings_path):
+        with open(settings_path) as f:
+            if json.load(f) != settings:
+                raise ValueError(f"{parts_dir} holds checkpoints for different settings; remove it to start over")
+    else:
+        atomic_write_text(settings_path, json.dumps(settings))
+
+    shards = [(i, start, min(start + shard_size, num_words))
+              for i, start in enumerate(range(0, num_words, shard_size))]
+    pending = [s for s in shards if not os.path.exists(os.path.join(parts_dir, f"shard_{s[0]:05d}.npz"))]
+    print(f"{len(shards)} shards, {len(shards) - len(pending)} already done.")
+
+    started = time.perf_counter()
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(table_path, num_words, sigma, k, method, block_size)) as pool:
+            futures = [pool.submit(_build_shard, shard, start, stop, parts_dir) for shard, start, stop in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                print(f"  {done}/{len(pending)} shards ({time.perf_counter() - started:.1f}s)")
+
+    indices = np.lib.format.open_memmap(output + ".indices.npy.tmp", mode="w+", dtype=np.int32, shape=(num_words, k))
+    scores = np.lib.format.open_memmap(output + ".scores.npy.tmp", mode="w+", dtype=np.float16, shape=(num_words, k))
+    for shard, start, stop in shards:
+        with np.load(os.path.join(parts_dir, f"shard_{shard:05d}.npz")) as part:
+            indices[start:stop] = part["indices"]
+            scores[start:stop] = part["scores"]
+    indices.flush()
+    scores.flush()
+    del indices, scores
+    os.replace(output + ".indices.npy.tmp", output + ".indices.npy")
+    os.replace(output + ".scores.npy.tmp", output + ".scores.npy")
+
+    meta = dict(settings, first_key=first_key, last_key=last_key)
+    atomic_write_text(output + ".json", json.dumps(meta, indent=2))
+    shutil.rmtree(parts_dir)
+    print(f"kNN graph for {num_words} words written to {output}.* in {time.perf_counter() - started:.1f}s.")
+    return meta
+
+
+class KNNGraph:
+    """Memory-mapped kNN graph produced by build_graph."""
+
+    def __init__(self, prefix: str):
+        """
+        Args:
+            prefix: Output prefix the graph was written to
+        """
+        with open(prefix + ".json") as f:
+            self.meta = json.load(f)
+        self.indices = np.load(prefix + ".indices.npy", mmap_mode="r")
+        self.scores = np.load(prefix + ".scores.npy", mmap_mode="r")
+        self.num_words = self.meta["num_words"]
+        self.k = self.meta["k"]
+        self.sigma = self.meta["sigma"]
+
+    def matches(self, index_to_key, sigma: float) -> bool:
+        """Whether the graph was built for this vocabulary order and sigma."""
+        return (
+            self.sigma == sigma
+            and self.meta["vocab_size"] == len(index_to_key)
+            and self.meta.get("first_key") in (None, index_to_key[0])
+            and self.meta.get("last_key") in (None, index_to_key[self.num_words - 1])
+        )
+
+    def neighbours(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Neighbours of a vocabulary row.
+
+        Args:
+            row: Row in the parameter table (must be below num_words)
+
+        Returns:
+            (neighbour rows, fidelities), most similar first
+        """
+        return self.indices[row], self.scores[row]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the vocabulary kNN graph for get_similar_words")
+    default_dir = os.environ.get("EMBEDDINGS_CACHE_DIR", os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--cache-dir", default=default_dir, help="Directory of the GloVe and parameter table files")
+    parser.add_argument("--output", help="Output prefix (default: CACHE_DIR/knn_graph)")
+    parser.add_argument("--k", type=int, default=20, help="Neighbours per word")
+    parser.add_argument("--top-n", type=int, help="Only the N most frequent words")
+    parser.add_argument("--sigma", type=float, default=1.5, help="Wavepacket width")
+    parser.add_argument("--method", choices=("kdtree", "blocked"), default="kdtree")
+    parser.add_argument("--shard-size", type=int, default=16384)
+    parser.add_argument("--block-size", type=int, default=8192)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    from pattern_embedding_service import PatternEmbeddingService
+
+    # Loading the service converts GloVe and builds the parameter table if needed
+    table_path = os.path.join(args.cache_dir, "glove_parameters.npy")
+    service = PatternEmbeddingService(
+        sigma=args.sigma,
+        cache_file=os.path.join(args.cache_dir, "parameter_cache.npy"),
+        parameter_table_file=table_path,
+        glove_file=os.path.join(args.cache_dir, "glove-wiki-gigaword-300.kv")
+    )
+    keys = service.glove.index_to_key
+    num_words = min(args.top_n or len(keys), len(keys))
+    build_graph(table_path, args.output or os.path.join(args.cache_dir, "knn_graph"), k=args.k, sigma=args.sigma,
+                top_n=args.top_n, shard_size=args.shard_size, block_size=args.block_size, workers=args.workers,
+                method=args.method, first_key=keys[0], last_key=keys[num_words - 1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Asyncio load generator for the API.
+
+By default the app is imported and driven in-process through httpx's ASGI
+transport, on a synthetic KeyedVectors stand-in for GloVe (see
+benchmark.synthetic_vectors), so no download or server is needed. With
+--url it drives a running server instead.
+
+A fixed number of concurrent clients replay a weighted mix of endpoints
+with words drawn from a heavy-tailed distribution over the vocabulary (a
+few hot words, a long tail, optionally some out-of-vocabulary ones):
+
+    python loadtest.py --concurrency 32 --duration 30 --mix word=4,embedding=2,similar=1,space=1
+    python loadtest.py --url http://localhost:8000 --words-file words.txt --pid 1234
+
+The report has p50/p95/p99 latency, throughput and error rate per endpoint,
+and a timeline sampled every --sample-interval seconds with throughput,
+resident memory and cache sizes (from /api/stats), to size workers and
+catch unbounded growth. In-process runs also measure event-loop lag, the
+delay of a timer that should fire every 10 ms, which exposes work that
+blocks the loop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_MIX = "word=30,embedding=20,batch=5,similar=10,interaction=20,space=15"
+LAG_INTERVAL = 0.01
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse "endpoint=weight,..." into normalized weights."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        if name.strip() not in REQUESTS:
+            raise ValueError(f"Unknown endpoint '{name.strip()}', expected one of {sorted(REQUESTS)}")
+        weights[name.strip()] = float(value or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("The mix needs at least one positive weight")
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """
+    Current resident set size of a process.
+
+    Args:
+        pid: Process id (default: this process)
+
+    Returns:
+        Bytes, from /proc on Linux; elsewhere the peak RSS of this process,
+        or None for another process
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        if pid is not None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class WordSampler:
+    """Draws words with a heavy-tailed rank distribution."""
+
+    def __init__(self, words: List[str], oov_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            words: Vocabulary, most frequent first
+            oov_rate: Fraction of draws replaced by made-up words
+            seed: Random seed
+        """
+        self.words = words
+        self.oov_rate = oov_rate
+        self.rng = np.random.default_rng(seed)
+
+    def sample(self, count: int = 1) -> List[str]:
+        # Log-uniform ranks: rank r is drawn with probability ~ 1/r
+        ranks = (len(self.words) ** self.rng.random(count)).astype(np.int64) - 1
+        oov = self.rng.random(count) < self.oov_rate
+        return [f"oov{self.rng.integers(1 << 30)}" if o else self.words[r] for r, o in zip(ranks, oov)]
+
+
+def _word(sampler: WordSampler) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    return "GET", f"/api/word/{sampler.sample()[0]}", None
+
+
+def _embedding(sampler: WordSampler) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    return "POST", "/api/embedding", {"word": sampler.sample()[0]}
+
+
+def _batch(sampler: WordSampler) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    return "POST", "/api/embeddings/batch", {"words": sampler.sample(50)}
+
+
+def _similar(sampler: WordSampler) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    return "POST", "/api/similar", {"word": sampler.sample()[0], "top_k": 10, "scope": "vocabulary"}
+
+
+def _interaction(sampler: WordSampler) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    word1, word2 = sampler.sample(2)
+    return "POST", "/api/interaction", {"word1": word1, "word2": word2}
+
+
+def _space(sampler: WordSampler) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    return "GET", f"/api/space/3d?words={','.join(sampler.sample(20))}", None
+
+
+REQUESTS: Dict[str, Callable[[WordSampler], Tuple[str, str, Optional[Dict[str, Any]]]]] = {
+    "word": _word,
+    "embedding": _embedding,
+    "batch": _batch,
+    "similar": _similar,
+    "interaction": _interaction,
+    "space": _space
+}
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of latencies in seconds, reported in milliseconds."""
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ms = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "max_ms": float(ms.max())}
+
+
+class LoadTest:
+    """Closed-loop load generator with periodic resource sampling."""
+
+    def __init__(self, client: httpx.AsyncClient, sampler: WordSampler, mix: Dict[str, float],
+                 concurrency: int, duration: float, sample_interval: float = 1.0,
+                 pid: Optional[int] = None, measure_loop_lag: bool = False):
+        """
+        Args:
+            client: Client for the app (ASGI transport or a server URL)
+            sampler: Source of words
+            mix: Normalized endpoint weights (see parse_mix)
+            concurrency: Number of concurrent clients
+            duration: Seconds to run
+            sample_interval: Seconds between timeline samples
+            pid: Server process whose RSS is sampled (default: this process)
+            measure_loop_lag: Whether to time a 10 ms timer on this event loop
+        """
+        self.client = client
+        self.sampler = sampler
+        self.names = list(mix)
+        self.weights = np.array([mix[name] for name in self.names])
+        self.concurrency = concurrency
+        self.duration = duration
+        self.sample_interval = sample_interval
+        self.pid = pid
+        self.measure_loop_lag = measure_loop_lag
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.names}
+        self.errors: Dict[str, Dict[str, int]] = {name: {} for name in self.names}
+        self.loop_lag: List[float] = []
+        self.timeline: List[Dict[str, Any]] = []
+        self._completed = 0
+
+    async def _client_loop(self, deadline: float, seed: int):
+        rng = np.random.default_rng(seed)
+        while time.perf_counter() < deadline:
+            name = self.names[rng.choice(len(self.names), p=self.weights)]
+            method, path, body = REQUESTS[name](self.sampler)
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, json=body)
+                await response.aread()
+                error = str(response.status_code) if response.status_code >= 400 else None
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            self.latencies[name].append(time.perf_counter() - start)
+            if error is not None:
+                self.errors[name][error] = self.errors[name].get(error, 0) + 1
+            self._completed += 1
+
+    async def _lag_loop(self, deadline: float):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.loop_lag.append(max(time.perf_counter() - start - LAG_INTERVAL, 0.0))
+
+    async def _sample(self, started: float, previous: Tuple[float, int]) -> Tuple[float, int]:
+        now = time.perf_counter()
+        sample: Dict[str, Any] = {
+            "t": round(now - started, 3),
+            "requests": self._completed,
+            "rps": (self._completed - previous[1]) / max(now - previous[0], 1e-9)
+        }
+        rss = rss_bytes(self.pid)
+        if rss is not None:
+            sample["rss_mb"] = rss / 1e6
+        try:
+            stats = (await self.client.get("/api/stats")).json()
+            sample["caches"] = {
+                name: {"entries": stats[name]["entries"], "bytes": stats[name]["bytes"]}
+                for name in ("embeddings", "parameters", "responses") if name in stats
+            }
+        except (httpx.HTTPError, ValueError, KeyError):
+            pass
+        self.timeline.append(sample)
+        return now, self._completed
+
+    async def _sample_loop(self, started: float, deadline: float):
+        previous = await self._sample(started, (started, 0))
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(min(self.sample_interval, max(deadline - time.perf_counter(), 0.0)))
+            previous = await self._sample(started, previous)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run the load test.
+
+        Returns:
+            Report with per-endpoint and overall latency percentiles,
+            throughput and error rates, event-loop lag and the timeline
+        """
+        started = time.perf_counter()
+        deadline = started + self.duration
+        tasks = [self._client_loop(deadline, seed) for seed in range(self.concurrency)]
+        tasks.append(self._sample_loop(started, deadline))
+        if self.measure_loop_lag:
+            tasks.append(self._lag_loop(deadline))
+        await asyncio.gather(*tasks)
+        return self.report(time.perf_counter() - started)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """Summarize the recorded latencies and errors."""
+        endpoints = {}
+        for name in self.names:
+            count = len(self.latencies[name])
+            failed = sum(self.errors[name].values())
+            endpoints[name] = dict(
+                latency_summary(self.latencies[name]),
+                requests=count,
+                rps=count / elapsed,
+                error_rate=failed / count if count else 0.0,
+                errors=self.errors[name]
+            )
+        everything = [latency for name in self.names for latency in self.latencies[name]]
+        failed = sum(sum(errors.values()) for errors in self.errors.values())
+        report = {
+            "duration_s": elapsed,
+            "concurrency": self.concurrency,
+            "total": dict(latency_summary(everything), requests=len(everything), rps=len(everything) / elapsed,
+                          error_rate=failed / len(everything) if everything else 0.0),
+            "endpoints": endpoints,
+            "timeline": self.timeline
+        }
+        rss = [sample["rss_mb"] for sample in self.timeline if "rss_mb" in sample]
+        if rss:
+            report["rss_growth_mb"] = rss[-1] - rss[0]
+        if self.loop_lag:
+            report["loop_lag"] = latency_summary(self.loop_lag)
+        return report
+
+
+def load_app(vocab_size: int, cache_dir: str):
+    """
+    Import the app with a synthetic vocabulary.
+
+    Args:
+        vocab_size: Number of synthetic words
+        cache_dir: Directory for the parameter table, index and caches
+
+    Returns:
+        Tuple of (ASGI app, vocabulary)
+    """
+    from benchmark import synthetic_vectors
+
+    os.environ["EMBEDDINGS_CACHE_DIR"] = cache_dir
+    os.environ["GLOVE_LAZY"] = "1"
+    os.environ.setdefault("CACHE_FLUSH_INTERVAL", "0")
+    import app as app_module
+
+    glove = synthetic_vectors(vocab_size)
+    # Stands in for GloVe before the lazily started service loads
+    app_module.service._glove = glove
+    app_module.service.load()
+    return app_module.app, list(glove.index_to_key)
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'endpoint':12s} {'requests':>9s} {'rps':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} "
+          f"{'max ms':>9s} {'errors':>7s}")
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, row in rows:
+        print(f"{name:12s} {row['requests']:9d} {row['rps']:8.1f} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} "
+              f"{row['p99_ms']:9.2f} {row['max_ms']:9.2f} {row['error_rate']:7.2%}")
+    if "loop_lag" in report:
+        lag = report["loop_lag"]
+        print(f"\nEvent-loop lag: p50 {lag['p50_ms']:.2f} ms, p99 {lag['p99_ms']:.2f} ms, max {lag['max_ms']:.2f} ms")
+    if "rss_growth_mb" in report:
+        print(f"RSS growth: {report['rss_growth_mb']:+.1f} MB over {report['duration_s']:.1f}s")
+
+
+async def run_load_test(args, app=None, words: Optional[List[str]] = None) -> Dict[str, Any]:
+    if app is not None:
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits)
+
+    async with client:
+        sampler = WordSampler(words, oov_rate=args.oov_rate, seed=args.seed)
+        test = LoadTest(client, sampler, parse_mix(args.mix), args.concurrency, args.duration,
+                        sample_interval=args.sample_interval, pid=args.pid, measure_loop_lag=app is not None)
+        return await test.run()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the API with a configurable endpoint mix")
+    parser.add_argument("--url", help="Server to drive (default: the app in-process)")
+    parser.add_argument("--words-file", help="Words to request, one per line, most frequent first "
+                                             "(default: the synthetic vocabulary)")
+    parser.add_argument("--vocab-size", type=int, default=20000, help="Synthetic vocabulary size")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--oov-rate", type=float, default=0.0, help="Fraction of out-of-vocabulary words")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between timeline samples")
+    parser.add_argument("--pid", type=int, help="Server process whose RSS is sampled (with --url)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    words = None
+    if args.words_file:
+        with open(args.words_file, encoding="utf-8") as f:
+            words = [line.strip() for line in f if line.strip()]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        app = None
+        if not args.url:
+            app, vocabulary = load_app(args.vocab_size, cache_dir)
+            words = words or vocabulary
+        elif words is None:
+            words = [f"w{i}" for i in range(args.vocab_size)]
+        report = asyncio.run(run_load_test(args, app, words))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 1 if report["total"]["error_rate"] > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
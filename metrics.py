@@ -0,0 +1,286 @@
+"""
+Request latency and per-stage timing in Prometheus text format.
+
+MetricsMiddleware times every HTTP request by route template. While a
+request is in flight it also installs a RequestTimings collector in a
+context variable; PatternEmbeddingService wraps its stages (parameter
+lookup, wavefunction synthesis, similarity math, index queries and JSON
+conversion) in stage()/timed(), which add their durations to the collector.
+Stage times are exclusive: time spent in a nested stage is attributed to
+the nested stage only, so the stages of a request never add up to more than
+its total. Outside a request the hooks cost a single context-variable read.
+
+At the end of a request the stage totals are observed into a histogram and
+can be sent back in a Server-Timing header for browser devtools.
+"""
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_timings: contextvars.ContextVar[Optional["RequestTimings"]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+class RequestTimings:
+    """Exclusive per-stage durations of one request."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._child_time: List[float] = []
+
+    def enter(self):
+        self._child_time.append(0.0)
+
+    def exit(self, name: str, elapsed: float):
+        nested = self._child_time.pop()
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+        if self._child_time:
+            self._child_time[-1] += elapsed
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """
+        Format the stages as a Server-Timing header value.
+
+        Args:
+            total: Optional total request time in seconds, sent as "total"
+
+        Returns:
+            Header value with durations in milliseconds
+        """
+        entries = [f"{name};dur={seconds * 1000.0:.3f}" for name, seconds in self.stages.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000.0:.3f}")
+        return ", ".join(entries)
+
+
+class _Stage:
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _current_timings.get()
+        if self.timings is not None:
+            self.timings.enter()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timings is not None:
+            self.timings.exit(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name: str) -> _Stage:
+    """
+    Context manager timing a block as a named stage of the current request.
+
+    Example:
+        with stage("serialization"):
+            payload = to_jsonable(record)
+
+    Args:
+        name: Stage name
+
+    Returns:
+        Context manager
+    """
+    return _Stage(name)
+
+
+def timed(name: str) -> Callable:
+    """
+    Decorator timing every call of a function as a named stage.
+
+    Args:
+        name: Stage name
+
+    Returns:
+        Decorator
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timings = _current_timings.get()
+            if timings is None:
+                return fn(*args, **kwargs)
+            timings.enter()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings.exit(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Thread-safe Prometheus histogram with a fixed set of label names."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str],
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0]
+                self._series[labels] = series
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        bucket_names = self.label_names + ("le",)
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_names, labels + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+def _render_samples(name: str, help_text: str, metric_type: str,
+                    samples: Iterable[Tuple[Dict[str, Any], float]]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+    return lines
+
+
+def render_gauge(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, Any], float]]) -> List[str]:
+    """
+    Render a gauge in Prometheus text format.
+
+    Args:
+        name: Metric name
+        help_text: HELP line
+        samples: (labels, value) pairs
+
+    Returns:
+        Lines of the exposition format
+    """
+    return _render_samples(name, help_text, "gauge", samples)
+
+
+def render_counter(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, Any], float]]) -> List[str]:
+    """
+    Render a counter in Prometheus text format.
+
+    Args:
+        name: Metric name (conventionally ending in _total)
+        help_text: HELP line
+        samples: (labels, value) pairs
+
+    Returns:
+        Lines of the exposition format
+    """
+    return _render_samples(name, help_text, "counter", samples)
+
+
+class Metrics:
+    """Request and stage histograms shared by the middleware and /metrics."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.requests = Histogram("http_request_duration_seconds", "HTTP request latency by route.",
+                                  ("method", "route", "status"), buckets)
+        self.stages = Histogram("embedding_stage_duration_seconds",
+                                "Time per request spent in each service stage.", ("route", "stage"), buckets)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, timings: RequestTimings):
+        self.requests.observe((method, route, str(status)), seconds)
+        for name, stage_seconds in timings.stages.items():
+            self.stages.observe((route, name), stage_seconds)
+
+    def render(self, extra: Iterable[str] = ()) -> str:
+        """
+        Render all metrics.
+
+        Args:
+            extra: Further exposition lines (e.g. gauges) to append
+
+        Returns:
+            Prometheus text exposition
+        """
+        lines = self.requests.render() + self.stages.render() + list(extra)
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency and per-stage timings.
+
+    Requests are labelled by route template (e.g. /api/word/{word}) so the
+    number of series stays bounded; requests that match no route are
+    labelled "unmatched".
+    """
+
+    def __init__(self, app, metrics: Metrics, server_timing: bool = False):
+        """
+        Args:
+            app: ASGI application to wrap
+            metrics: Metrics to record into
+            server_timing: Whether to add a Server-Timing header to responses
+        """
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    value = timings.server_timing(time.perf_counter() - start)
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.metrics.observe_request(scope["method"], route, status, time.perf_counter() - start, timings)
@@ -0,0 +1,182 @@
+"""
+Persistent binary storage for (alpha, beta, gamma) parameter sets.
+
+Parameters are stored as an (N, 3) float32 .npy array, opened memory-mapped
+on load, next to a UTF-8 vocabulary file with one key per line; row i of
+the array belongs to line i of the vocabulary file. The vocabulary file
+starts with a digest of the array it was written with, so a pair of files
+from different flushes is detected. Both files are written to a temporary
+file first and moved into place atomically, so a crash during a flush never
+leaves a torn cache behind.
+
+Several workers flush into the same files, so merge_parameters combines a
+worker's entries with what is already on disk under a file lock instead of
+replacing the cache with that worker's subset.
+"""
+import hashlib
+import os
+import tempfile
+import numpy as np
+from typing import Dict, Iterable, Optional, Tuple
+
+from shared_store import FileLock
+
+
+DIGEST_PREFIX = "blake2b:"
+
+
+def array_digest(array: np.ndarray) -> str:
+    """Hex digest of an array's shape and float32 contents."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(array.shape).encode("ascii"))
+    h.update(memoryview(np.ascontiguousarray(array, dtype=np.float32)).cast("B"))
+    return h.hexdigest()
+
+
+def keys_path(path: str) -> str:
+    """Path of the vocabulary file that belongs to a parameter array file."""
+    return os.path.splitext(path)[0] + ".keys"
+
+
+def atomic_save_npy(path: str, array: np.ndarray):
+    """
+    Save an array with np.save via a temporary file and os.replace.
+
+    Args:
+        path: Destination .npy file
+        array: Array to save
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_text(path: str, text: str):
+    """
+    Write a UTF-8 text file via a temporary file and os.replace.
+
+    The text is written unchanged (no newline translation).
+
+    Args:
+        path: Destination file
+        text: File contents
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_parameters(path: str, items: Iterable[Tuple[str, Tuple[float, float, float]]]) -> int:
+    """
+    Persist parameter sets atomically.
+
+    The array is replaced before the vocabulary file, whose first line is
+    the array's digest; load_parameters rejects a pair whose digests
+    disagree, so a crash between the two replacements is detected rather
+    than pairing keys with the rows of another flush (even when the row
+    count is unchanged).
+
+    Args:
+        path: Destination .npy file (the vocabulary goes to keys_path(path))
+        items: (key, (alpha, beta, gamma)) pairs; keys containing "\n" or "\r"
+            are skipped
+
+    Returns:
+        Number of parameter sets written
+    """
+    keys = []
+    rows = []
+    for key, params in items:
+        if "\n" in key or "\r" in key:
+            continue
+        keys.append(key)
+        rows.append(params[:3])
+
+    array = np.asarray(rows, dtype=np.float32).reshape(-1, 3)
+    atomic_save_npy(path, array)
+    header = f"{DIGEST_PREFIX}{array_digest(array)}\n"
+    atomic_write_text(keys_path(path), header + "".join(f"{key}\n" for key in keys))
+    return len(keys)
+
+
+def lock_path(path: str) -> str:
+    """Path of the lock file that serializes merges into a parameter array file."""
+    return os.path.splitext(path)[0] + ".lock"
+
+
+def merge_parameters(path: str, items: Iterable[Tuple[str, Tuple[float, float, float]]],
+                     max_entries: Optional[int] = None) -> int:
+    """
+    Merge parameter sets into the files at path and persist them atomically.
+
+    The existing files are read and rewritten while holding an exclusive
+    lock, so concurrent flushes from several processes each add their
+    entries instead of the last one overwriting the others. New values
+    replace existing ones for the same key.
+
+    Args:
+        path: Destination .npy file (the vocabulary goes to keys_path(path))
+        items: (key, (alpha, beta, gamma)) pairs to add
+        max_entries: Optional bound on the merged size; the given items are
+            kept first and the oldest existing entries are dropped
+
+    Returns:
+        Number of parameter sets written
+    """
+    with FileLock(lock_path(path)):
+        merged = load_parameters(path)
+        for key, params in items:
+            merged.pop(key, None)
+            merged[key] = tuple(params[:3])
+        entries = list(merged.items())
+        if max_entries is not None and len(entries) > max_entries:
+            entries = entries[len(entries) - max_entries:]
+        return save_parameters(path, entries)
+
+
+def load_parameters(path: str) -> Dict[str, Tuple[float, float, float]]:
+    """
+    Load parameter sets written by save_parameters.
+
+    Args:
+        path: Source .npy file
+
+    Returns:
+        Dictionary mapping key to (alpha, beta, gamma); empty if the files
+        are missing or inconsistent
+    """
+    if not os.path.exists(path) or not os.path.exists(keys_path(path)):
+        return {}
+
+    array = np.load(path, mmap_mode="r")
+    # newline="" so a stray "\r" never splits a key into two lines
+    with open(keys_path(path), "r", encoding="utf-8", newline="") as f:
+        header, *keys = f.read().split("\n")[:-1] or [""]
+
+    if array.ndim != 2 or array.shape != (len(keys), 3):
+        print(f"Parameter cache {path} has {len(keys)} keys for shape {array.shape}, ignoring it.")
+        return {}
+    if header != DIGEST_PREFIX + array_digest(array):
+        print(f"Parameter cache {path} does not match its vocabulary file, ignoring it.")
+        return {}
+
+    values = np.asarray(array, dtype=np.float64).tolist()
+    return {key: tuple(row) for key, row in zip(keys, values)}
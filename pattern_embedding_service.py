@@ -3,10 +3,95 @@ PatternEmbeddingService - Backend service for quantum embedding operations
 Based on PATTERN3.py quantum embedding engine
 """
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Optional
 from gensim.downloader import load
+from gensim.models import KeyedVectors
+import contextlib
+import hashlib
 import json
 import os
+import threading
+import time
+
+from embedding_cache import LRUCache
+from fidelity import (X_MAX, X_MIN, analytic_fidelity, fidelity_check, grid_fidelity, make_grid,
+                      synthesize_wavefunctions)
+from knn_graph import KNNGraph
+from metrics import stage, timed
+from parameter_store import atomic_save_npy, keys_path, load_parameters, merge_parameters
+from shared_store import FileLock, SharedParameterStore
+from similarity_index import SimilarityIndex, create_index
+from space_lod import level_of_detail
+from subword_vectors import SubwordIndex, hashed_vector
+from wavefunction_codec import to_jsonable
+
+GLOVE_MODEL = "glove-wiki-gigaword-300"
+
+
+def project_parameters(vectors: np.ndarray) -> np.ndarray:
+    """
+    Project 300-dim word vectors to (alpha, beta, gamma) in one batched pass.
+    
+    Args:
+        vectors: Array of shape (N, 300) or a single 300-dim vector
+        
+    Returns:
+        float32 array of shape (N, 3) with columns alpha, beta, gamma
+    """
+    v = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    params = np.empty((v.shape[0], 3), dtype=np.float32)
+    
+    # Use PCA-like projection of the full 300-dim vector into 3 meaningful parameters
+    # This preserves almost all semantic distance (300 → 3 with minimal loss)
+    params[:, 0] = np.einsum("ij,ij->i", v[:, :100], v[:, 100:200]) * 2.0      # ~ displacement
+    params[:, 1] = np.einsum("ij,ij->i", v[:, 50:150], v[:, 150:250]) * 4.0    # ~ chirp (stronger)
+    params[:, 2] = np.arctan2(v[:, :150].sum(axis=1), v[:, 150:].sum(axis=1)) * 3  # global phase
+    return params
+
+
+def top_k_blocks(score_block: Callable[[int, int], np.ndarray], count: int, top_k: int, block_size: int,
+                 excluded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best top_k of count candidates, scored block by block.
+    
+    Each block keeps only its own top-k via np.argpartition, so peak memory
+    is bounded by the block size rather than the number of candidates.
+    
+    Args:
+        score_block: Returns float64 scores of candidates [start, stop)
+        count: Number of candidates
+        top_k: Number of results
+        block_size: Candidates scored per block
+        excluded: Optional candidate indices to leave out
+        
+    Returns:
+        (indices, scores) sorted by descending score; excluded candidates
+        and negative scores are dropped
+    """
+    if top_k <= 0 or count == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    if excluded is None:
+        excluded = np.empty(0, dtype=np.int64)
+    
+    candidate_indices = []
+    candidate_scores = []
+    for start in range(0, count, block_size):
+        scores = score_block(start, min(start + block_size, count))
+        in_block = excluded[(excluded >= start) & (excluded < start + len(scores))]
+        scores[in_block - start] = -1.0
+        
+        if len(scores) > top_k:
+            best = np.argpartition(scores, -top_k)[-top_k:]
+        else:
+            best = np.arange(len(scores))
+        candidate_indices.append(best + start)
+        candidate_scores.append(scores[best])
+    
+    indices = np.concatenate(candidate_indices)
+    scores = np.concatenate(candidate_scores)
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    keep = scores[order] >= 0.0
+    return indices[order][keep], scores[order][keep]
 
 
 class PatternEmbeddingService:
@@ -15,31 +100,216 @@ class PatternEmbeddingService:
     Provides methods for embedding generation, similarity computation, and 3D visualization.
     """
     
-    def __init__(self, num_points: int = 1024, sigma: float = 1.5, cache_file: Optional[str] = None):
+    SIMILARITY_MODES = ("analytic", "grid", "check")
+    PRECISIONS = {"double": np.complex128, "single": np.complex64}
+    
+    def __init__(self, num_points: int = 1024, sigma: float = 1.5, cache_file: Optional[str] = None,
+                 similarity_mode: str = "analytic", check_tolerance: float = 1e-6,
+                 parameter_table_file: Optional[str] = None, search_block_size: int = 65536,
+                 index_type: Optional[str] = None, index_file: Optional[str] = None,
+                 index_options: Optional[Dict[str, any]] = None, glove_file: Optional[str] = None,
+                 lazy: bool = False, glove: Optional[KeyedVectors] = None,
+                 cache_max_bytes: Optional[int] = 64 * 1024 * 1024, parameter_cache_size: Optional[int] = 100000,
+                 precision: str = "double", shared_store_file: Optional[str] = None,
+                 shared_store_capacity: int = 1 << 18, build_lock_file: Optional[str] = None,
+                 knn_graph_file: Optional[str] = None, subword_file: Optional[str] = None,
+                 subword_buckets: int = 1 << 16, subword_vocab_size: int = 100000):
         """
         Initialize the service with GloVe vectors and configuration.
         
         Args:
             num_points: Number of points in the wavefunction discretization
             sigma: Width parameter for the Gaussian wavepacket
-            cache_file: Optional path to cache file for pre-computed embeddings
+            cache_file: Optional path to the binary parameter cache (.npy, with
+                the vocabulary stored next to it in a .keys file)
+            similarity_mode: "analytic" (closed form on parameters), "grid"
+                (discrete overlap of wavefunctions) or "check" (analytic, but
+                also computes the grid value and reports the discrepancy)
+            check_tolerance: Discretization error above which check mode warns
+            parameter_table_file: Optional .npy path for the precomputed
+                whole-vocabulary (alpha, beta, gamma) table
+            search_block_size: Rows scored at once by vocabulary-wide similarity search
+            index_type: Optional parameter-space index ("kdtree" or "grid")
+                used by get_similar_words(scope="index")
+            index_file: Optional .npz path the index is loaded from or saved to
+            index_options: Extra constructor arguments for the index
+                (e.g. min_fidelity, recall_sample_rate)
+            glove_file: Optional path for GloVe in gensim's native KeyedVectors
+                format. It is written once from the downloaded model and then
+                opened memory-mapped read-only, so workers share the page cache.
+            lazy: Defer loading GloVe (and everything derived from it) until
+                the first call that needs it
+            glove: Optional pre-loaded KeyedVectors to use instead of GloVe
+            cache_max_bytes: Byte budget for cached wavefunctions (LRU eviction,
+                None for unbounded)
+            parameter_cache_size: Maximum number of cached out-of-vocabulary
+                parameter sets (LRU eviction, None for unbounded)
+            precision: "double" (complex128) or "single" (complex64) for
+                synthesized and cached wavefunctions
+            shared_store_file: Optional memory-mapped store through which
+                out-of-vocabulary parameters are shared by all worker processes
+            shared_store_capacity: Number of slots when creating the shared store
+            build_lock_file: Optional lock file held while GloVe, the parameter
+                table and the index are built, so concurrently starting workers
+                build them once and then attach to the files
+            knn_graph_file: Optional output prefix of knn_graph.py; if the graph
+                exists and matches the vocabulary and sigma, similar words of
+                the words it covers are read from it instead of computed
+            subword_file: Optional .npy path for the character n-gram table
+                that out-of-vocabulary vectors are composed from (built in
+                memory at load time if None)
+            subword_buckets: Number of n-gram buckets (rows of that table)
+            subword_vocab_size: Most frequent words the n-gram table is built
+                from; 0 gives out-of-vocabulary words hash-seeded vectors only
         """
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"precision must be one of {tuple(self.PRECISIONS)}, got '{precision}'")
+        if similarity_mode not in self.SIMILARITY_MODES:
+            raise ValueError(f"similarity_mode must be one of {self.SIMILARITY_MODES}, got '{similarity_mode}'")
+        
         self.num_points = num_points
         self.sigma = sigma
-        self.cache_file = cache_file or "embeddings_cache.json"
-        self.embeddings: Dict[str, np.ndarray] = {}
-        self.parameters: Dict[str, Tuple[float, float, float]] = {}
+        self.precision = precision
+        self.complex_dtype = self.PRECISIONS[precision]
+        # Shared, read-only position grids (full resolution and downsampled)
+        self.grid = make_grid(num_points)
+        self._sample_grids: Dict[int, np.ndarray] = {num_points: self.grid}
+        self.similarity_mode = similarity_mode
+        self.check_tolerance = check_tolerance
+        self.max_check_error = 0.0
+        self.cache_file = cache_file or "parameter_cache.npy"
+        self._cache_dirty = False
+        self.parameter_table_file = parameter_table_file
+        self.parameter_table: Optional[np.ndarray] = None
+        self.search_block_size = search_block_size
+        self.index_type = index_type
+        self.index_file = index_file
+        self.index_options = index_options or {}
+        self.index: Optional[SimilarityIndex] = None
+        # Hot set of full wavefunctions; they are cheap to rebuild from parameters
+        self.embeddings = LRUCache(max_bytes=cache_max_bytes)
+        # Parameters not covered by the parameter table (out-of-vocabulary words)
+        self.parameters = LRUCache(max_entries=parameter_cache_size)
+        self.glove_file = glove_file
+        self.shared_store_file = shared_store_file
+        self.shared_store_capacity = shared_store_capacity
+        self.shared_store: Optional[SharedParameterStore] = None
+        self.build_lock_file = build_lock_file
+        self.knn_graph_file = knn_graph_file
+        self.knn_graph: Optional[KNNGraph] = None
+        self.subword_file = subword_file
+        self.subword_buckets = subword_buckets
+        self.subword_vocab_size = subword_vocab_size
+        self.subwords: Optional[SubwordIndex] = None
+        self._glove = glove
+        self._ready = False
+        self._loading = False
+        self._load_lock = threading.RLock()
+        
+        if not lazy:
+            self.load()
+    
+    @property
+    def glove(self) -> KeyedVectors:
+        """GloVe vectors, loaded on first access in lazy mode."""
+        if not self._ready:
+            self.load()
+        return self._glove
+    
+    @property
+    def is_ready(self) -> bool:
+        """Whether GloVe and the derived tables have been loaded."""
+        return self._ready
+    
+    def load(self):
+        """
+        Load GloVe vectors, the parameter table, the similarity index and the cache.
+        
+        Safe to call repeatedly and from several threads; only the first call
+        does any work.
+        """
+        with self._load_lock:
+            if self._ready or self._loading:
+                return
+            self._loading = True
+            try:
+                start = time.perf_counter()
+                if self.shared_store_file:
+                    self.shared_store = SharedParameterStore(self.shared_store_file, self.shared_store_capacity)
+                
+                with FileLock(self.build_lock_file) if self.build_lock_file else contextlib.nullcontext():
+                    if self._glove is None:
+                        self._glove = self._load_glove()
+                    
+                    # Parameters for every in-vocabulary word, aligned with glove.key_to_index
+                    self._load_parameter_table()
+                    
+                    # Character n-gram vectors for out-of-vocabulary words
+                    if self.subword_vocab_size:
+                        self._load_subwords()
+                    
+                    if self.knn_graph_file:
+                        self._load_knn_graph()
+                    
+                    # Load cached embeddings if available
+                    self._load_cache()
+                    
+                    if self.index_type:
+                        self._load_index()
+                
+                self._ready = True
+                print(f"Service ready in {time.perf_counter() - start:.2f}s.")
+            finally:
+                self._loading = False
+    
+    def _load_glove(self) -> KeyedVectors:
+        """Open GloVe memory-mapped from glove_file, converting it on first use."""
+        path = self.glove_file
+        if path and os.path.exists(path):
+            print(f"Opening GloVe vectors from {path} (memory-mapped)...")
+            return KeyedVectors.load(path, mmap="r")
         
         print("Loading GloVe 300d vectors...")
         try:
-            self.glove = load("glove-wiki-gigaword-300")
+            glove = load(GLOVE_MODEL)
             print("GloVe vectors loaded successfully.")
         except Exception as e:
             print(f"Error loading GloVe vectors: {e}")
             raise
         
-        # Load cached embeddings if available
-        self._load_cache()
+        if path:
+            self._save_glove(glove, path)
+            print(f"Converted GloVe vectors to {path}; reopening memory-mapped.")
+            del glove
+            return KeyedVectors.load(path, mmap="r")
+        return glove
+    
+    @staticmethod
+    def _save_glove(glove: KeyedVectors, path: str):
+        """
+        Save converted GloVe vectors to path and path + ".vectors.npy" atomically.
+        
+        Both files are written under a temporary name in the same directory
+        and moved into place with os.replace, the .kv file last: _load_glove
+        only opens path once it exists, so a crash mid-write never leaves a
+        truncated file that memory-maps without error. Called with the build
+        lock held, so concurrent workers do not convert at the same time.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        tmp_path = os.path.join(directory, f".tmp-{os.getpid()}-{os.path.basename(path)}")
+        files = [(tmp_path + ".vectors.npy", path + ".vectors.npy"), (tmp_path, path)]
+        try:
+            glove.save(tmp_path, separately=["vectors"])
+            for tmp_file, _ in files:
+                with open(tmp_file, "rb") as f:
+                    os.fsync(f.fileno())
+            for tmp_file, final_file in files:
+                os.replace(tmp_file, final_file)
+        except BaseException:
+            for tmp_file, _ in files:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+            raise
     
     def quantum_embedding(self, word: str) -> Tuple[np.ndarray, Tuple[float, float, float]]:
         """
@@ -51,33 +321,269 @@ class PatternEmbeddingService:
         Returns:
             Tuple of (wavefunction, (alpha, beta, gamma))
         """
+        key = word.lower()
+        
         # Check cache first
-        if word in self.embeddings:
-            return self.embeddings[word], self.parameters[word]
+        psi = self.embeddings.get(key)
+        if psi is not None:
+            return psi, self.get_parameters(key)
         
-        try:
-            vec = self.glove[word.lower()]
-        except KeyError:
-            print(f"Warning: '{word}' not in GloVe vocabulary, using random vector")
-            vec = np.random.randn(300)
+        params = self.get_parameters(word)
+        psi = self.synthesize([params])[0]
         
-        # Use PCA-like projection of the full 300-dim vector into 3 meaningful parameters
-        # This preserves almost all semantic distance (300 → 3 with minimal loss)
-        alpha = vec[:100].dot(vec[100:200]) * 2.0      # ~ displacement
-        beta = vec[50:150].dot(vec[150:250]) * 4.0     # ~ chirp (stronger)
-        gamma = np.arctan2(vec[:150].sum(), vec[150:].sum()) * 3  # global phase
+        # Cache the result
+        self.embeddings[key] = psi
         
-        x = np.linspace(-12, 12, self.num_points)
-        psi = np.exp(-(x - alpha)**2 / (2*self.sigma**2) + 1j*(beta*x + gamma))
+        return psi, params
+    
+    @timed("synthesis")
+    def synthesize(self, params: np.ndarray, num_samples: Optional[int] = None) -> np.ndarray:
+        """
+        Build wavefunctions for K parameter triples in one vectorized call.
         
-        dx = 24.0 / self.num_points
-        psi /= np.sqrt(np.sum(np.abs(psi)**2) * dx + 1e-12)
+        Args:
+            params: Array of shape (K, 3) with alpha, beta, gamma
+            num_samples: Optional number of samples per wavefunction (defaults
+                to the full num_points resolution)
+            
+        Returns:
+            Array of shape (K, samples) in the service precision
+        """
+        x = self._sample_points(num_samples)
+        return synthesize_wavefunctions(params, self.sigma, self.grid,
+                                        x=None if len(x) == self.num_points else x,
+                                        dtype=self.complex_dtype)
+    
+    def wavefunctions_batch(self, words: List[str], num_samples: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build wavefunctions for many words in one vectorized call.
         
-        # Cache the result
-        self.embeddings[word.lower()] = psi
-        self.parameters[word.lower()] = (float(alpha), float(beta), float(gamma))
+        Args:
+            words: Words to embed
+            num_samples: Optional number of samples per wavefunction
+            
+        Returns:
+            Tuple of (wavefunctions of shape (K, samples), parameters of shape (K, 3))
+        """
+        params = self.get_parameters_batch(words)
+        return self.synthesize(params, num_samples), params
+    
+    @timed("lookup")
+    def get_parameters(self, word: str) -> Tuple[float, float, float]:
+        """
+        Get (alpha, beta, gamma) for a word without building its wavefunction.
+        
+        Args:
+            word: The word to embed
+            
+        Returns:
+            Tuple of (alpha, beta, gamma)
+        """
+        key = word.lower()
+        index = self.glove.key_to_index.get(key)
+        if index is not None and self.parameter_table is not None:
+            alpha, beta, gamma = self.parameter_table[index]
+            return (float(alpha), float(beta), float(gamma))
+        
+        params = self._lookup_parameters(key)
+        if params is not None:
+            return params
+        
+        if index is not None:
+            vec = self.glove.vectors[index]
+        else:
+            vec = self.oov_vectors([key])[0]
+        
+        alpha, beta, gamma = project_parameters(vec)[0]
+        return self._store_parameters(key, (float(alpha), float(beta), float(gamma)))
+    
+    def _lookup_parameters(self, key: str) -> Optional[Tuple[float, float, float]]:
+        """Find parameters not covered by the table, in the local cache or the shared store."""
+        params = self.parameters.get(key)
+        if params is None and self.shared_store is not None:
+            params = self.shared_store.get(key)
+            if params is not None:
+                self.parameters[key] = params
+        return params
+    
+    def _store_parameters(self, key: str, params: Tuple[float, float, float]) -> Tuple[float, float, float]:
+        """
+        Cache newly computed parameters and publish them to the shared store.
         
-        return psi, (float(alpha), float(beta), float(gamma))
+        If another worker published the same key first, its parameters win,
+        so every worker reports the same values for a word.
+        """
+        if self.shared_store is not None:
+            params = self.shared_store.put(key, params)
+        self.parameters[key] = params
+        self._cache_dirty = True
+        return params
+    
+    def build_parameter_table(self, path: Optional[str] = None) -> np.ndarray:
+        """
+        Precompute (alpha, beta, gamma) for the whole GloVe vocabulary.
+        
+        Row i of the table belongs to the word with glove.key_to_index[word] == i.
+        
+        Args:
+            path: Optional .npy file to persist the table to
+            
+        Returns:
+            float32 array of shape (vocabulary size, 3)
+        """
+        self.parameter_table = project_parameters(self.glove.vectors)
+        if path:
+            atomic_save_npy(path, self.parameter_table)
+            print(f"Saved parameter table for {len(self.parameter_table)} words to {path}.")
+        return self.parameter_table
+    
+    def _load_parameter_table(self):
+        """Load the parameter table from disk, or build (and persist) it."""
+        path = self.parameter_table_file
+        if path and os.path.exists(path):
+            try:
+                table = np.load(path, mmap_mode="r")
+                if table.shape == (len(self.glove.key_to_index), 3):
+                    self.parameter_table = table.astype(np.float32, copy=False)
+                    print(f"Loaded parameter table for {len(table)} words.")
+                    return
+                print(f"Parameter table {path} does not match the vocabulary, rebuilding.")
+            except Exception as e:
+                print(f"Error loading parameter table: {e}")
+        
+        self.build_parameter_table(path)
+    
+    def _load_subwords(self):
+        """Open the n-gram table for out-of-vocabulary words, or build (and persist) it."""
+        keys = self.glove.index_to_key[:self.subword_vocab_size]
+        expected = {"buckets": self.subword_buckets, "words": len(keys), "first_key": keys[0], "last_key": keys[-1]}
+        if self.subword_file:
+            try:
+                self.subwords = SubwordIndex.load(self.subword_file, expected)
+                if self.subwords is not None:
+                    print(f"Loaded subword table with {self.subword_buckets} n-gram buckets.")
+                    return
+            except Exception as e:
+                print(f"Error loading subword table: {e}")
+        
+        start = time.perf_counter()
+        self.subwords = SubwordIndex.build(self.glove.vectors[:len(keys)], keys, self.subword_buckets,
+                                           path=self.subword_file)
+        print(f"Built subword table from {len(keys)} words in {time.perf_counter() - start:.2f}s.")
+        if self.subword_file:
+            self._discard_oov_parameters()
+    
+    def _discard_oov_parameters(self):
+        """
+        Drop persisted out-of-vocabulary parameters after the subword table changed.
+        
+        They were derived from an older table (or from random vectors) and
+        would otherwise keep overriding the values the new table gives. This
+        covers the shared store, the parameter cache files, the in-process
+        cache and the out-of-vocabulary rows of the similarity index.
+        """
+        if self.shared_store is not None:
+            self.shared_store.clear()
+        self.parameters.clear()
+        legacy_file = os.path.splitext(self.cache_file)[0] + ".json"
+        for path in (self.cache_file, keys_path(self.cache_file), legacy_file, self.index_file):
+            if path and os.path.exists(path):
+                os.remove(path)
+        if self.index is not None:
+            self.build_index(self.index_file)
+        print("Discarded cached out-of-vocabulary parameters from the previous subword table.")
+    
+    def oov_vectors(self, words: List[str]) -> np.ndarray:
+        """
+        Deterministic 300-dim vectors for out-of-vocabulary words.
+        
+        Composed from character n-grams of in-vocabulary words (see
+        subword_vectors.py), or seeded from a hash of the word if no n-gram
+        table is loaded, so a word gets the same vector in every process and
+        after every restart.
+        
+        Args:
+            words: Lowercased words
+            
+        Returns:
+            float32 array of shape (len(words), 300)
+        """
+        if self.subwords is not None:
+            return self.subwords.vectors(words)
+        return np.stack([hashed_vector(w, self.glove.vector_size) for w in words]) if words \
+            else np.empty((0, self.glove.vector_size), dtype=np.float32)
+    
+    def _load_knn_graph(self):
+        """Open the precomputed kNN graph if it exists and fits the vocabulary."""
+        if not os.path.exists(self.knn_graph_file + ".json"):
+            print(f"No kNN graph at {self.knn_graph_file}; build one with 'python knn_graph.py'.")
+            return
+        try:
+            graph = KNNGraph(self.knn_graph_file)
+            if graph.matches(self.glove.index_to_key, self.sigma):
+                self.knn_graph = graph
+                print(f"Loaded kNN graph with {graph.k} neighbours for {graph.num_words} words.")
+            else:
+                print(f"kNN graph {self.knn_graph_file} was built for another vocabulary or sigma, ignoring it.")
+        except Exception as e:
+            print(f"Error loading kNN graph: {e}")
+    
+    def build_index(self, path: Optional[str] = None) -> SimilarityIndex:
+        """
+        Build the parameter-space similarity index over the whole vocabulary.
+        
+        Args:
+            path: Optional .npz file to persist the index to
+            
+        Returns:
+            The new index
+        """
+        index = create_index(self.index_type, sigma=self.sigma, **self.index_options)
+        index.build(self.glove.index_to_key, self.parameter_table)
+        for key, params in self.parameters.items():
+            index.add(key, params)
+        
+        self.index = index
+        if path:
+            index.save(path, fingerprint=self._index_fingerprint())
+            print(f"Saved {index.kind} index with {len(index)} entries to {path}.")
+        return index
+    
+    def _index_fingerprint(self) -> str:
+        """
+        Hash of the data a persisted index is built from.
+        
+        Covers the vocabulary order, the parameter table, sigma and the
+        settings of the n-gram table that derives out-of-vocabulary
+        parameters, so an index saved before any of them changed is rebuilt
+        rather than serving stale points.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(self.sigma).encode("utf-8"))
+        digest.update("\0".join(self.glove.index_to_key).encode("utf-8"))
+        digest.update(memoryview(np.ascontiguousarray(self.parameter_table)))
+        subwords = self.subwords.meta if self.subwords is not None else None
+        digest.update(json.dumps(subwords, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+    
+    def _load_index(self):
+        """Load the similarity index from disk, or build (and persist) it."""
+        path = self.index_file
+        if path and os.path.exists(path):
+            try:
+                index = SimilarityIndex.load(path, **self.index_options)
+                if index.kind == self.index_type and index.sigma == self.sigma \
+                        and index.fingerprint == self._index_fingerprint():
+                    for key, params in self.parameters.items():
+                        index.add(key, params)
+                    self.index = index
+                    print(f"Loaded {index.kind} index with {len(index)} entries.")
+                    return
+                print(f"Index {path} does not match the current configuration, rebuilding.")
+            except Exception as e:
+                print(f"Error loading index: {e}")
+        
+        self.build_index(path)
     
     def get_word_parameters(self, word: str) -> Dict[str, float]:
         """
@@ -97,6 +603,7 @@ class PatternEmbeddingService:
             "gamma": params[2]
         }
     
+    @timed("similarity")
     def quantum_similarity(self, word1: str, word2: str) -> float:
         """
         Compute quantum similarity (Born-rule fidelity) between two words.
@@ -108,119 +615,484 @@ class PatternEmbeddingService:
         Returns:
             Similarity score in [0, 1]
         """
-        psi1, _ = self.quantum_embedding(word1)
-        psi2, _ = self.quantum_embedding(word2)
+        if self.similarity_mode == "grid":
+            psi1, _ = self.quantum_embedding(word1)
+            psi2, _ = self.quantum_embedding(word2)
+            return grid_fidelity(psi1, psi2)
         
-        dx = 24.0 / len(psi1)
-        return float(np.abs(np.vdot(psi1, psi2) * dx)**2)
+        if self.similarity_mode == "check":
+            return self.check_similarity(word1, word2)["analytic"]
+        
+        return analytic_fidelity(self.get_parameters(word1), self.get_parameters(word2), self.sigma)
     
-    def add_embedding(self, word: str) -> Dict[str, any]:
+    @timed("similarity")
+    def check_similarity(self, word1: str, word2: str) -> Dict[str, float]:
+        """
+        Compare the analytic similarity with the grid computation for two words.
+        
+        The grid result differs from the closed form only through the finite
+        [-12, 12] window, so the report includes the probability mass each
+        wavepacket loses outside it.
+        
+        Args:
+            word1: First word
+            word2: Second word
+            
+        Returns:
+            Dictionary with analytic and grid fidelities, absolute error and truncated mass
+        """
+        report = fidelity_check(self.get_parameters(word1), self.get_parameters(word2),
+                                self.sigma, self.num_points)
+        self.max_check_error = max(self.max_check_error, report["abs_error"])
+        if report["abs_error"] > self.check_tolerance:
+            print(f"Warning: discretization error {report['abs_error']:.3e} for "
+                  f"('{word1.lower()}', '{word2.lower()}') exceeds {self.check_tolerance:.1e}")
+        return report
+    
+    def add_embedding(self, word: str, num_samples: Optional[int] = None,
+                      include_wavefunction: bool = True) -> Dict[str, any]:
         """
         Add an embedding to the current session.
         
         Args:
             word: The word to add
+            num_samples: Optional number of wavefunction samples to return
+                (defaults to the full num_points resolution)
+            include_wavefunction: If False, return only the parameters and the
+                grid description so the client can regenerate the curve
             
         Returns:
             Dictionary with embedding data including parameters and wavefunction
         """
-        psi, params = self.quantum_embedding(word)
+        data = self.embedding_data(word, num_samples, include_wavefunction)
+        with stage("serialization"):
+            return to_jsonable(data)
+    
+    def embedding_data(self, word: str, num_samples: Optional[int] = None,
+                       include_wavefunction: bool = True, include_x: bool = True) -> Dict[str, any]:
+        """
+        Same as add_embedding, but with wavefunction components as NumPy arrays.
         
-        # Prepare wavefunction data for frontend (sampled for efficiency)
-        x = np.linspace(-12, 12, self.num_points)
-        real_part = np.real(psi).tolist()
-        imag_part = np.imag(psi).tolist()
-        magnitude = np.abs(psi).tolist()
+        Args:
+            word: The word to add
+            num_samples: Optional number of wavefunction samples to return
+            include_wavefunction: If False, omit the wavefunction
+            include_x: If False, omit the x samples (they follow from "grid")
+            
+        Returns:
+            Dictionary with embedding data; arrays are not converted to lists
+        """
+        params = self.get_parameters(word)
+        if self.index is not None:
+            self.index.add(word.lower(), params)
+        return self._embedding_record(word.lower(), params, num_samples, include_wavefunction, include_x)
+    
+    def iter_embeddings(self, words: List[str], chunk_size: int = 256, num_samples: Optional[int] = None,
+                        include_wavefunction: bool = True, include_x: bool = True) -> Iterator[Dict[str, any]]:
+        """
+        Yield embedding records for many words, one at a time.
         
-        return {
-            "word": word.lower(),
+        Parameters are looked up in one vectorized pass per chunk of
+        chunk_size words, and at most one chunk of parameters is held at a
+        time. Wavefunctions are synthesized per chunk in one vectorized call
+        without entering the wavefunction cache, so a large batch does not
+        evict the hot set.
+        
+        Args:
+            words: Words to embed
+            chunk_size: Number of words whose parameters are computed together
+            num_samples: Optional number of wavefunction samples per record
+            include_wavefunction: If False, records only carry parameters
+            include_x: If False, omit the x samples (they follow from "grid")
+            
+        Yields:
+            Dictionaries shaped like embedding_data results (arrays not converted)
+        """
+        for start in range(0, len(words), chunk_size):
+            chunk = words[start:start + chunk_size]
+            params = self.get_parameters_batch(chunk)
+            psi = self.synthesize(params, num_samples) if include_wavefunction else None
+            for i, (word, row) in enumerate(zip(chunk, params)):
+                record_params = (float(row[0]), float(row[1]), float(row[2]))
+                yield self._embedding_record(word.lower(), record_params, num_samples, include_wavefunction,
+                                             include_x, psi=psi[i] if psi is not None else None)
+    
+    @timed("lookup")
+    def get_parameters_batch(self, words: List[str]) -> np.ndarray:
+        """
+        Get (alpha, beta, gamma) for many words in one vectorized lookup.
+        
+        In-vocabulary words are gathered from the parameter table with a
+        single fancy index; uncached out-of-vocabulary words are projected
+        together.
+        
+        Args:
+            words: Words to look up
+            
+        Returns:
+            float64 array of shape (len(words), 3)
+        """
+        keys = [w.lower() for w in words]
+        key_to_index = self.glove.key_to_index
+        indices = np.fromiter((key_to_index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+        params = np.empty((len(keys), 3), dtype=np.float64)
+        
+        known = indices >= 0
+        params[known] = self.parameter_table[indices[known]]
+        
+        missing = []
+        for i in np.flatnonzero(~known):
+            cached = self._lookup_parameters(keys[i])
+            if cached is not None:
+                params[i] = cached
+            else:
+                missing.append(i)
+        
+        if missing:
+            new_keys = list(dict.fromkeys(keys[i] for i in missing))
+            projected = project_parameters(self.oov_vectors(new_keys))
+            new_params = {
+                key: self._store_parameters(key, (float(row[0]), float(row[1]), float(row[2])))
+                for key, row in zip(new_keys, projected)
+            }
+            for i in missing:
+                params[i] = new_params[keys[i]]
+        
+        return params
+    
+    def _embedding_record(self, key: str, params: Tuple[float, float, float], num_samples: Optional[int],
+                          include_wavefunction: bool, include_x: bool,
+                          psi: Optional[np.ndarray] = None) -> Dict[str, any]:
+        """Build one embedding payload; without a precomputed psi, full-resolution curves go through the cache."""
+        data = {
+            "word": key,
             "alpha": params[0],
             "beta": params[1],
             "gamma": params[2],
-            "wavefunction": {
-                "x": x.tolist(),
-                "real": real_part,
-                "imag": imag_part,
-                "magnitude": magnitude
-            }
+            "grid": self._grid_info(num_samples)
         }
+        if not include_wavefunction:
+            return data
+        
+        # Prepare wavefunction data for frontend (sampled for efficiency)
+        x = self._sample_points(num_samples)
+        if psi is None:
+            if len(x) == self.num_points:
+                psi, _ = self.quantum_embedding(key)
+            else:
+                psi = self.synthesize([params], num_samples)[0]
+        data["wavefunction"] = self._wavefunction_arrays(psi, x if include_x else None)
+        return data
     
-    def get_embedding_space_3d(self, words: Optional[List[str]] = None) -> Dict[str, any]:
+    def _sample_points(self, num_samples: Optional[int]) -> np.ndarray:
+        """Sample positions for a response with num_samples points (full grid by default)."""
+        if num_samples is None or num_samples >= self.num_points:
+            return self.grid
+        num_samples = max(int(num_samples), 2)
+        x = self._sample_grids.get(num_samples)
+        if x is None:
+            x = make_grid(num_samples)
+            self._sample_grids[num_samples] = x
+        return x
+    
+    def _grid_info(self, num_samples: Optional[int]) -> Dict[str, any]:
+        """Description of the sample grid, enough for a client to rebuild x and psi."""
+        return {
+            "x_min": X_MIN,
+            "x_max": X_MAX,
+            "num_samples": len(self._sample_points(num_samples)),
+            "num_points": self.num_points,
+            "sigma": self.sigma
+        }
+    
+    @staticmethod
+    def _wavefunction_arrays(psi: np.ndarray, x: Optional[np.ndarray]) -> Dict[str, np.ndarray]:
+        """Split a wavefunction into the arrays sent to the frontend."""
+        arrays = {}
+        if x is not None:
+            arrays["x"] = x
+        arrays["real"] = np.real(psi)
+        arrays["imag"] = np.imag(psi)
+        arrays["magnitude"] = np.abs(psi)
+        return arrays
+    
+    def get_embedding_space_3d(self, words: Optional[List[str]] = None, bounds: Optional[List[float]] = None,
+                               level: Optional[int] = None, max_points: int = 5000) -> Dict[str, any]:
         """
         Get 3D coordinates for embedding space visualization.
         Uses (alpha, beta, gamma) as 3D coordinates.
         
+        Only parameters are looked up; no wavefunctions are built. When the
+        viewport holds more than max_points words, they are aggregated into
+        octree cells (see space_lod.py) and cluster centroids with counts are
+        returned instead of raw points.
+        
         Args:
-            words: Optional list of words to include. If None, uses all cached embeddings.
+            words: Optional list of words to include. If None, uses the words
+                currently in the LRU wavefunction cache (self.embeddings), so
+                the default view follows recent traffic and the cache budget
+                rather than the words that were loaded.
+            bounds: Optional viewport (xmin, ymin, zmin, xmax, ymax, zmax) in
+                parameter space
+            level: Optional octree level for clusters (chosen automatically if None)
+            max_points: Largest number of raw points or clusters to return
             
         Returns:
-            Dictionary with 3D coordinates and metadata
+            Columnar dictionary with mode ("points" or "clusters"), count,
+            bounds and one array per field
         """
         if words is None:
             words = list(self.embeddings.keys())
         
-        points = []
-        for word in words:
-            _, params = self.quantum_embedding(word)
-            points.append({
-                "word": word,
-                "x": params[0],  # alpha
-                "y": params[1],  # beta
-                "z": params[2],  # gamma
-                "alpha": params[0],
-                "beta": params[1],
-                "gamma": params[2]
-            })
-        
-        return {
-            "points": points,
-            "count": len(points)
-        }
+        keys = [w.lower() for w in words]
+        params = self.get_parameters_batch(keys) if keys else np.empty((0, 3))
+        with stage("aggregation"):
+            return level_of_detail(keys, params, bounds=bounds, level=level, max_points=max_points)
     
-    def compute_embedding_interaction(self, word1: str, word2: str) -> Dict[str, any]:
+    def compute_embedding_interaction(self, word1: str, word2: str, num_samples: Optional[int] = None,
+                                      include_wavefunction: bool = True) -> Dict[str, any]:
         """
         Compute quantum interaction between two embeddings (for visualization).
         
         Args:
             word1: First word
             word2: Second word
+            num_samples: Optional number of wavefunction samples to return
+            include_wavefunction: If False, omit the combined wavefunction
             
         Returns:
             Dictionary with interaction data including similarity and combined wavefunction
         """
+        data = self.interaction_data(word1, word2, num_samples, include_wavefunction)
+        with stage("serialization"):
+            return to_jsonable(data)
+    
+    def interaction_data(self, word1: str, word2: str, num_samples: Optional[int] = None,
+                         include_wavefunction: bool = True, include_x: bool = True) -> Dict[str, any]:
+        """
+        Same as compute_embedding_interaction, but with wavefunction components as NumPy arrays.
+        
+        Args:
+            word1: First word
+            word2: Second word
+            num_samples: Optional number of wavefunction samples to return
+            include_wavefunction: If False, omit the combined wavefunction
+            include_x: If False, omit the x samples (they follow from "grid")
+            
+        Returns:
+            Dictionary with interaction data; arrays are not converted to lists
+        """
         psi1, params1 = self.quantum_embedding(word1)
         psi2, params2 = self.quantum_embedding(word2)
         
-        similarity = self.quantum_similarity(word1, word2)
-        
-        # Quantum superposition (for visualization)
-        psi_combined = (psi1 + psi2) / np.sqrt(2)
-        dx = 24.0 / len(psi1)
-        psi_combined /= np.sqrt(np.sum(np.abs(psi_combined)**2) * dx + 1e-12)
+        # Both states are already at hand, so no second parameter lookup
+        if self.similarity_mode == "grid":
+            similarity = grid_fidelity(psi1, psi2)
+        elif self.similarity_mode == "check":
+            similarity = self.check_similarity(word1, word2)["analytic"]
+        else:
+            similarity = analytic_fidelity(params1, params2, self.sigma)
         
-        x = np.linspace(-12, 12, self.num_points)
-        
-        return {
+        data = {
             "word1": word1.lower(),
             "word2": word2.lower(),
             "similarity": float(similarity),
-            "combined_wavefunction": {
-                "x": x.tolist(),
-                "real": np.real(psi_combined).tolist(),
-                "imag": np.imag(psi_combined).tolist(),
-                "magnitude": np.abs(psi_combined).tolist()
-            },
-            "params1": {
-                "alpha": params1[0],
-                "beta": params1[1],
-                "gamma": params1[2]
-            },
-            "params2": {
-                "alpha": params2[0],
-                "beta": params2[1],
-                "gamma": params2[2]
-            }
+            "grid": self._grid_info(num_samples)
         }
+        
+        if include_wavefunction:
+            # Quantum superposition (for visualization)
+            psi_combined = (psi1 + psi2) / np.sqrt(2)
+            dx = 24.0 / len(psi1)
+            norm = np.sqrt(np.sum(np.abs(psi_combined)**2) * dx + 1e-12)
+            
+            x = self._sample_points(num_samples)
+            if len(x) == self.num_points:
+                psi_combined /= norm
+            else:
+                sampled = self.synthesize([params1, params2], num_samples)
+                psi_combined = (sampled[0] + sampled[1]) / (np.sqrt(2) * norm)
+            data["combined_wavefunction"] = self._wavefunction_arrays(psi_combined, x if include_x else None)
+        
+        data["params1"] = {
+            "alpha": params1[0],
+            "beta": params1[1],
+            "gamma": params1[2]
+        }
+        data["params2"] = {
+            "alpha": params2[0],
+            "beta": params2[1],
+            "gamma": params2[2]
+        }
+        return data
+    
+    def interactions_batch(self, pairs: List[Tuple[str, str]], num_samples: Optional[int] = None,
+                           include_wavefunction: bool = True, include_x: bool = True) -> Dict[str, any]:
+        """
+        Compute interactions for many word pairs in one vectorized pass.
+        
+        Each distinct word is looked up and synthesized once, however many
+        pairs it appears in. Fidelities and the normalized superpositions
+        (psi1 + psi2) / sqrt(2) of all pairs come from the same arrays; the
+        superposition norms use the overlaps on the full grid, so results
+        match interaction_data for every pair.
+        
+        Args:
+            pairs: (word1, word2) pairs
+            num_samples: Optional number of wavefunction samples to return
+            include_wavefunction: If False, return only words, parameters and
+                similarities
+            include_x: If False, omit the x samples (they follow from "grid")
+            
+        Returns:
+            Dictionary with the distinct words and their parameters as
+            columns, per-pair word indices and similarities, and, row-major
+            with one row per word or pair, the individual and combined
+            wavefunctions (arrays are not converted to lists)
+        """
+        keys = [(w1.lower(), w2.lower()) for w1, w2 in pairs]
+        position: Dict[str, int] = {}
+        for key in (k for pair in keys for k in pair):
+            position.setdefault(key, len(position))
+        words = list(position)
+        index1 = np.array([position[k1] for k1, _ in keys], dtype=np.int64)
+        index2 = np.array([position[k2] for _, k2 in keys], dtype=np.int64)
+        
+        params = self.get_parameters_batch(words) if words else np.empty((0, 3))
+        data = {
+            "words": words,
+            "params": {"alpha": params[:, 0], "beta": params[:, 1], "gamma": params[:, 2]},
+            "pairs": {"index1": index1, "index2": index2},
+            "grid": self._grid_info(num_samples)
+        }
+        
+        if include_wavefunction or self.similarity_mode == "grid":
+            full = self.synthesize(params)
+            dx = (X_MAX - X_MIN) / self.num_points
+            with stage("similarity"):
+                overlaps = np.einsum("ij,ij->i", full[index1].conj(), full[index2]) * dx
+        
+        with stage("similarity"):
+            if self.similarity_mode == "grid":
+                similarity = np.abs(overlaps)**2
+            else:
+                similarity = analytic_fidelity(params[index1], params[index2], self.sigma)
+        data["pairs"]["similarity"] = np.atleast_1d(similarity)
+        
+        if include_wavefunction:
+            x = self._sample_points(num_samples)
+            sampled = full if len(x) == self.num_points else self.synthesize(params, num_samples)
+            # ||psi1 + psi2||^2 / 2 on the full grid, from the norms and the overlap
+            norms = np.sum(np.abs(full)**2, axis=1) * dx
+            combined_norm = np.sqrt((norms[index1] + norms[index2] + 2 * overlaps.real) / 2 + 1e-12)
+            combined = (sampled[index1] + sampled[index2]) / (np.sqrt(2) * combined_norm[:, None])
+            if include_x:
+                data["x"] = x
+            data["wavefunctions"] = self._wavefunction_arrays(sampled, None)
+            data["combined_wavefunctions"] = self._wavefunction_arrays(combined, None)
+        
+        return data
+    
+    MATRIX_FORMATS = ("dense", "upper", "sparse")
+    
+    @timed("similarity")
+    def similarity_matrix(self, words: List[str], output: str = "dense", threshold: float = 0.0,
+                          block_size: int = 1024) -> Dict[str, any]:
+        """
+        Compute the pairwise Born-rule fidelity matrix for a list of words.
+        
+        The matrix is filled in block_size x block_size tiles, and only tiles
+        on or above the diagonal are computed; the lower half follows by
+        symmetry. In analytic mode each tile is a broadcast of the closed
+        form over parameter arrays; in grid mode it is the complex matrix
+        product of the stacked wavefunctions of the two blocks. Working
+        memory is bounded by the tile size; "upper" and "sparse" outputs also
+        avoid materializing the full N x N matrix.
+        
+        Args:
+            words: Words to compare
+            output: "dense" (N x N matrix), "upper" (strict upper triangle,
+                row-major, as a flat array) or "sparse" (pairs i < j with
+                fidelity >= threshold as rows/cols/values arrays)
+            threshold: Minimum fidelity kept in sparse output
+            block_size: Tile edge length
+            
+        Returns:
+            Dictionary with the normalized words and the matrix in the requested form
+        """
+        if output not in self.MATRIX_FORMATS:
+            raise ValueError(f"output must be one of {self.MATRIX_FORMATS}, got '{output}'")
+        
+        keys = [w.lower() for w in words]
+        params = self.get_parameters_batch(words)
+        n = len(keys)
+        
+        result = {"words": keys, "count": n, "format": output}
+        if output == "dense":
+            matrix = np.empty((n, n), dtype=np.float32)
+        elif output == "upper":
+            upper = np.empty(n * (n - 1) // 2, dtype=np.float32)
+        else:
+            rows, cols, values = [], [], []
+        
+        for i0 in range(0, n, block_size):
+            i1 = min(i0 + block_size, n)
+            for j0 in range(i0, n, block_size):
+                j1 = min(j0 + block_size, n)
+                tile = self._fidelity_tile(params[i0:i1], params[j0:j1])
+                
+                if output == "dense":
+                    matrix[i0:i1, j0:j1] = tile
+                    matrix[j0:j1, i0:i1] = tile.T
+                    continue
+                
+                ii, jj = np.nonzero(np.arange(j0, j1)[None, :] > np.arange(i0, i1)[:, None])
+                scores = tile[ii, jj]
+                ii += i0
+                jj += j0
+                if output == "upper":
+                    upper[ii * n - ii * (ii + 1) // 2 + (jj - ii - 1)] = scores
+                else:
+                    keep = scores >= threshold
+                    rows.append(ii[keep].astype(np.int32))
+                    cols.append(jj[keep].astype(np.int32))
+                    values.append(scores[keep].astype(np.float32))
+        
+        if output == "dense":
+            result["matrix"] = matrix
+        elif output == "upper":
+            result["upper"] = upper
+        else:
+            result["threshold"] = threshold
+            result["rows"] = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+            result["cols"] = np.concatenate(cols) if cols else np.empty(0, dtype=np.int32)
+            result["values"] = np.concatenate(values) if values else np.empty(0, dtype=np.float32)
+            result["nnz"] = len(result["values"])
+        return result
+    
+    @timed("similarity")
+    def score_parameters(self, params: np.ndarray, query_params: np.ndarray) -> np.ndarray:
+        """
+        Fidelities of many parameter rows against a few query rows.
+        
+        Args:
+            params: Array of shape (N, 3)
+            query_params: Array of shape (Q, 3)
+            
+        Returns:
+            Array of shape (N, Q), computed with the configured similarity mode
+        """
+        return self._fidelity_tile(np.asarray(params, dtype=np.float64), np.asarray(query_params, dtype=np.float64))
+    
+    def _fidelity_tile(self, params_a: np.ndarray, params_b: np.ndarray) -> np.ndarray:
+        """Fidelities between two blocks of parameter rows, shape (len(params_a), len(params_b))."""
+        if self.similarity_mode != "grid":
+            return analytic_fidelity(params_a[:, None, :], params_b[None, :, :], self.sigma)
+        
+        psi_a = self.synthesize(params_a)
+        psi_b = self.synthesize(params_b)
+        dx = 24.0 / self.num_points
+        return np.abs(psi_a.conj() @ psi_b.T * dx)**2
     
     def batch_load_embeddings(self, words: List[str]) -> Dict[str, any]:
         """
@@ -233,15 +1105,44 @@ class PatternEmbeddingService:
             Dictionary with all embeddings
         """
         results = {}
-        for word in words:
-            results[word.lower()] = self.add_embedding(word)
+        for key, record in self.iter_batch_embeddings(words):
+            with stage("serialization"):
+                results[key] = to_jsonable(record)
         
         return {
             "embeddings": results,
             "count": len(results)
         }
     
-    def get_similar_words(self, word: str, top_k: int = 10, exclude_words: Optional[List[str]] = None) -> List[Dict[str, any]]:
+    def iter_batch_embeddings(self, words: List[str], chunk_size: int = 64) -> Iterator[Tuple[str, Dict[str, any]]]:
+        """
+        Yield the records of batch_load_embeddings one at a time.
+        
+        Wavefunctions are synthesized per chunk of chunk_size words and, as
+        in batch_load_embeddings, enter the wavefunction cache and the
+        similarity index.
+        
+        Args:
+            words: Words to load
+            chunk_size: Number of words synthesized together
+            
+        Yields:
+            Tuples of (lowercased word, record with arrays not converted)
+        """
+        for start in range(0, len(words), chunk_size):
+            chunk = words[start:start + chunk_size]
+            psi, params = self.wavefunctions_batch(chunk)
+            for word, psi_word, row in zip(chunk, psi, params):
+                key = word.lower()
+                record_params = (float(row[0]), float(row[1]), float(row[2]))
+                # Copy so the cache does not keep the whole batch array alive
+                self.embeddings[key] = psi_word.copy()
+                if self.index is not None:
+                    self.index.add(key, record_params)
+                yield key, self._embedding_record(key, record_params, None, True, True, psi=psi_word)
+    
+    def get_similar_words(self, word: str, top_k: int = 10, exclude_words: Optional[List[str]] = None,
+                          scope: str = "cache", block_size: Optional[int] = None) -> List[Dict[str, any]]:
         """
         Find most similar words to a given word.
         
@@ -249,53 +1150,195 @@ class PatternEmbeddingService:
             word: The query word
             top_k: Number of similar words to return
             exclude_words: Words to exclude from results
+            scope: "cache" searches the embeddings loaded so far, "vocabulary"
+                searches the whole GloVe vocabulary, "index" queries the
+                parameter-space index (vocabulary plus added words), "graph"
+                reads the precomputed kNN graph (neighbours among the words
+                it covers). "vocabulary" and "graph" are answered from the
+                graph when it covers the word and holds enough neighbours,
+                and fall back to the vocabulary search otherwise
+            block_size: Candidates scored per block in vocabulary and cache
+                scope (defaults to search_block_size)
             
         Returns:
             List of similar words with similarity scores
         """
-        exclude_words = exclude_words or []
-        all_words = [w for w in self.embeddings.keys() if w != word.lower() and w not in exclude_words]
+        self.load()
+        if scope in ("vocabulary", "graph"):
+            covers_vocabulary = self.knn_graph is not None and self.knn_graph.num_words == len(self.parameter_table)
+            if scope == "graph" or covers_vocabulary:
+                similar = self._similar_words_graph(word, top_k, exclude_words)
+                if similar is not None:
+                    return similar
+            return self._similar_words_vocabulary(word, top_k, exclude_words, block_size or self.search_block_size)
+        if scope == "index":
+            return self._similar_words_index(word, top_k, exclude_words)
+        if scope != "cache":
+            raise ValueError(f"scope must be 'cache', 'vocabulary', 'index' or 'graph', got '{scope}'")
+        return self._similar_words_cache(word, top_k, exclude_words, block_size or self.search_block_size)
+    
+    @timed("similarity")
+    def _similar_words_cache(self, word: str, top_k: int, exclude_words: Optional[List[str]],
+                             block_size: int) -> List[Dict[str, any]]:
+        """
+        Top-k search over the embeddings loaded so far.
+        
+        Uses the blocked search of the vocabulary scope: in "grid" mode on
+        the cached wavefunctions, otherwise with the analytic fidelity on
+        the cached words' parameters ("check" mode scores analytically too,
+        without a grid check per candidate).
+        """
+        if top_k <= 0:
+            return []
         
-        similarities = []
-        for other_word in all_words:
-            sim = self.quantum_similarity(word, other_word)
-            similarities.append({
-                "word": other_word,
-                "similarity": float(sim)
-            })
+        excluded = {word.lower()} | {w.lower() for w in (exclude_words or [])}
+        if self.similarity_mode == "grid":
+            # One snapshot, so evictions during the search cannot drop a row
+            cached = [(key, psi) for key, psi in self.embeddings.items() if key not in excluded]
+            words = [key for key, _ in cached]
+            query, _ = self.quantum_embedding(word)
+            query = np.conj(query)
+            dx = (X_MAX - X_MIN) / len(query)
+            
+            def score_block(start: int, stop: int) -> np.ndarray:
+                block = np.stack([psi for _, psi in cached[start:stop]])
+                return np.abs((block @ query) * dx).astype(np.float64) ** 2
+        else:
+            words = [key for key in self.embeddings.keys() if key not in excluded]
+            params = self.get_parameters_batch(words)
+            query = np.asarray(self.get_parameters(word), dtype=np.float64)
+            
+            def score_block(start: int, stop: int) -> np.ndarray:
+                return analytic_fidelity(params[start:stop], query, self.sigma)
         
-        similarities.sort(key=lambda x: x["similarity"], reverse=True)
-        return similarities[:top_k]
+        indices, scores = top_k_blocks(score_block, len(words), top_k, block_size)
+        return [{"word": words[i], "similarity": float(score)} for i, score in zip(indices, scores)]
+    
+    @timed("similarity")
+    def _similar_words_vocabulary(self, word: str, top_k: int, exclude_words: Optional[List[str]],
+                                  block_size: int) -> List[Dict[str, any]]:
+        """
+        Top-k search over the whole vocabulary using the parameter table.
+        
+        Candidates are scored in blocks of block_size rows with the analytic
+        fidelity (see top_k_blocks), so peak memory is bounded by the block
+        size rather than the vocabulary.
+        """
+        query = np.asarray(self.get_parameters(word), dtype=np.float64)
+        excluded = {word.lower()} | {w.lower() for w in (exclude_words or [])}
+        excluded_indices = np.array(
+            [self.glove.key_to_index[w] for w in excluded if w in self.glove.key_to_index], dtype=np.int64
+        )
+        
+        table = self.parameter_table
+        indices, scores = top_k_blocks(
+            lambda start, stop: analytic_fidelity(table[start:stop], query, self.sigma),
+            len(table), top_k, block_size, excluded_indices
+        )
+        index_to_key = self.glove.index_to_key
+        return [{"word": index_to_key[i], "similarity": float(score)} for i, score in zip(indices, scores)]
+    
+    @timed("index")
+    def _similar_words_graph(self, word: str, top_k: int,
+                             exclude_words: Optional[List[str]]) -> Optional[List[Dict[str, any]]]:
+        """
+        Read similar words from the kNN graph.
+        
+        Returns:
+            The top_k neighbours, or None if the graph does not cover the word
+            or has too few neighbours left after exclusions
+        """
+        graph = self.knn_graph
+        row = self.glove.key_to_index.get(word.lower()) if graph is not None else None
+        if row is None or row >= graph.num_words:
+            return None
+        
+        neighbours, scores = graph.neighbours(row)
+        index_to_key = self.glove.index_to_key
+        excluded = {w.lower() for w in (exclude_words or [])}
+        similar = [
+            {"word": index_to_key[i], "similarity": float(score)}
+            for i, score in zip(neighbours.tolist(), scores.tolist())
+            if index_to_key[i] not in excluded
+        ]
+        if len(similar) < top_k:
+            return None
+        return similar[:top_k]
+    
+    @timed("index")
+    def _similar_words_index(self, word: str, top_k: int, exclude_words: Optional[List[str]]) -> List[Dict[str, any]]:
+        """Top-k search through the parameter-space index, re-ranked exactly."""
+        if self.index is None:
+            raise ValueError("No similarity index configured; pass index_type to the service")
+        
+        excluded = {word.lower()} | {w.lower() for w in (exclude_words or [])}
+        results = self.index.query(self.get_parameters(word), top_k, exclude=excluded)
+        return [{"word": key, "similarity": score} for key, score in results]
     
     def _load_cache(self):
-        """Load cached embeddings from file if it exists."""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    cache = json.load(f)
-                    # Note: We don't cache the full wavefunctions, just parameters
-                    # Full wavefunctions are recomputed on demand
-                    if "parameters" in cache:
-                        self.parameters = {k: tuple(v) for k, v in cache["parameters"].items()}
-                print(f"Loaded {len(self.parameters)} cached parameter sets.")
-            except Exception as e:
-                print(f"Error loading cache: {e}")
+        """Load cached parameter sets from the binary cache (or a legacy JSON cache)."""
+        try:
+            cached = load_parameters(self.cache_file)
+            legacy_file = os.path.splitext(self.cache_file)[0] + ".json"
+            if not cached and os.path.exists(legacy_file):
+                with open(legacy_file, 'r') as f:
+                    cached = {k: tuple(v) for k, v in json.load(f).get("parameters", {}).items()}
+                # Rewrite in the binary format on the next flush
+                self._cache_dirty = bool(cached)
+            
+            # Note: We don't cache the full wavefunctions, just parameters
+            # Full wavefunctions are recomputed on demand
+            self.parameters.update(cached)
+            if cached:
+                print(f"Loaded {len(cached)} cached parameter sets.")
+        except Exception as e:
+            print(f"Error loading cache: {e}")
     
     def _save_cache(self):
-        """Save current embeddings cache to file."""
+        """Merge cached parameter sets into the binary cache file."""
         try:
-            cache = {
-                "parameters": {k: list(v) for k, v in self.parameters.items()}
-            }
-            with open(self.cache_file, 'w') as f:
-                json.dump(cache, f, indent=2)
+            count = merge_parameters(self.cache_file, self.parameters.items(),
+                                     max_entries=self.parameters.max_entries)
+            self._cache_dirty = False
+            print(f"Saved {count} cached parameter sets to {self.cache_file}.")
         except Exception as e:
             print(f"Error saving cache: {e}")
     
+    def flush_cache(self) -> bool:
+        """
+        Persist cached parameter sets if any were added since the last flush.
+        
+        Returns:
+            True if the cache was written
+        """
+        if not self._cache_dirty or not self._ready:
+            return False
+        if self.shared_store is not None:
+            self.shared_store.flush()
+        self._save_cache()
+        return not self._cache_dirty
+    
+    def cache_stats(self) -> Dict[str, any]:
+        """
+        Get statistics for the in-memory caches.
+        
+        Returns:
+            Dictionary with hit/miss/eviction counters for wavefunctions and parameters
+        """
+        stats = {
+            "embeddings": self.embeddings.stats(),
+            "parameters": self.parameters.stats()
+        }
+        if self.shared_store is not None:
+            stats["shared_store"] = self.shared_store.stats()
+        return stats
+    
     def clear_cache(self):
         """Clear all cached embeddings."""
         self.embeddings.clear()
         self.parameters.clear()
-        if os.path.exists(self.cache_file):
-            os.remove(self.cache_file)
+        self._cache_dirty = False
+        for path in (self.cache_file, keys_path(self.cache_file)):
+            if os.path.exists(path):
+                os.remove(path)
 
@@ -0,0 +1,178 @@
+"""
+HTTP response cache for deterministic endpoints.
+
+For in-vocabulary words, /api/word, /api/embedding and /api/interaction are
+pure functions of their inputs and the service configuration, so their
+serialized bodies can be reused. ResponseCache keeps those bodies as bytes
+in a byte-budgeted LRU cache and answers repeat requests without calling
+the service or re-encoding anything.
+
+ETags are strong validators derived from a hash of the body, so they stay
+valid across restarts and workers as long as the output is unchanged, and
+clients (or a reverse proxy) that send If-None-Match get a 304.
+
+With a Compressor, each entry also keeps its gzip/brotli encodings, made
+once when the entry is prepared, and repeat requests get the variant their
+Accept-Encoding asks for without compressing anything again.
+
+An entry may also hold several variants of one computation (both word
+orders of an interaction), so a single key serves all of them.
+"""
+import hashlib
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple, Union
+
+from fastapi.responses import Response
+
+from compression import Compressor, encoded_etag
+from embedding_cache import LRUCache
+
+
+class CachedResponse:
+    """Serialized response body with its media type, ETag and encoded variants."""
+
+    __slots__ = ("body", "media_type", "etag", "encoded")
+
+    def __init__(self, body: bytes, media_type: str, encoded: Optional[Dict[str, bytes]] = None):
+        self.body = body
+        self.media_type = media_type
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.encoded = encoded or {}
+
+    @property
+    def size(self) -> int:
+        """Bytes held by the body and all its encodings."""
+        return len(self.body) + sum(len(data) for data in self.encoded.values())
+
+
+def entry_size(entry: Union[CachedResponse, Tuple[CachedResponse, ...]]) -> int:
+    """Bytes held by a cache entry (a response or a tuple of variants)."""
+    if isinstance(entry, tuple):
+        return sum(cached.size for cached in entry)
+    return entry.size
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an ETag.
+
+    Args:
+        if_none_match: Value of the If-None-Match request header
+        etag: Current strong ETag (quoted)
+
+    Returns:
+        True for "*" or if any listed tag matches (weak comparison, as
+        RFC 9110 requires for If-None-Match)
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """Byte-bounded LRU cache of serialized responses with conditional-request handling."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_age: int = 3600,
+                 compressor: Optional[Compressor] = None):
+        """
+        Args:
+            max_bytes: Byte budget for cached bodies and their encodings
+            max_age: Seconds clients and proxies may reuse a response
+                (sent as Cache-Control: public, max-age=...)
+            compressor: Encodes entries for clients that accept gzip/brotli
+                (None to cache and send bodies uncompressed)
+        """
+        self.entries = LRUCache(max_bytes=max_bytes, sizeof=entry_size)
+        self.max_age = max_age
+        self.compressor = compressor
+        self.not_modified = 0
+
+    def get(self, key: Hashable) -> Optional[Union[CachedResponse, Tuple[CachedResponse, ...]]]:
+        return self.entries.get(key)
+
+    def prepare(self, response: Union[Response, Sequence[Response]]) -> Union[CachedResponse, Tuple[CachedResponse, ...]]:
+        """
+        Build the entry for a rendered response, compressing its body.
+
+        Compression is CPU-bound, so this is meant to run on the executor
+        together with the computation of the response.
+
+        Args:
+            response: Response whose body and media type are cached, or a
+                list of variants of one computation
+
+        Returns:
+            The entry (a tuple for a list of variants), not yet stored
+        """
+        if isinstance(response, (list, tuple)):
+            return tuple(self.prepare(variant) for variant in response)
+        body = bytes(response.body)
+        encoded = self.compressor.variants(body, response.media_type) if self.compressor is not None else None
+        return CachedResponse(body, response.media_type, encoded)
+
+    def put(self, key: Hashable, cached: Union[CachedResponse, Tuple[CachedResponse, ...]]
+            ) -> Union[CachedResponse, Tuple[CachedResponse, ...]]:
+        """
+        Store an entry from prepare.
+
+        Args:
+            key: Normalized request inputs
+            cached: Entry to store
+
+        Returns:
+            The cached entry
+        """
+        self.entries[key] = cached
+        return cached
+
+    def respond(self, cached: CachedResponse, if_none_match: Optional[str],
+                accept_encoding: Optional[str] = None) -> Response:
+        """
+        Build the response for a cached entry.
+
+        Args:
+            cached: Cached entry
+            if_none_match: Value of the If-None-Match request header
+            accept_encoding: Value of the Accept-Encoding request header
+
+        Returns:
+            304 Not Modified if the client already has this ETag, otherwise
+            the cached body in the best encoding the client accepts; both
+            carry ETag, Cache-Control and Vary headers
+        """
+        encoding = None
+        if cached.encoded:
+            encoding = self.compressor.choose(accept_encoding)
+            if encoding not in cached.encoded:
+                encoding = None
+        etag = encoded_etag(cached.etag, encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={self.max_age}",
+            "Vary": "Accept, Accept-Encoding" if self.compressor is not None else "Accept"
+        }
+        if etag_matches(if_none_match, etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(content=cached.body, media_type=cached.media_type, headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(content=cached.encoded[encoding], media_type=cached.media_type, headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics.
+
+        Returns:
+            LRU statistics plus the number of 304 responses sent
+        """
+        stats = self.entries.stats()
+        stats["not_modified"] = self.not_modified
+        return stats
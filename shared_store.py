@@ -0,0 +1,227 @@
+"""
+Cross-process storage shared by all uvicorn workers.
+
+GloVe vectors and the parameter table are opened memory-mapped read-only, so
+every worker already shares one copy through the page cache; FileLock makes
+sure only one worker builds those files while the others wait and then
+attach to them.
+
+Parameters for out-of-vocabulary words are computed at request time, so
+they live in SharedParameterStore: a fixed-capacity open-addressing hash
+table in a memory-mapped .npy file. Lookups are lock-free; inserts take an
+exclusive file lock, so the first worker to compute a word publishes it and
+every other worker reads the same values from then on.
+"""
+import hashlib
+import os
+import threading
+import numpy as np
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MAX_KEY_BYTES = 64
+MAX_PROBES = 128
+
+RECORD_DTYPE = np.dtype([
+    ("hash", "<u8"),
+    ("params", "<f4", (3,)),
+    ("key", f"S{MAX_KEY_BYTES}")
+])
+
+
+class FileLock:
+    """
+    Exclusive lock on a file, usable as a context manager.
+
+    Excludes other processes through the file and other threads of this
+    process through a threading.Lock, which is taken first so that only one
+    thread at a time owns the file descriptor.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self) -> "FileLock":
+        self._thread_lock.acquire()
+        try:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        except BaseException:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            os.close(self._fd)
+        finally:
+            self._fd = None
+            self._thread_lock.release()
+
+
+def key_hash(key: str) -> int:
+    """Stable, non-zero 64-bit hash of a key (zero marks an empty slot)."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+def encode_key(key: str) -> Optional[bytes]:
+    """
+    UTF-8 bytes of a key as stored in the table's S64 field.
+
+    NumPy's S dtype truncates to its size and strips trailing NUL bytes, so
+    a key that would not read back unchanged is not stored: it would never
+    match on lookup and would be inserted again on every put.
+
+    Returns:
+        The encoded key, or None if it is longer than MAX_KEY_BYTES or ends
+        with a NUL byte
+    """
+    encoded = key.encode("utf-8")
+    if len(encoded) > MAX_KEY_BYTES or encoded.endswith(b"\0"):
+        return None
+    return encoded
+
+
+class SharedParameterStore:
+    """
+    Memory-mapped hash table of (alpha, beta, gamma) keyed by word.
+
+    Keys that encode_key rejects (longer than MAX_KEY_BYTES UTF-8 bytes or
+    ending in NUL) are not stored; callers keep those in their
+    process-local cache.
+    """
+
+    def __init__(self, path: str, capacity: int = 1 << 18):
+        """
+        Open the store, creating it with the given capacity if it does not exist.
+
+        Args:
+            path: .npy file holding the table (a .lock file is created next to it)
+            capacity: Number of slots for a new store; keep the number of
+                stored words well below it
+        """
+        self.path = path
+        self.lock = FileLock(os.path.splitext(path)[0] + ".lock")
+        self.rejected = 0
+
+        with self.lock:
+            if not os.path.exists(path):
+                table = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=RECORD_DTYPE, shape=(capacity,))
+                table.flush()
+                del table
+                os.replace(path + ".tmp", path)
+
+        self.table = np.load(path, mmap_mode="r+")
+        if self.table.dtype != RECORD_DTYPE:
+            raise ValueError(f"{path} is not a shared parameter store")
+        self.capacity = len(self.table)
+
+    def _probe(self, key: str, encoded: bytes, h: int) -> Tuple[Optional[int], bool]:
+        """Find the slot for a key: (slot, found), or (None, False) if the probe limit is hit."""
+        hashes = self.table["hash"]
+        start = h % self.capacity
+        for step in range(min(MAX_PROBES, self.capacity)):
+            slot = (start + step) % self.capacity
+            slot_hash = int(hashes[slot])
+            if slot_hash == 0:
+                return slot, False
+            if slot_hash == h and self.table["key"][slot] == encoded:
+                return slot, True
+        return None, False
+
+    def get(self, key: str) -> Optional[Tuple[float, float, float]]:
+        """
+        Look up a key without locking.
+
+        Args:
+            key: Word to look up
+
+        Returns:
+            (alpha, beta, gamma), or None if the key is not stored
+        """
+        encoded = encode_key(key)
+        if encoded is None:
+            return None
+        slot, found = self._probe(key, encoded, key_hash(key))
+        if not found:
+            return None
+        alpha, beta, gamma = self.table["params"][slot]
+        return (float(alpha), float(beta), float(gamma))
+
+    def put(self, key: str, params: Tuple[float, float, float]) -> Tuple[float, float, float]:
+        """
+        Publish parameters for a key unless another process already has.
+
+        Args:
+            key: Word to store
+            params: (alpha, beta, gamma) computed by this process
+
+        Returns:
+            The parameters stored for the key, which are another process's
+            if it published first, or params if the key cannot be stored
+        """
+        encoded = encode_key(key)
+        if encoded is None:
+            return params
+
+        h = key_hash(key)
+        with self.lock:
+            slot, found = self._probe(key, encoded, h)
+            if found:
+                alpha, beta, gamma = self.table["params"][slot]
+                return (float(alpha), float(beta), float(gamma))
+            if slot is None:
+                self.rejected += 1
+                return params
+
+            # The hash is written last: readers treat a slot as filled only once it is set
+            self.table["params"][slot] = np.asarray(params[:3], dtype=np.float32)
+            self.table["key"][slot] = encoded
+            self.table["hash"][slot] = h
+
+        alpha, beta, gamma = self.table["params"][slot]
+        return (float(alpha), float(beta), float(gamma))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Occupancy statistics.
+
+        Returns:
+            Dictionary with entry count, capacity, load factor and rejected inserts
+        """
+        entries = int(np.count_nonzero(self.table["hash"]))
+        return {
+            "entries": entries,
+            "capacity": self.capacity,
+            "load_factor": entries / self.capacity,
+            "rejected": self.rejected
+        }
+
+    def clear(self):
+        """Remove every entry, e.g. after the way parameters are derived has changed."""
+        with self.lock:
+            self.table["hash"][:] = 0
+            self.table.flush()
+
+    def flush(self):
+        """Write dirty pages back to the file."""
+        self.table.flush()
@@ -0,0 +1,417 @@
+"""
+Nearest-neighbour indexes over the (alpha, beta, gamma) parameter space.
+
+The analytic fidelity only depends on the parameter differences,
+
+    F = exp(-(alpha1 - alpha2)^2 / (2 sigma^2) - sigma^2 (beta1 - beta2)^2 / 2)
+
+so in the scaled coordinates (u, v) = (alpha / sigma, sigma * beta) it
+becomes F = exp(-d^2 / 2), with d the Euclidean distance. The top-k most
+similar words are therefore the k nearest neighbours in (u, v), and a
+minimum fidelity F_min bounds the search to the radius sqrt(-2 ln F_min).
+Gamma is a global phase and does not take part in the search.
+
+Candidates found in (u, v) are re-ranked with the exact analytic fidelity.
+"""
+import math
+import threading
+import time
+import numpy as np
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from scipy.spatial import cKDTree
+
+from fidelity import analytic_fidelity
+
+KEY_SEPARATOR = "\0"
+DEFAULT_MAX_ADDED = 4096
+
+
+class SimilarityIndex(ABC):
+    """
+    Base class for parameter-space similarity indexes.
+
+    build() indexes a fixed set of keys (the vocabulary) in a static search
+    structure; subclasses implement _rebuild and _candidates for it. Keys
+    added later (out-of-vocabulary words seen at request time) go to a ring
+    buffer of at most max_added rows that every query scans by brute force;
+    once it is full the oldest added key is dropped. Inserts therefore never
+    touch, or rebuild, the search structure, and memory stays bounded however
+    many distinct words clients send. The base class handles key
+    bookkeeping, exact re-ranking, persistence and statistics; a lock keeps
+    inserts and queries consistent across the executor's worker threads.
+    """
+
+    kind = "base"
+
+    def __init__(self, sigma: float, min_fidelity: float = 1e-6, recall_sample_rate: float = 0.0,
+                 latency_window: int = 1000, max_added: int = DEFAULT_MAX_ADDED):
+        """
+        Args:
+            sigma: Width parameter shared by all wavepackets
+            min_fidelity: Candidates below this fidelity are pruned; sets the
+                search radius sqrt(-2 ln min_fidelity) in scaled coordinates
+            recall_sample_rate: Fraction of queries that are also answered by
+                brute force to measure recall
+            latency_window: Number of recent query latencies kept for percentiles
+            max_added: Keys kept from add() (0 disables incremental inserts)
+        """
+        if not 0.0 < min_fidelity < 1.0:
+            raise ValueError(f"min_fidelity must be in (0, 1), got {min_fidelity}")
+        if max_added < 0:
+            raise ValueError(f"max_added must not be negative, got {max_added}")
+
+        self.sigma = sigma
+        self.min_fidelity = min_fidelity
+        self.radius = math.sqrt(-2.0 * math.log(min_fidelity))
+        self.recall_sample_rate = recall_sample_rate
+        self.max_added = max_added
+
+        self._lock = threading.RLock()
+        # Keys and rows given to build(), searched through the subclass structure
+        self.base_keys: List[str] = []
+        self.key_to_id: Dict[str, int] = {}
+        self.base_params = np.empty((0, 3), dtype=np.float32)
+        # Ring buffer of added keys; slot i of _added_params belongs to _added_keys[i]
+        self._added_keys: List[str] = []
+        self._added_slot: Dict[str, int] = {}
+        self._added_params = np.empty((max_added, 3), dtype=np.float32)
+        self._next_slot = 0
+        self.evicted = 0
+        # Identifies what a saved index was built from (see save)
+        self.fingerprint: Optional[str] = None
+
+        self._latencies = deque(maxlen=latency_window)
+        self._queries = 0
+        self._recall_samples = 0
+        self._recall_total = 0.0
+        self._rng = np.random.default_rng()
+
+    def __len__(self) -> int:
+        return len(self.base_keys) + len(self._added_keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key_to_id or key in self._added_slot
+
+    @property
+    def keys(self) -> List[str]:
+        """Base keys followed by the added keys (in ring-buffer order)."""
+        return self.base_keys + self._added_keys
+
+    @property
+    def params(self) -> np.ndarray:
+        """(alpha, beta, gamma) of the keys, shape (len(self), 3)."""
+        return np.concatenate([self.base_params, self._added_params[:len(self._added_keys)]])
+
+    def scale(self, params: np.ndarray) -> np.ndarray:
+        """Map (alpha, beta, gamma) rows to the (u, v) search coordinates."""
+        params = np.atleast_2d(params)
+        return np.column_stack((params[:, 0] / self.sigma, params[:, 1] * self.sigma))
+
+    def build(self, keys: Sequence[str], params: np.ndarray):
+        """
+        Replace the index contents, dropping added keys.
+
+        Args:
+            keys: One key per row of params
+            params: Array of shape (N, 3) with alpha, beta, gamma
+        """
+        if len(keys) != len(params):
+            raise ValueError(f"Got {len(keys)} keys for {len(params)} parameter rows")
+
+        with self._lock:
+            self.base_keys = list(keys)
+            self.key_to_id = {key: i for i, key in enumerate(self.base_keys)}
+            self.base_params = np.asarray(params, dtype=np.float32).reshape(-1, 3)
+            self._added_keys = []
+            self._added_slot = {}
+            self._next_slot = 0
+            self._rebuild()
+
+    def add(self, key: str, params: Sequence[float]) -> bool:
+        """
+        Insert a single key into the ring buffer of added keys.
+
+        Args:
+            key: Key to insert
+            params: (alpha, beta, gamma)
+
+        Returns:
+            True if the key was inserted, False if it was already indexed
+            (or max_added is 0)
+        """
+        if key in self:
+            return False
+        if KEY_SEPARATOR in key:
+            raise ValueError("Index keys must not contain NUL characters")
+
+        with self._lock:
+            if key in self or self.max_added == 0:
+                return False
+            slot = self._next_slot
+            if slot < len(self._added_keys):
+                del self._added_slot[self._added_keys[slot]]
+                self._added_keys[slot] = key
+                self.evicted += 1
+            else:
+                self._added_keys.append(key)
+            self._added_slot[key] = slot
+            self._added_params[slot] = np.asarray(params, dtype=np.float32)[:3]
+            self._next_slot = (slot + 1) % self.max_added
+            return True
+
+    def query(self, params: Sequence[float], top_k: int = 10,
+              exclude: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Find the most similar indexed keys.
+
+        Args:
+            params: Query (alpha, beta, gamma)
+            top_k: Number of results
+            exclude: Keys to leave out of the results
+
+        Returns:
+            List of (key, fidelity) sorted by decreasing fidelity
+        """
+        start = time.perf_counter()
+        exclude = set(exclude or [])
+        query = np.asarray(params, dtype=np.float64)
+
+        with self._lock:
+            results = []
+            if top_k > 0 and len(self) > 0:
+                candidates = np.empty(0, dtype=np.int64)
+                if self.base_keys:
+                    excluded_base = sum(1 for k in exclude if k in self.key_to_id)
+                    candidates = self._candidates(self.scale(query)[0], top_k + excluded_base)
+                results = self._rerank(query, candidates, top_k, exclude)
+
+            self._latencies.append(time.perf_counter() - start)
+            self._queries += 1
+
+            if self.recall_sample_rate > 0 and self._rng.random() < self.recall_sample_rate:
+                self._record_recall(query, top_k, exclude, results)
+
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Query latency and recall statistics.
+
+        Returns:
+            Dictionary with size, added keys, pruning settings, latency
+            percentiles (ms) over the recent window and mean sampled recall
+        """
+        latencies = np.array(self._latencies) * 1000.0
+        return {
+            "kind": self.kind,
+            "size": len(self),
+            "added": len(self._added_keys),
+            "max_added": self.max_added,
+            "evicted": self.evicted,
+            "min_fidelity": self.min_fidelity,
+            "radius": self.radius,
+            "queries": self._queries,
+            "latency_ms_mean": float(latencies.mean()) if len(latencies) else 0.0,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            "latency_ms_max": float(latencies.max()) if len(latencies) else 0.0,
+            "recall_samples": self._recall_samples,
+            "recall": self._recall_total / self._recall_samples if self._recall_samples else None
+        }
+
+    def save(self, path: str, fingerprint: Optional[str] = None):
+        """
+        Save the base keys and parameters to an .npz file.
+
+        Added keys are not saved; they come from request traffic and are
+        added again as it arrives.
+
+        Args:
+            path: Destination file
+            fingerprint: Optional description of the data the index was
+                built from; load() restores it so callers can detect a
+                stale file
+        """
+        keys = np.frombuffer(KEY_SEPARATOR.join(self.base_keys).encode("utf-8"), dtype=np.uint8)
+        np.savez(path, kind=self.kind, sigma=self.sigma, min_fidelity=self.min_fidelity,
+                 keys=keys, params=self.base_params, fingerprint=fingerprint or "")
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "SimilarityIndex":
+        """
+        Load an index saved with save() and rebuild its search structure.
+
+        Args:
+            path: Source file
+            **kwargs: Overrides for the constructor arguments
+
+        Returns:
+            Index of the saved kind
+        """
+        with np.load(path) as data:
+            kind = str(data["kind"])
+            options = {"sigma": float(data["sigma"]), "min_fidelity": float(data["min_fidelity"])}
+            options.update(kwargs)
+            keys = data["keys"].tobytes().decode("utf-8")
+            params = data["params"]
+            fingerprint = str(data["fingerprint"]) if "fingerprint" in data.files else ""
+
+        index = create_index(kind, **options)
+        index.build(keys.split(KEY_SEPARATOR) if keys else [], params)
+        index.fingerprint = fingerprint or None
+        return index
+
+    def _rerank(self, query: np.ndarray, candidates: np.ndarray, top_k: int,
+                exclude: set) -> List[Tuple[str, float]]:
+        """
+        Score base candidates and every added key exactly and keep the best
+        top_k above min_fidelity.
+        """
+        keys = [self.base_keys[c] for c in candidates] + self._added_keys
+        params = np.concatenate([self.base_params[candidates], self._added_params[:len(self._added_keys)]])
+        if len(keys) == 0:
+            return []
+
+        scores = analytic_fidelity(params, query, self.sigma)
+        if exclude:
+            scores[[i for i, key in enumerate(keys) if key in exclude]] = -1.0
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [(keys[i], float(scores[i])) for i in order if scores[i] >= self.min_fidelity]
+
+    def _record_recall(self, query: np.ndarray, top_k: int, exclude: set,
+                       results: List[Tuple[str, float]]):
+        """Compare a query result against brute force over all indexed rows."""
+        keys = self.keys
+        scores = analytic_fidelity(self.params, query, self.sigma)
+        if exclude:
+            scores[[i for i, key in enumerate(keys) if key in exclude]] = -1.0
+        k = min(top_k, len(scores))
+        exact = {keys[i] for i in np.argpartition(scores, -k)[-k:] if scores[i] >= self.min_fidelity}
+
+        self._recall_samples += 1
+        if exact:
+            self._recall_total += len(exact & {key for key, _ in results}) / len(exact)
+        else:
+            self._recall_total += 1.0
+
+    @abstractmethod
+    def _rebuild(self):
+        """Rebuild the search structure from self.base_params."""
+
+    @abstractmethod
+    def _candidates(self, point: np.ndarray, k: int) -> np.ndarray:
+        """
+        Ids of the base rows that may be among the k nearest to a scaled point.
+
+        Must include every row within the pruning radius that is among the
+        k nearest; extra candidates are removed by the exact re-ranking.
+        """
+
+
+class KDTreeIndex(SimilarityIndex):
+    """cKDTree over the scaled coordinates of the base rows."""
+
+    kind = "kdtree"
+
+    def __init__(self, sigma: float, min_fidelity: float = 1e-6, recall_sample_rate: float = 0.0,
+                 latency_window: int = 1000, max_added: int = DEFAULT_MAX_ADDED):
+        super().__init__(sigma, min_fidelity, recall_sample_rate, latency_window, max_added)
+        self._tree: Optional[cKDTree] = None
+
+    def _rebuild(self):
+        self._tree = cKDTree(self.scale(self.base_params)) if len(self.base_params) else None
+
+    def _candidates(self, point: np.ndarray, k: int) -> np.ndarray:
+        if self._tree is None:
+            return np.empty(0, dtype=np.int64)
+        distances, ids = self._tree.query(point, k=min(k, len(self.base_params)),
+                                          distance_upper_bound=self.radius)
+        ids = np.atleast_1d(ids)
+        return ids[np.atleast_1d(distances) <= self.radius]
+
+
+class GridIndex(SimilarityIndex):
+    """
+    Uniform bucket grid over the scaled coordinates.
+
+    Cells are cell_size wide; a query scans rings of cells outward until the
+    k-th best distance is closer than the next ring or the pruning radius is
+    exceeded.
+    """
+
+    kind = "grid"
+
+    def __init__(self, sigma: float, min_fidelity: float = 1e-6, recall_sample_rate: float = 0.0,
+                 latency_window: int = 1000, max_added: int = DEFAULT_MAX_ADDED, cell_size: float = 0.5):
+        super().__init__(sigma, min_fidelity, recall_sample_rate, latency_window, max_added)
+        self.cell_size = cell_size
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+        self._scaled = np.empty((0, 2), dtype=np.float64)
+
+    def _cell(self, point: np.ndarray) -> Tuple[int, int]:
+        return int(math.floor(point[0] / self.cell_size)), int(math.floor(point[1] / self.cell_size))
+
+    def _rebuild(self):
+        self._scaled = self.scale(self.base_params)
+        self._buckets = {}
+        cells = np.floor(self._scaled / self.cell_size).astype(np.int64)
+        for i, (cx, cy) in enumerate(cells):
+            self._buckets.setdefault((int(cx), int(cy)), []).append(i)
+
+    def _ring(self, cx: int, cy: int, r: int) -> Iterable[Tuple[int, int]]:
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def _candidates(self, point: np.ndarray, k: int) -> np.ndarray:
+        cx, cy = self._cell(point)
+        max_ring = int(math.ceil(self.radius / self.cell_size)) + 1
+
+        found: List[int] = []
+        for r in range(max_ring + 1):
+            for cell in self._ring(cx, cy, r):
+                found.extend(self._buckets.get(cell, ()))
+
+            # Everything outside ring r is at least r * cell_size away
+            if len(found) >= k:
+                distances = np.linalg.norm(self._scaled[found] - point, axis=1)
+                if np.partition(distances, k - 1)[k - 1] <= r * self.cell_size:
+                    break
+
+        found = np.array(found, dtype=np.int64)
+        if len(found) == 0:
+            return found
+        distances = np.linalg.norm(self._scaled[found] - point, axis=1)
+        return found[distances <= self.radius]
+
+
+INDEX_TYPES = {
+    KDTreeIndex.kind: KDTreeIndex,
+    GridIndex.kind: GridIndex
+}
+
+
+def create_index(kind: str, **kwargs) -> SimilarityIndex:
+    """
+    Create an empty index by name.
+
+    Args:
+        kind: One of INDEX_TYPES ("kdtree", "grid")
+        **kwargs: Constructor arguments for the index class
+
+    Returns:
+        New index instance
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {sorted(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](**kwargs)
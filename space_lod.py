@@ -0,0 +1,179 @@
+"""
+Level-of-detail aggregation of the (alpha, beta, gamma) embedding space.
+
+Points are quantized to a 1024^3 grid over the viewport and sorted by their
+Morton (Z-order) code. In that order every octree cell is a contiguous run,
+and the cell containing a point at level L is its code shifted right by
+3 * (MAX_LEVEL - L) bits, so clusters for any level come from one pass over
+the sorted codes with np.add.reduceat instead of an explicit tree.
+
+Payloads are columnar: one array per field rather than one dict per point.
+"""
+import numpy as np
+from typing import Any, Dict, Optional, Sequence
+
+MAX_LEVEL = 10
+_CELLS = 1 << MAX_LEVEL
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Move the low 10 bits of v to every third bit position."""
+    v = v.astype(np.uint64) & 0x3FF
+    v = (v | (v << 16)) & 0x030000FF
+    v = (v | (v << 8)) & 0x0300F00F
+    v = (v | (v << 4)) & 0x030C30C3
+    v = (v | (v << 2)) & 0x09249249
+    return v
+
+
+def morton_codes(coords: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """
+    Morton codes of points quantized to MAX_LEVEL bits per axis.
+
+    Args:
+        coords: Array of shape (N, 3)
+        lower: Lower corner of the box being quantized
+        upper: Upper corner of the box being quantized
+
+    Returns:
+        uint64 array of shape (N,)
+    """
+    extent = np.maximum(upper - lower, 1e-12)
+    cells = np.floor((coords - lower) / extent * _CELLS)
+    cells = np.clip(cells, 0, _CELLS - 1).astype(np.uint64)
+    return _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << 1) | (_spread_bits(cells[:, 2]) << 2)
+
+
+class SpaceOctree:
+    """Implicit octree over a set of 3D points, stored as sorted Morton codes."""
+
+    def __init__(self, coords: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+        """
+        Args:
+            coords: Points of shape (N, 3)
+            lower: Lower corner of the root cell
+            upper: Upper corner of the root cell
+        """
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        codes = morton_codes(coords, self.lower, self.upper)
+        self.order = np.argsort(codes, kind="stable")
+        self.codes = codes[self.order]
+        self.coords = coords[self.order]
+
+    def _cell_starts(self, level: int) -> np.ndarray:
+        cells = self.codes >> np.uint64(3 * (MAX_LEVEL - level))
+        return np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+
+    def cluster_count(self, level: int) -> int:
+        """Number of non-empty cells at a level."""
+        if len(self.codes) == 0:
+            return 0
+        return len(self._cell_starts(level))
+
+    def choose_level(self, max_clusters: int) -> int:
+        """Deepest level whose number of non-empty cells does not exceed max_clusters."""
+        level = 0
+        for candidate in range(1, MAX_LEVEL + 1):
+            if self.cluster_count(candidate) > max_clusters:
+                break
+            level = candidate
+        return level
+
+    def clusters(self, level: int) -> Dict[str, np.ndarray]:
+        """
+        Aggregate the points into the non-empty cells of a level.
+
+        Args:
+            level: Octree level (2**level cells per axis)
+
+        Returns:
+            Dictionary with centroids (K, 3), counts (K,) and, for every
+            cluster, the index (into the original points) of the member
+            closest to its centroid
+        """
+        if len(self.codes) == 0:
+            return {"centroids": np.empty((0, 3)), "counts": np.empty(0, dtype=np.int64),
+                    "representatives": np.empty(0, dtype=np.int64)}
+
+        starts = self._cell_starts(level)
+        counts = np.diff(np.r_[starts, len(self.codes)])
+        centroids = np.add.reduceat(self.coords, starts, axis=0) / counts[:, None]
+
+        cluster_ids = np.repeat(np.arange(len(starts)), counts)
+        distances = np.sum((self.coords - centroids[cluster_ids])**2, axis=1)
+        nearest = np.lexsort((distances, cluster_ids))[starts]
+        return {"centroids": centroids, "counts": counts, "representatives": self.order[nearest]}
+
+
+def level_of_detail(keys: Sequence[str], coords: np.ndarray, bounds: Optional[Sequence[float]] = None,
+                    level: Optional[int] = None, max_points: int = 5000) -> Dict[str, Any]:
+    """
+    Build a columnar 3D payload for a viewport.
+
+    Args:
+        keys: Word for each point
+        coords: (alpha, beta, gamma) for each point, shape (N, 3)
+        bounds: Optional viewport (xmin, ymin, zmin, xmax, ymax, zmax); points
+            outside it are dropped. Defaults to the bounding box of the points
+        level: Octree level for clusters (2**level cells per axis across the
+            viewport); chosen automatically if None
+        max_points: Raw points are returned when the viewport holds at most
+            this many; otherwise clusters, and with level=None the deepest
+            level with at most this many clusters
+
+    Returns:
+        Dictionary with "mode" ("points" or "clusters"), the total count, the
+        viewport bounds and columnar arrays
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+    if bounds is not None:
+        bounds = np.asarray(bounds, dtype=np.float64)
+        if bounds.shape != (6,):
+            raise ValueError("bounds must have 6 values: xmin, ymin, zmin, xmax, ymax, zmax")
+        lower, upper = bounds[:3], bounds[3:]
+        inside = np.flatnonzero(np.all((coords >= lower) & (coords <= upper), axis=1))
+        coords = coords[inside]
+        keys = [keys[i] for i in inside]
+    elif len(coords):
+        lower, upper = coords.min(axis=0), coords.max(axis=0)
+    else:
+        lower, upper = np.zeros(3), np.zeros(3)
+
+    payload: Dict[str, Any] = {
+        "count": len(keys),
+        "bounds": {"min": lower.tolist(), "max": upper.tolist()}
+    }
+
+    if len(keys) <= max_points:
+        payload.update({
+            "mode": "points",
+            "level": None,
+            "points": {
+                "word": list(keys),
+                "alpha": coords[:, 0],
+                "beta": coords[:, 1],
+                "gamma": coords[:, 2]
+            }
+        })
+        return payload
+
+    octree = SpaceOctree(coords, lower, upper)
+    if level is None:
+        level = octree.choose_level(max_points)
+    level = min(max(level, 0), MAX_LEVEL)
+    clusters = octree.clusters(level)
+    centroids = clusters["centroids"]
+    payload.update({
+        "mode": "clusters",
+        "level": level,
+        "cell_size": ((upper - lower) / (1 << level)).tolist(),
+        "clusters": {
+            "word": [keys[i] for i in clusters["representatives"]],
+            "alpha": centroids[:, 0],
+            "beta": centroids[:, 1],
+            "gamma": centroids[:, 2],
+            "count": clusters["counts"]
+        }
+    })
+    return payload
@@ -0,0 +1,242 @@
+"""
+Incremental 3D-space sessions for the WebSocket channel.
+
+A SpaceSession holds the set of words a client has placed in the 3D view,
+their (alpha, beta, gamma) parameters and each word's top-k most similar
+words within the session. Adding or removing a word only touches what
+changed:
+
+- add: one fidelity row against the current members (O(n)); members whose
+  k-th best fidelity is beaten by the new word get it spliced into their
+  neighbour list
+- remove: only members that had the removed word among their neighbours
+  are re-ranked, each with one O(n) fidelity row
+
+so the server can push the new point, its neighbours, its fidelities and the
+neighbour lists that changed instead of recomputing the whole space.
+"""
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fidelity import analytic_fidelity
+
+
+class SessionFull(Exception):
+    """Raised when an add would take a session past its word limit."""
+
+
+class SpaceSession:
+    """Per-connection word set with incrementally maintained top-k neighbours."""
+
+    def __init__(self, sigma: float, top_k: int = 5, max_words: int = 10000):
+        """
+        Args:
+            sigma: Width parameter of the wavepackets (for fidelities)
+            top_k: Neighbours kept per word
+            max_words: Largest number of words a session may hold
+        """
+        self.sigma = sigma
+        self.top_k = top_k
+        self.max_words = max_words
+        self.words: List[str] = []
+        self.slots: Dict[str, int] = {}
+        self.params = np.empty((16, 3), dtype=np.float64)
+        # neighbours[i] is sorted by decreasing similarity; kth[i] is the
+        # score a newcomer must beat to enter it (-1 while it has < top_k)
+        self.neighbours: List[List[Tuple[str, float]]] = []
+        self.kth = np.full(16, -1.0)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.slots
+
+    def _fidelities(self, params: np.ndarray) -> np.ndarray:
+        return analytic_fidelity(self.params[:len(self.words)], params, self.sigma)
+
+    def _rank(self, scores: np.ndarray, exclude: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top-k (word, similarity) pairs of a fidelity row over the session."""
+        if exclude is not None:
+            scores = scores.copy()
+            scores[exclude] = -1.0
+        count = len(scores) - (exclude is not None)
+        k = min(self.top_k, count)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.words[i], float(scores[i])) for i in top]
+
+    def _set_neighbours(self, slot: int, neighbours: List[Tuple[str, float]]):
+        self.neighbours[slot] = neighbours
+        self.kth[slot] = neighbours[-1][1] if len(neighbours) >= self.top_k else -1.0
+
+    def _grow(self):
+        capacity = 2 * len(self.params)
+        params = np.empty((capacity, 3), dtype=np.float64)
+        params[:len(self.words)] = self.params[:len(self.words)]
+        kth = np.full(capacity, -1.0)
+        kth[:len(self.words)] = self.kth[:len(self.words)]
+        self.params, self.kth = params, kth
+
+    def add(self, word: str, params: Sequence[float]) -> Tuple[Dict[str, Any], List[int]]:
+        """
+        Add a word to the session.
+
+        Args:
+            word: Normalized word (must not be in the session yet)
+            params: Its (alpha, beta, gamma)
+
+        Returns:
+            Tuple of (point, changed) where point holds the word's parameters,
+            its neighbours and its fidelity to every other member, and
+            changed lists the slots of members whose neighbours changed
+
+        Raises:
+            SessionFull: If the session already holds max_words words
+        """
+        if len(self.words) >= self.max_words:
+            raise SessionFull(f"Session already holds {self.max_words} words")
+        params = np.asarray(params, dtype=np.float64)
+        scores = self._fidelities(params)
+
+        # Members the newcomer enters the top-k of
+        changed = np.flatnonzero(scores > self.kth[:len(self.words)]).tolist()
+        for slot in changed:
+            merged = self.neighbours[slot] + [(word, float(scores[slot]))]
+            merged.sort(key=lambda item: -item[1])
+            self._set_neighbours(slot, merged[:self.top_k])
+
+        point = {
+            "word": word,
+            "alpha": float(params[0]),
+            "beta": float(params[1]),
+            "gamma": float(params[2]),
+            "neighbours": self._rank(scores),
+            "fidelities": {"word": list(self.words), "similarity": scores}
+        }
+
+        if len(self.words) == len(self.params):
+            self._grow()
+        slot = len(self.words)
+        self.words.append(word)
+        self.slots[word] = slot
+        self.params[slot] = params
+        self.neighbours.append([])
+        self._set_neighbours(slot, point["neighbours"])
+        return point, changed
+
+    def remove(self, word: str) -> List[int]:
+        """
+        Remove a word from the session.
+
+        The last member is moved into the freed slot, so slots stay dense.
+
+        Args:
+            word: Word in the session
+
+        Returns:
+            Slots (after the move) of members whose neighbours changed
+        """
+        slot = self.slots.pop(word)
+        last = len(self.words) - 1
+        if slot != last:
+            moved = self.words[last]
+            self.words[slot] = moved
+            self.slots[moved] = slot
+            self.params[slot] = self.params[last]
+            self.neighbours[slot] = self.neighbours[last]
+            self.kth[slot] = self.kth[last]
+        self.words.pop()
+        self.neighbours.pop()
+
+        changed = [i for i, neighbours in enumerate(self.neighbours)
+                   if any(name == word for name, _ in neighbours)]
+        for i in changed:
+            self._set_neighbours(i, self._rank(self._fidelities(self.params[i]), exclude=i))
+        return changed
+
+    def clear(self):
+        """Remove every word."""
+        self.words.clear()
+        self.slots.clear()
+        self.neighbours.clear()
+        self.kth[:] = -1.0
+
+    def neighbours_of(self, slots: Sequence[int]) -> Dict[str, List[Dict[str, Any]]]:
+        """Neighbour lists of the given members, keyed by word."""
+        return {
+            self.words[i]: [{"word": name, "similarity": score} for name, score in self.neighbours[i]]
+            for i in slots
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Full session state, for a client that (re)connects.
+
+        Returns:
+            Columnar points and every member's neighbour list
+        """
+        params = self.params[:len(self.words)]
+        return {
+            "points": {
+                "word": list(self.words),
+                "alpha": params[:, 0],
+                "beta": params[:, 1],
+                "gamma": params[:, 2]
+            },
+            "neighbours": self.neighbours_of(range(len(self.words)))
+        }
+
+
+def apply_update(session: SpaceSession, add: Sequence[str] = (), params: Optional[np.ndarray] = None,
+                 remove: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Apply removals then additions and describe the change.
+
+    Args:
+        session: Session to update
+        add: Normalized words to add (members already present are skipped)
+        params: Parameters of the words in add, shape (len(add), 3)
+        remove: Normalized words to remove (non-members are skipped)
+
+    Returns:
+        Delta with the removed words, the added points and the final
+        neighbour lists of every surviving member whose list changed
+
+    Raises:
+        SessionFull: If the update would exceed the session's word limit;
+            the session is left unchanged
+    """
+    remove = [word for word in dict.fromkeys(remove) if word in session]
+    new_words = set(add).difference(session.slots) | set(remove).intersection(add)
+    if len(session) - len(remove) + len(new_words) > session.max_words:
+        raise SessionFull(f"Session would exceed {session.max_words} words")
+
+    removed, added = [], []
+    changed = set()
+    for word in remove:
+        removed.append(word)
+        changed.update(session.words[i] for i in session.remove(word))
+        # An earlier removal may have re-ranked this word's list
+        changed.discard(word)
+    for word, row in zip(add, params if params is not None else ()):
+        if word in session:
+            continue
+        point, slots = session.add(word, row)
+        added.append(point)
+        changed.update(session.words[i] for i in slots)
+
+    # Later additions may have entered the lists of earlier ones, so added
+    # points carry their final neighbours and are not repeated in "updated"
+    for point in added:
+        point["neighbours"] = session.neighbours_of([session.slots[point["word"]]])[point["word"]]
+    changed.difference_update(point["word"] for point in added)
+    slots = sorted(session.slots[word] for word in changed)
+    return {
+        "removed": removed,
+        "added": added,
+        "updated": session.neighbours_of(slots),
+        "size": len(session)
+    }
@@ -0,0 +1,107 @@
+"""
+Static files held in memory with precompressed variants.
+
+Every file under the static directory is read once at startup; compressible
+ones (HTML, JS, CSS, ...) are also gzip- and brotli-compressed at maximum
+level, which is affordable because it happens once. Requests are then
+answered from memory with the variant the client's Accept-Encoding asks for,
+a strong ETag per variant and Cache-Control headers, so browsers revalidate
+with If-None-Match and get a 304 instead of the file.
+
+HTML is sent with Cache-Control: no-cache (always revalidated, so a new
+deployment shows up immediately); other assets may be reused for max_age
+seconds.
+"""
+import hashlib
+import mimetypes
+import os
+from typing import Dict, Optional
+
+from fastapi.responses import Response
+
+from compression import Compressor, encoded_etag
+from response_cache import etag_matches
+
+# Assets are compressed once at startup, so at maximum gzip level and brotli quality
+STATIC_LEVELS = {"gzip": 9, "br": 11}
+
+
+class StaticAsset:
+    """A static file's bytes, media type, ETag and encoded variants."""
+
+    __slots__ = ("body", "media_type", "etag", "encoded")
+
+    def __init__(self, body: bytes, media_type: str, encoded: Dict[str, bytes]):
+        self.body = body
+        self.media_type = media_type
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.encoded = encoded
+
+
+class StaticAssets:
+    """In-memory static file server."""
+
+    def __init__(self, directory: str, compressor: Compressor, max_age: int = 3600):
+        """
+        Args:
+            directory: Directory whose files (recursively) are served
+            compressor: Content-coding negotiation settings
+            max_age: Seconds browsers may reuse non-HTML assets without revalidating
+        """
+        self.directory = directory
+        self.compressor = compressor
+        self.max_age = max_age
+        self.assets: Dict[str, StaticAsset] = {}
+
+    def load(self):
+        """Read and compress every file in the directory."""
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                encoded = self.compressor.variants(body, media_type, STATIC_LEVELS)
+                assets[relative] = StaticAsset(body, media_type, encoded)
+        self.assets = assets
+
+        raw = sum(len(asset.body) for asset in assets.values())
+        print(f"Loaded {len(assets)} static assets ({raw / 1024:.0f} KiB) from {self.directory}.")
+
+    def respond(self, path: str, if_none_match: Optional[str], accept_encoding: Optional[str]) -> Optional[Response]:
+        """
+        Build the response for a static file.
+
+        Args:
+            path: Path relative to the directory, with forward slashes
+            if_none_match: Value of the If-None-Match request header
+            accept_encoding: Value of the Accept-Encoding request header
+
+        Returns:
+            304 if the client already has this variant, otherwise the file in
+            the best encoding the client accepts; None if there is no such file
+        """
+        asset = self.assets.get(path)
+        if asset is None:
+            return None
+
+        encoding = self.compressor.choose(accept_encoding) if asset.encoded else None
+        if encoding not in asset.encoded:
+            encoding = None
+        etag = encoded_etag(asset.etag, encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache" if asset.media_type.startswith("text/html") else f"public, max-age={self.max_age}"
+        }
+        if asset.encoded:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(content=asset.body, media_type=asset.media_type, headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(content=asset.encoded[encoding], media_type=asset.media_type, headers=headers)
@@ -0,0 +1,184 @@
+"""
+Deterministic vectors for out-of-vocabulary words.
+
+Every in-vocabulary word is split into the character n-grams of "<word>"
+(n = MIN_N..MAX_N), each n-gram is hashed into one of a fixed number of
+buckets, and a bucket's vector is the mean GloVe vector of the words whose
+n-grams fall into it. An out-of-vocabulary word gets the mean of its
+buckets' vectors, so "quantumly" lands near "quantum" and a typo near the
+word it misspells, and the same word always gets the same vector in every
+process. Words with no populated bucket fall back to a Gaussian vector
+seeded from a hash of the word.
+
+The table has a fixed number of rows whatever the vocabulary size; it is
+built once, stored as float16 .npy with a .json description and opened
+memory-mapped, like the parameter table.
+"""
+import hashlib
+import json
+import os
+import zlib
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+from parameter_store import atomic_save_npy, atomic_write_text
+
+MIN_N = 3
+MAX_N = 5
+
+
+def ngram_buckets(word: str, buckets: int, min_n: int = MIN_N, max_n: int = MAX_N) -> List[int]:
+    """
+    Distinct buckets of the character n-grams of a word.
+
+    Args:
+        word: Lowercased word
+        buckets: Number of buckets
+        min_n: Shortest n-gram
+        max_n: Longest n-gram
+
+    Returns:
+        Sorted bucket ids (CRC-32 of the UTF-8 n-gram modulo buckets)
+    """
+    marked = f"<{word}>"
+    ids = {
+        zlib.crc32(marked[i:i + n].encode("utf-8")) % buckets
+        for n in range(min_n, max_n + 1)
+        for i in range(len(marked) - n + 1)
+    }
+    return sorted(ids)
+
+
+def hashed_vector(word: str, dim: int = 300) -> np.ndarray:
+    """
+    Standard normal vector seeded from a hash of the word.
+
+    Args:
+        word: Lowercased word
+        dim: Vector dimension
+
+    Returns:
+        float32 array of shape (dim,), identical for a word in every process
+    """
+    seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def build_subword_table(vectors: np.ndarray, keys: Sequence[str], buckets: int,
+                        min_n: int = MIN_N, max_n: int = MAX_N) -> np.ndarray:
+    """
+    Average word vectors into n-gram buckets.
+
+    Args:
+        vectors: Word vectors of shape (len(keys), dim)
+        keys: Words the vectors belong to
+        buckets: Number of buckets
+        min_n: Shortest n-gram
+        max_n: Longest n-gram
+
+    Returns:
+        float16 array of shape (buckets, dim); buckets no word maps to are zero
+    """
+    from scipy.sparse import csr_matrix
+
+    rows, cols = [], []
+    for i, key in enumerate(keys):
+        ids = ngram_buckets(key, buckets, min_n, max_n)
+        rows.extend(ids)
+        cols.extend([i] * len(ids))
+
+    membership = csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(buckets, len(keys)))
+    sums = membership @ np.asarray(vectors, dtype=np.float32)
+    counts = np.asarray(membership.sum(axis=1)).ravel()
+    return (sums / np.maximum(counts, 1)[:, None]).astype(np.float16)
+
+
+class SubwordIndex:
+    """Bucketed n-gram vectors used to compose out-of-vocabulary word vectors."""
+
+    def __init__(self, table: np.ndarray, meta: Dict[str, Any]):
+        """
+        Args:
+            table: Array of shape (buckets, dim) from build_subword_table
+            meta: Build settings (buckets, min_n, max_n, ...)
+        """
+        self.table = table
+        self.meta = meta
+        self.buckets = int(meta["buckets"])
+        self.min_n = int(meta["min_n"])
+        self.max_n = int(meta["max_n"])
+        self.dim = table.shape[1]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, keys: Sequence[str], buckets: int, min_n: int = MIN_N,
+              max_n: int = MAX_N, path: Optional[str] = None) -> "SubwordIndex":
+        """
+        Build the index from in-vocabulary words.
+
+        Args:
+            vectors: Word vectors of shape (len(keys), dim)
+            keys: Words the vectors belong to, most frequent first
+            buckets: Number of buckets
+            min_n: Shortest n-gram
+            max_n: Longest n-gram
+            path: Optional .npy path to save the table to (the description
+                goes to the matching .json file)
+
+        Returns:
+            The index
+        """
+        table = build_subword_table(vectors, keys, buckets, min_n, max_n)
+        meta = {
+            "buckets": buckets,
+            "min_n": min_n,
+            "max_n": max_n,
+            "words": len(keys),
+            "first_key": keys[0] if len(keys) else None,
+            "last_key": keys[-1] if len(keys) else None
+        }
+        if path:
+            atomic_save_npy(path, table)
+            atomic_write_text(os.path.splitext(path)[0] + ".json", json.dumps(meta))
+        return cls(table, meta)
+
+    @classmethod
+    def load(cls, path: str, expected: Dict[str, Any]) -> Optional["SubwordIndex"]:
+        """
+        Open a saved index memory-mapped.
+
+        Args:
+            path: .npy path given to build
+            expected: Settings the index must have been built with
+
+        Returns:
+            The index, or None if it is missing or was built differently
+        """
+        meta_path = os.path.splitext(path)[0] + ".json"
+        if not os.path.exists(path) or not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if any(meta.get(name) != value for name, value in expected.items()):
+            return None
+        table = np.load(path, mmap_mode="r")
+        if table.shape[0] != meta["buckets"]:
+            return None
+        return cls(table, meta)
+
+    def vectors(self, words: Sequence[str]) -> np.ndarray:
+        """
+        Compose vectors for words.
+
+        Args:
+            words: Lowercased words
+
+        Returns:
+            float32 array of shape (len(words), dim): the mean vector of each
+            word's populated n-gram buckets, or hashed_vector(word) if none is
+        """
+        result = np.empty((len(words), self.dim), dtype=np.float32)
+        for i, word in enumerate(words):
+            rows = np.asarray(self.table[ngram_buckets(word, self.buckets, self.min_n, self.max_n)], dtype=np.float32)
+            rows = rows[rows.any(axis=1)]
+            result[i] = rows.mean(axis=0) if len(rows) else hashed_vector(word, self.dim)
+        return result
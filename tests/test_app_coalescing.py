@@ -0,0 +1,30 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from fastapi.responses import Response
+from starlette.requests import Request
+
+# Import the app without loading GloVe or writing into the repository
+os.environ.setdefault("GLOVE_LAZY", "1")
+os.environ.setdefault("EMBEDDINGS_CACHE_DIR", tempfile.mkdtemp(prefix="qev-test-"))
+import app  # noqa: E402
+
+
+def compute():
+    time.sleep(0.05)
+    return Response(content=b"{}", media_type="application/json")
+
+
+def test_cached_and_plain_paths_do_not_share_results():
+    async def both():
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+        key = ("word", "coalescing-test")
+        return await asyncio.gather(app.cached_response(request, "word", key, compute),
+                                    app.coalesced("word", key, compute))
+
+    cached, plain = asyncio.run(both())
+    assert cached.status_code == plain.status_code == 200
+    assert cached.body == plain.body == b"{}"
+    assert "etag" in cached.headers
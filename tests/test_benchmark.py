@@ -0,0 +1,32 @@
+import json
+
+from benchmark import compare, config_key, load_baselines
+
+
+def result(median):
+    return {"median_ms": median}
+
+
+def test_compare_flags_slowdowns_beyond_the_threshold():
+    baseline = {"results": {"a": result(1.0), "b": result(1.0)}, "thresholds": {"b": 1.0}}
+    rows = compare({"a": result(1.3), "b": result(1.9), "new": result(5.0)}, baseline, threshold=0.25)
+
+    assert [(row["name"], row["regression"]) for row in rows] == [("a", True), ("b", False)]
+
+
+def test_baselines_are_keyed_by_configuration(tmp_path):
+    quick = {"config": {"vocab_size": 2000, "cache_sizes": [10, 100, 1000]}, "results": {}}
+    full = {"config": {"vocab_size": 100000, "cache_sizes": [10, 100000]}, "results": {}}
+    assert config_key(quick["config"]) != config_key(full["config"])
+
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(dict(full, thresholds={"a": 0.5})))
+    document = load_baselines(str(path))
+
+    assert list(document["baselines"]) == [config_key(full["config"])]
+    assert document["thresholds"] == {"a": 0.5}
+    assert config_key(quick["config"]) not in document["baselines"]
+
+
+def test_missing_baseline_file_is_empty(tmp_path):
+    assert load_baselines(str(tmp_path / "missing.json")) == {"baselines": {}, "thresholds": {}}
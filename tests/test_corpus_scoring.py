@@ -0,0 +1,115 @@
+import io
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from corpus_scoring import MAX_TOKEN_LENGTH, CorpusScorer, read_blocks
+from fidelity import analytic_fidelity
+
+SIGMA = 1.5
+VOCABULARY = ["quantum", "physics", "cat", "dog", "wave", "particle", "field", "light", "don't", "état"]
+
+
+class FakeService:
+    """The parts of PatternEmbeddingService that CorpusScorer uses."""
+
+    def __init__(self):
+        self.glove = SimpleNamespace(key_to_index={word: i for i, word in enumerate(VOCABULARY)})
+        self.lookups = []
+
+    def get_parameters_batch(self, words):
+        self.lookups.append(list(words))
+        return np.array([params(word) for word in words], dtype=np.float64).reshape(-1, 3)
+
+    def score_parameters(self, rows, query_rows):
+        return analytic_fidelity(rows[:, None, :], query_rows[None, :, :], SIGMA)
+
+
+def params(word):
+    seed = sum(ord(c) * 31 ** i for i, c in enumerate(word)) % (2 ** 32)
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-3, 3), rng.uniform(-1, 1), rng.uniform(-1, 1)
+
+
+def corpus(seed=0, length=5000):
+    rng = np.random.default_rng(seed)
+    words = VOCABULARY + ["unknownword", "zzz"]
+    return " ".join(rng.choice(words, size=length, p=np.linspace(1, 3, len(words)) / np.linspace(1, 3, len(words)).sum()))
+
+
+def run(text, queries=("quantum", "cat"), blocks=None, **kwargs):
+    scorer = CorpusScorer(FakeService(), list(queries), **kwargs)
+    records = list(scorer.score(blocks if blocks is not None else [text]))
+    return records[:-1], records[-1]
+
+
+def test_summary_matches_a_brute_force_count():
+    text = corpus()
+    chunks, summary = run(text, chunk_size=500, top_n=3)
+    counts = Counter(w for w in text.split() if w in VOCABULARY)
+
+    assert summary["tokens"] == 5000
+    assert summary["scored_tokens"] == sum(counts.values())
+    assert summary["oov_tokens"] == 5000 - sum(counts.values())
+    assert summary["chunks"] == len(chunks) == 10
+    for query in ("quantum", "cat"):
+        scores = {w: float(analytic_fidelity(params(w), params(query), SIGMA)) for w in counts}
+        best = sorted(counts, key=lambda w: -scores[w])[:3]
+        assert [(e["word"], e["count"]) for e in summary["top"][query]] == [(w, counts[w]) for w in best]
+        mean = sum(counts[w] * scores[w] for w in counts) / sum(counts.values())
+        assert summary["mean_fidelity"][query] == pytest.approx(mean)
+
+
+def test_block_boundaries_do_not_split_tokens():
+    text = corpus(seed=1, length=800)
+    _, whole = run(text, chunk_size=128)
+    pieces = [text[i:i + 7] for i in range(0, len(text), 7)]
+    chunks, split = run(None, blocks=pieces, chunk_size=128)
+
+    assert split["tokens"] == whole["tokens"] == 800
+    assert split["top"] == whole["top"]
+    assert [c["offset"] for c in chunks] == list(range(0, 800, 128))
+
+
+def test_tokenizer_lowercases_and_keeps_inner_apostrophes():
+    chunks, summary = run("Quantum, CAT! don't état_quantum -- wave-", chunk_size=100)
+    assert chunks[0]["words"] == ["quantum", "cat", "don't", "état", "wave"]
+    assert chunks[0]["counts"].tolist() == [2, 1, 1, 1, 1]
+    assert summary["tokens"] == 6
+
+
+def test_include_oov_scores_unknown_tokens():
+    chunks, summary = run("quantum unknownword unknownword", include_oov=True)
+    assert summary["oov_tokens"] == 0
+    assert chunks[0]["words"] == ["quantum", "unknownword"]
+    assert chunks[0]["counts"].tolist() == [1, 2]
+
+
+def test_threshold_and_summary_only_trim_chunk_records():
+    text = corpus(seed=2, length=300)
+    chunks, _ = run(text, threshold=0.999)
+    assert set(chunks[0]["words"]) <= {"quantum", "cat"}
+    assert all(max(s) >= 0.999 for s in zip(*chunks[0]["scores"].values()))
+
+    chunks, _ = run(text, include_words=False)
+    assert "words" not in chunks[0] and chunks[0]["tokens"] == 300
+
+
+def test_overlong_runs_without_whitespace_are_cut():
+    blob = "a" * (3 * MAX_TOKEN_LENGTH)
+    scorer = CorpusScorer(FakeService(), ["quantum"], chunk_size=10)
+    scorer.feed(blob)
+    assert len(scorer._carry) < MAX_TOKEN_LENGTH
+
+
+def test_duplicate_queries_and_missing_queries():
+    scorer = CorpusScorer(FakeService(), [" Quantum", "quantum", "cat"])
+    assert scorer.queries == ["quantum", "cat"]
+    with pytest.raises(ValueError):
+        CorpusScorer(FakeService(), [])
+
+
+def test_read_blocks():
+    assert list(read_blocks(io.StringIO("abcdefg"), block_size=3)) == ["abc", "def", "g"]
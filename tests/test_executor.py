@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from executor import ExecutorOverloaded, ServiceExecutor, SingleFlight
+
+
+def test_cancelled_callers_keep_their_slot_until_the_job_ends():
+    executor = ServiceExecutor(max_workers=4, default_limit=1)
+    release = threading.Event()
+    running = []
+    overlaps = []
+
+    def job():
+        running.append(1)
+        if len(running) > 1:
+            overlaps.append(1)
+        release.wait(5)
+        running.pop()
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run("e", job))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        second = asyncio.ensure_future(executor.run("e", job))
+        await asyncio.sleep(0.05)
+        # The first job still runs, so the second has not started
+        assert executor.stats()["endpoints"]["e"]["active"] == 1
+        release.set()
+        await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+    executor.shutdown()
+    assert not overlaps
+    stats = executor.stats()["endpoints"]["e"]
+    assert stats["active"] == 0 and stats["completed"] == 2 and stats["errors"] == 0
+
+
+def test_errors_are_counted_and_raised():
+    executor = ServiceExecutor(max_workers=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await executor.run("e", fail)
+        return await executor.run("e", lambda x, y=0: x + y, 1, y=2)
+
+    assert asyncio.run(scenario()) == 3
+    executor.shutdown()
+    assert executor.stats()["endpoints"]["e"]["errors"] == 1
+
+
+def test_full_queues_reject_new_calls():
+    executor = ServiceExecutor(max_workers=2, default_limit=1, max_queue=1)
+
+    async def scenario():
+        calls = [asyncio.ensure_future(executor.run("e", time.sleep, 0.1)) for _ in range(3)]
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    executor.shutdown()
+    assert sum(isinstance(r, ExecutorOverloaded) for r in results) == 1
+    assert executor.stats()["endpoints"]["e"]["rejected"] == 1
+
+
+def test_iterate_drives_the_iterator_on_the_pool():
+    executor = ServiceExecutor(max_workers=1)
+    threads = set()
+
+    def numbers():
+        for i in range(3):
+            threads.add(threading.current_thread().name)
+            yield i
+
+    async def scenario():
+        return [item async for item in executor.iterate("e", numbers())]
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    executor.shutdown()
+    assert all(name.startswith("service") for name in threads)
+
+
+def test_single_flight_shares_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return object()
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("e", "k", compute) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1 and len({id(r) for r in results}) == 1
+    assert flight.stats()["endpoints"]["e"]["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,97 @@
+import threading
+
+import numpy as np
+import pytest
+
+from parameter_store import keys_path, load_parameters, merge_parameters, save_parameters
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "params.npy")
+    items = [("quantum", (1.0, 2.0, 3.0)), ("física", (-0.5, 0.25, 0.0)), ("bad\nkey", (0.0, 0.0, 0.0))]
+
+    assert save_parameters(path, items) == 2
+    loaded = load_parameters(path)
+    assert list(loaded) == ["quantum", "física"]
+    assert loaded["física"] == pytest.approx((-0.5, 0.25, 0.0))
+
+
+def test_carriage_returns_do_not_discard_the_cache(tmp_path):
+    path = str(tmp_path / "params.npy")
+    assert save_parameters(path, [("a\rb", (1.0, 1.0, 1.0)), ("c\r\n", (0.0, 0.0, 0.0)), ("c", (2.0, 2.0, 2.0))]) == 1
+    assert load_parameters(path) == {"c": (2.0, 2.0, 2.0)}
+
+    # A key with a stray "\r" in the file keeps its line count
+    with open(keys_path(path), encoding="utf-8", newline="") as f:
+        header = f.readline()
+    with open(keys_path(path), "w", encoding="utf-8", newline="") as f:
+        f.write(header + "c\rx\n")
+    assert list(load_parameters(path)) == ["c\rx"]
+
+
+def test_files_from_different_flushes_are_rejected(tmp_path):
+    path = str(tmp_path / "params.npy")
+    save_parameters(path, [("a", (1.0, 0.0, 0.0)), ("b", (2.0, 0.0, 0.0))])
+    with open(keys_path(path), "rb") as f:
+        old_keys = f.read()
+
+    # A reorder keeps the row count; simulate a crash before the keys file is replaced
+    save_parameters(path, [("b", (2.0, 0.0, 0.0)), ("a", (1.0, 0.0, 0.0))])
+    assert load_parameters(path) == {"b": (2.0, 0.0, 0.0), "a": (1.0, 0.0, 0.0)}
+    with open(keys_path(path), "wb") as f:
+        f.write(old_keys)
+
+    assert load_parameters(path) == {}
+
+
+def test_load_ignores_mismatched_files(tmp_path):
+    path = str(tmp_path / "params.npy")
+    save_parameters(path, [("a", (1.0, 1.0, 1.0)), ("b", (2.0, 2.0, 2.0))])
+    with open(keys_path(path), "w", encoding="utf-8") as f:
+        f.write("a\n")
+
+    assert load_parameters(path) == {}
+
+
+def test_merge_keeps_entries_of_other_workers(tmp_path):
+    path = str(tmp_path / "params.npy")
+    merge_parameters(path, [("a", (1.0, 0.0, 0.0)), ("b", (2.0, 0.0, 0.0))])
+    merge_parameters(path, [("b", (3.0, 0.0, 0.0)), ("c", (4.0, 0.0, 0.0))])
+
+    loaded = load_parameters(path)
+    assert sorted(loaded) == ["a", "b", "c"]
+    assert loaded["b"][0] == 3.0
+
+
+def test_merge_drops_the_oldest_entries_beyond_max_entries(tmp_path):
+    path = str(tmp_path / "params.npy")
+    merge_parameters(path, [(f"old{i}", (float(i), 0.0, 0.0)) for i in range(5)])
+    merge_parameters(path, [("new", (9.0, 0.0, 0.0))], max_entries=3)
+
+    assert list(load_parameters(path)) == ["old3", "old4", "new"]
+
+
+def test_concurrent_merges_lose_nothing(tmp_path):
+    path = str(tmp_path / "params.npy")
+    workers = 6
+    errors = []
+
+    def flush(worker):
+        try:
+            for batch in range(5):
+                merge_parameters(path, [(f"w{worker}-{batch}-{i}", (float(worker), float(batch), float(i)))
+                                        for i in range(20)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=flush, args=(worker,), daemon=True) for worker in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30.0)
+    assert not any(thread.is_alive() for thread in threads), "threads deadlocked"
+    assert not errors
+
+    loaded = load_parameters(path)
+    assert len(loaded) == workers * 5 * 20
+    assert np.allclose(loaded["w3-4-7"], (3.0, 4.0, 7.0))
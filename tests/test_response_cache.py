@@ -0,0 +1,41 @@
+import gzip
+
+from fastapi.responses import Response
+
+from compression import Compressor
+from response_cache import ResponseCache, entry_size, etag_matches
+
+
+def test_etag_matching():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a", "b"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches(None, '"a"')
+    assert not etag_matches('"b"', '"a"')
+
+
+def test_cached_response_and_conditional_request():
+    cache = ResponseCache(max_bytes=1 << 20)
+    cached = cache.put("k", cache.prepare(Response(content=b'{"x":1}', media_type="application/json")))
+    assert cache.get("k") is cached
+
+    response = cache.respond(cached, None)
+    assert response.body == b'{"x":1}'
+    assert response.headers["etag"] == cached.etag
+    assert cache.respond(cached, cached.etag).status_code == 304
+    assert cache.stats()["not_modified"] == 1
+
+
+def test_variants_share_one_entry():
+    cache = ResponseCache(max_bytes=1 << 20, compressor=Compressor(minimum_size=1))
+    body = b"[" + b"1," * 500 + b"1]"
+    entry = cache.prepare([Response(content=body, media_type="application/json"),
+                           Response(content=body[::-1], media_type="application/json")])
+    cache.put("pair", entry)
+
+    assert isinstance(entry, tuple) and len(entry) == 2
+    assert entry[0].etag != entry[1].etag
+    assert entry_size(entry) == entry[0].size + entry[1].size
+    assert cache.stats()["bytes"] == entry_size(entry)
+    response = cache.respond(entry[1], None, "gzip")
+    assert gzip.decompress(response.body) == body[::-1]
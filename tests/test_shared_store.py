@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+
+import pytest
+
+from shared_store import MAX_KEY_BYTES, FileLock, SharedParameterStore, encode_key
+
+
+def run_threads(target, args, timeout=30.0):
+    """
+    Run target(arg) for every arg on its own daemon thread.
+
+    A deadlock fails the test instead of hanging it: threads still alive
+    after the timeout are reported as an assertion error.
+    """
+    results = [None] * len(args)
+
+    def run(i):
+        results[i] = target(args[i])
+
+    threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(len(args))]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    assert not any(thread.is_alive() for thread in threads), "threads deadlocked"
+    return results
+
+
+def test_file_lock_excludes_threads(tmp_path):
+    lock = FileLock(str(tmp_path / "test.lock"))
+    inside = []
+    overlaps = []
+
+    def work(_):
+        for _ in range(50):
+            with lock:
+                inside.append(1)
+                if len(inside) > 1:
+                    overlaps.append(1)
+                time.sleep(0.0001)
+                inside.pop()
+
+    run_threads(work, list(range(8)))
+    assert not overlaps
+
+
+def test_file_lock_is_released_after_an_error(tmp_path):
+    lock = FileLock(str(tmp_path / "test.lock"))
+    with pytest.raises(RuntimeError):
+        with lock:
+            raise RuntimeError("boom")
+
+    def enter(_):
+        with lock:
+            return True
+
+    assert run_threads(enter, [None]) == [True]
+
+
+def test_concurrent_puts_keep_the_first_value(tmp_path):
+    store = SharedParameterStore(str(tmp_path / "shared.npy"), capacity=1024)
+    words = [f"word{i}" for i in range(200)]
+
+    def publish(offset):
+        return [store.put(word, (float(i + offset), 0.0, 0.0)) for i, word in enumerate(words)]
+
+    results = run_threads(publish, [0, 1000, 2000, 3000])
+
+    # Every thread sees the value that was published first
+    for word, *values in zip(words, *results):
+        assert len(set(values)) == 1
+        assert store.get(word) == values[0]
+    assert store.stats()["entries"] == len(words)
+
+
+def test_store_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "shared.npy")
+    first = SharedParameterStore(path, capacity=64)
+    first.put("quantum", (1.0, 2.0, 3.0))
+
+    second = SharedParameterStore(path, capacity=64)
+    assert second.get("quantum") == (1.0, 2.0, 3.0)
+    assert second.put("quantum", (9.0, 9.0, 9.0)) == (1.0, 2.0, 3.0)
+    assert second.get("x" * 100) is None
+    assert os.path.exists(str(tmp_path / "shared.lock"))
+
+
+def test_clear_removes_entries(tmp_path):
+    store = SharedParameterStore(str(tmp_path / "shared.npy"), capacity=64)
+    store.put("quantum", (1.0, 2.0, 3.0))
+    store.clear()
+    assert store.get("quantum") is None
+    assert store.stats()["entries"] == 0
+
+
+def test_keys_that_do_not_survive_s64_are_not_stored(tmp_path):
+    store = SharedParameterStore(str(tmp_path / "shared.npy"), capacity=64)
+    longest = "é" * (MAX_KEY_BYTES // 2)
+    for key in ["a\0", "\0", "x" * (MAX_KEY_BYTES + 1), "é" * (MAX_KEY_BYTES // 2 + 1)]:
+        assert encode_key(key) is None
+        for i in range(3):
+            assert store.put(key, (float(i), 0.0, 0.0)) == (float(i), 0.0, 0.0)
+        assert store.get(key) is None
+    assert store.stats()["entries"] == 0
+
+    # Inner NULs and keys of exactly MAX_KEY_BYTES bytes round-trip
+    for key in ["a\0b", longest, ""]:
+        store.put(key, (1.0, 2.0, 3.0))
+        assert store.get(key) == (1.0, 2.0, 3.0)
+    assert store.stats()["entries"] == 3
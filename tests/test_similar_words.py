@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from pattern_embedding_service import PatternEmbeddingService, top_k_blocks
+
+
+@pytest.fixture(scope="module")
+def glove():
+    rng = np.random.default_rng(0)
+    kv = KeyedVectors(300)
+    kv.add_vectors([f"w{i}" for i in range(600)], (rng.standard_normal((600, 300)) * 0.4).astype(np.float32))
+    return kv
+
+
+def make_service(glove, workdir, **kwargs):
+    service = PatternEmbeddingService(
+        num_points=128,
+        cache_file=str(workdir / "parameter_cache.npy"),
+        parameter_table_file=str(workdir / "glove_parameters.npy"),
+        glove=glove,
+        **kwargs
+    )
+    service.load()
+    return service
+
+
+def pairwise(service, word, exclude, top_k):
+    """Reference: quantum_similarity against every cached word."""
+    scores = [(other, service.quantum_similarity(word, other))
+              for other in service.embeddings.keys() if other != word and other not in exclude]
+    scores.sort(key=lambda item: item[1], reverse=True)
+    return scores[:top_k]
+
+
+@pytest.mark.parametrize("mode", ["analytic", "grid"])
+def test_cache_scope_matches_pairwise_similarity(glove, tmp_path, mode):
+    service = make_service(glove, tmp_path, similarity_mode=mode)
+    for word in [f"w{i}" for i in range(300)] + ["unseenword"]:
+        service.quantum_embedding(word)
+
+    for query in ["w3", "w450", "unseenword"]:
+        similar = service.get_similar_words(query, top_k=8, exclude_words=["W10", "w11"], block_size=50)
+        expected = pairwise(service, query, {"w10", "w11"}, 8)
+        assert [item["word"] for item in similar] == [word for word, _ in expected]
+        assert [item["similarity"] for item in similar] == pytest.approx([score for _, score in expected], rel=1e-5)
+
+
+def test_cache_scope_with_an_empty_cache(glove, tmp_path):
+    service = make_service(glove, tmp_path)
+    assert service.get_similar_words("w1", top_k=5) == []
+    assert service.get_similar_words("w1", top_k=0) == []
+
+
+def test_top_k_blocks_skips_excluded_candidates():
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3, 0.8])
+    indices, best = top_k_blocks(lambda start, stop: scores[start:stop].copy(), len(scores), 3, 4,
+                                 np.array([1]))
+    assert indices.tolist() == [5, 3, 2]
+    assert best.tolist() == [0.8, 0.7, 0.5]
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from fidelity import analytic_fidelity
+from similarity_index import INDEX_TYPES, SimilarityIndex, create_index
+
+SIGMA = 1.5
+
+
+def random_params(rng, n):
+    return np.column_stack([rng.uniform(-10, 10, n), rng.uniform(-3, 3, n), rng.uniform(-1, 1, n)]).astype(np.float32)
+
+
+def brute_force(params, keys, query, top_k):
+    scores = analytic_fidelity(params.astype(np.float64), query, SIGMA)
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [(keys[i], pytest.approx(float(scores[i]), rel=1e-5)) for i in order if scores[i] >= 1e-6]
+
+
+@pytest.mark.parametrize("kind", sorted(INDEX_TYPES))
+def test_query_matches_brute_force_after_incremental_adds(kind):
+    rng = np.random.default_rng(0)
+    params = random_params(rng, 3000)
+    keys = [f"w{i}" for i in range(len(params))]
+    index = create_index(kind, sigma=SIGMA)
+    index.build(keys[:2000], params[:2000])
+    for key, row in zip(keys[2000:], params[2000:]):
+        assert index.add(key, row)
+    assert not index.add(keys[0], params[0])
+    assert len(index) == len(keys)
+
+    for query in random_params(rng, 20).astype(np.float64):
+        assert index.query(query, top_k=5) == brute_force(params, keys, query, 5)
+
+
+@pytest.mark.parametrize("kind", sorted(INDEX_TYPES))
+def test_query_excludes_keys(kind):
+    rng = np.random.default_rng(1)
+    params = random_params(rng, 200)
+    keys = [f"w{i}" for i in range(len(params))]
+    index = create_index(kind, sigma=SIGMA)
+    index.build(keys, params)
+
+    best = index.query(params[0], top_k=3)
+    assert best[0][0] == "w0"
+    assert "w0" not in [key for key, _ in index.query(params[0], top_k=3, exclude=["w0"])]
+
+
+@pytest.mark.parametrize("kind", sorted(INDEX_TYPES))
+def test_added_keys_are_capped_oldest_first(kind):
+    index = create_index(kind, sigma=SIGMA, max_added=3)
+    index.build(["a", "b"], np.zeros((2, 3), dtype=np.float32))
+    for i in range(5):
+        assert index.add(f"k{i}", (float(i), 0.0, 0.0))
+
+    assert len(index) == 5
+    assert index.keys[:2] == ["a", "b"] and sorted(index.keys[2:]) == ["k2", "k3", "k4"]
+    assert "k0" not in index and "k4" in index
+    assert index.stats()["evicted"] == 2
+    assert index.query((4.0, 0.0, 0.0), top_k=1) == [("k4", 1.0)]
+    assert "k0" not in [key for key, _ in index.query((0.0, 0.0, 0.0), top_k=10)]
+
+    # An evicted key can come back
+    assert index.add("k0", (0.0, 0.0, 0.0))
+    assert "k1" not in index
+
+
+def test_max_added_zero_disables_inserts():
+    index = create_index("kdtree", sigma=SIGMA, max_added=0)
+    index.build(["a"], np.zeros((1, 3), dtype=np.float32))
+    assert not index.add("b", (1.0, 0.0, 0.0))
+    assert len(index) == 1
+
+
+def test_inserts_do_not_rebuild_the_tree():
+    index = create_index("kdtree", sigma=SIGMA, max_added=10000)
+    index.build(["a"], np.zeros((1, 3), dtype=np.float32))
+    tree = index._tree
+    for i in range(5000):
+        index.add(f"k{i}", (float(i) / 1000.0, 0.0, 0.0))
+    assert index._tree is tree
+
+
+def test_save_and_load_round_trip(tmp_path):
+    rng = np.random.default_rng(2)
+    params = random_params(rng, 100)
+    keys = [f"w{i}" for i in range(len(params))]
+    index = create_index("grid", sigma=SIGMA)
+    index.build(keys, params)
+    index.add("extra", (0.5, 0.5, 0.0))
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+
+    loaded = SimilarityIndex.load(path)
+    assert loaded.kind == "grid"
+    # Added keys are not persisted
+    assert loaded.keys == keys
+    assert np.array_equal(loaded.params, params)
+    assert loaded.fingerprint is None
+
+
+def test_fingerprint_is_saved_with_the_index(tmp_path):
+    index = create_index("kdtree", sigma=SIGMA)
+    index.build(["a", "b"], np.zeros((2, 3), dtype=np.float32))
+    path = str(tmp_path / "index.npz")
+    index.save(path, fingerprint="abc123")
+
+    assert SimilarityIndex.load(path).fingerprint == "abc123"
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        SimilarityIndex(sigma=SIGMA)
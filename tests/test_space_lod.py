@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from space_lod import MAX_LEVEL, SpaceOctree, level_of_detail, morton_codes
+
+
+def interleave(x, y, z):
+    code = 0
+    for bit in range(MAX_LEVEL):
+        code |= ((x >> bit) & 1) << (3 * bit)
+        code |= ((y >> bit) & 1) << (3 * bit + 1)
+        code |= ((z >> bit) & 1) << (3 * bit + 2)
+    return code
+
+
+def test_morton_codes_interleave_the_quantized_axes():
+    rng = np.random.default_rng(0)
+    cells = rng.integers(0, 1 << MAX_LEVEL, size=(100, 3))
+    coords = (cells + 0.5) / (1 << MAX_LEVEL)
+    codes = morton_codes(coords, np.zeros(3), np.ones(3))
+    assert codes.tolist() == [interleave(*map(int, row)) for row in cells]
+
+
+def test_morton_codes_clip_points_outside_the_box():
+    codes = morton_codes(np.array([[-5.0, -5.0, -5.0], [5.0, 5.0, 5.0]]), np.zeros(3), np.ones(3))
+    assert codes.tolist() == [0, (1 << (3 * MAX_LEVEL)) - 1]
+
+
+@pytest.mark.parametrize("level", [0, 1, 3, 6])
+def test_clusters_match_a_brute_force_grid(level):
+    rng = np.random.default_rng(level)
+    coords = rng.uniform(-1, 1, size=(2000, 3))
+    lower, upper = np.full(3, -1.0), np.full(3, 1.0)
+    clusters = SpaceOctree(coords, lower, upper).clusters(level)
+
+    cell_of = np.clip(np.floor((coords - lower) / (upper - lower) * (1 << level)), 0, (1 << level) - 1)
+    cells = {}
+    for i, cell in enumerate(map(tuple, cell_of.astype(int))):
+        cells.setdefault(cell, []).append(i)
+
+    assert clusters["counts"].sum() == len(coords)
+    assert len(clusters["counts"]) == len(cells)
+    expected = sorted((len(members), *coords[members].mean(axis=0).round(9)) for members in cells.values())
+    actual = sorted((int(n), *c.round(9)) for n, c in zip(clusters["counts"], clusters["centroids"]))
+    assert actual == expected
+
+    for centroid, representative in zip(clusters["centroids"], clusters["representatives"]):
+        members = cells[tuple(cell_of[representative].astype(int))]
+        distances = np.sum((coords[members] - centroid) ** 2, axis=1)
+        assert np.isclose(np.sum((coords[representative] - centroid) ** 2), distances.min())
+
+
+def test_choose_level_respects_the_cluster_budget():
+    coords = np.random.default_rng(1).uniform(0, 1, size=(5000, 3))
+    octree = SpaceOctree(coords, np.zeros(3), np.ones(3))
+    level = octree.choose_level(100)
+
+    assert octree.cluster_count(level) <= 100
+    assert octree.cluster_count(level + 1) > 100
+    assert octree.cluster_count(MAX_LEVEL) <= len(coords)
+
+
+def test_small_viewports_return_points():
+    coords = np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [5.0, 5.0, 5.0]])
+    payload = level_of_detail(["a", "b", "c"], coords, bounds=[-1, -1, -1, 2, 2, 2])
+
+    assert payload["mode"] == "points"
+    assert payload["count"] == 2
+    assert payload["points"]["word"] == ["a", "b"]
+    assert payload["points"]["gamma"].tolist() == [0.0, 1.0]
+
+
+def test_large_viewports_return_clusters():
+    coords = np.random.default_rng(2).uniform(-3, 3, size=(3000, 3))
+    keys = [f"w{i}" for i in range(len(coords))]
+    payload = level_of_detail(keys, coords, max_points=200)
+
+    clusters = payload["clusters"]
+    assert payload["mode"] == "clusters"
+    assert payload["count"] == len(keys)
+    assert len(clusters["word"]) == len(clusters["count"]) <= 200
+    assert clusters["count"].sum() == len(keys)
+    assert set(clusters["word"]) <= set(keys)
+
+    fixed = level_of_detail(keys, coords, level=1, max_points=200)
+    assert fixed["level"] == 1
+    assert len(fixed["clusters"]["count"]) <= 8
+
+
+def test_empty_input_and_bad_bounds():
+    payload = level_of_detail([], np.empty((0, 3)))
+    assert payload["mode"] == "points" and payload["count"] == 0
+    with pytest.raises(ValueError):
+        level_of_detail(["a"], np.zeros((1, 3)), bounds=[0, 0, 0])
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from fidelity import analytic_fidelity
+from space_session import SessionFull, SpaceSession, apply_update
+
+SIGMA = 1.5
+
+
+def brute_force_neighbours(session: SpaceSession):
+    """Every member's top-k neighbours recomputed from scratch."""
+    params = session.params[:len(session)]
+    expected = {}
+    for i, word in enumerate(session.words):
+        scores = analytic_fidelity(params, params[i], SIGMA)
+        order = [j for j in np.argsort(-scores, kind="stable") if j != i][:session.top_k]
+        expected[word] = [(session.words[j], pytest.approx(float(scores[j]))) for j in order]
+    return expected
+
+
+def random_params(rng, n):
+    return np.column_stack([rng.uniform(-3, 3, n), rng.uniform(-3, 3, n), rng.uniform(-1, 1, n)])
+
+
+def test_add_and_remove_keep_neighbours_exact():
+    rng = np.random.default_rng(0)
+    session = SpaceSession(SIGMA, top_k=3)
+    words = [f"w{i}" for i in range(40)]
+    apply_update(session, add=words, params=random_params(rng, len(words)))
+
+    for step in range(20):
+        remove = list(rng.choice(session.words, size=3, replace=False))
+        new = [f"n{step}_{i}" for i in range(2)]
+        apply_update(session, add=new, params=random_params(rng, len(new)), remove=remove)
+        assert dict(zip(session.words, session.neighbours)) == brute_force_neighbours(session)
+
+
+def test_delta_reports_final_neighbours():
+    rng = np.random.default_rng(1)
+    session = SpaceSession(SIGMA, top_k=2)
+    apply_update(session, add=["a", "b", "c"], params=random_params(rng, 3))
+
+    delta = apply_update(session, add=["d", "e"], params=random_params(rng, 2), remove=["a"])
+
+    assert delta["removed"] == ["a"]
+    assert [point["word"] for point in delta["added"]] == ["d", "e"]
+    snapshot = session.snapshot()["neighbours"]
+    for point in delta["added"]:
+        assert point["neighbours"] == snapshot[point["word"]]
+    for word, neighbours in delta["updated"].items():
+        assert neighbours == snapshot[word]
+    assert delta["size"] == 4
+
+
+def test_remove_mutual_neighbours_in_one_batch():
+    session = SpaceSession(SIGMA, top_k=2)
+    params = np.array([[0.0, 0.0, 0.0], [0.1, 0.0, 0.0], [2.0, 1.0, 0.0], [2.5, -1.0, 0.0]])
+    apply_update(session, add=["w1", "w2", "w3", "w4"], params=params)
+
+    delta = apply_update(session, remove=["w1", "w2"])
+
+    assert delta["removed"] == ["w1", "w2"]
+    assert set(delta["updated"]) <= {"w3", "w4"}
+    assert sorted(session.words) == ["w3", "w4"]
+    assert dict(zip(session.words, session.neighbours)) == brute_force_neighbours(session)
+
+
+def test_session_full_leaves_session_unchanged():
+    rng = np.random.default_rng(2)
+    session = SpaceSession(SIGMA, top_k=2, max_words=3)
+    apply_update(session, add=["a", "b"], params=random_params(rng, 2))
+    before = session.snapshot()["neighbours"]
+
+    with pytest.raises(SessionFull):
+        apply_update(session, add=["c", "d"], params=random_params(rng, 2))
+
+    assert session.words == ["a", "b"]
+    assert session.snapshot()["neighbours"] == before
+
+
+def test_remove_then_add_same_word_counts_towards_limit():
+    rng = np.random.default_rng(3)
+    session = SpaceSession(SIGMA, top_k=2, max_words=2)
+    apply_update(session, add=["a", "b"], params=random_params(rng, 2))
+
+    delta = apply_update(session, add=["a"], params=random_params(rng, 1), remove=["a"])
+
+    assert delta["removed"] == ["a"]
+    assert [point["word"] for point in delta["added"]] == ["a"]
+    assert len(session) == 2
@@ -0,0 +1,77 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from wavefunction_codec import decode_binary, encode_binary, to_jsonable, wants_binary
+
+
+def test_round_trip_keeps_structure_and_values():
+    payload = {
+        "word": "quantum",
+        "params": {"alpha": np.float64(1.5), "beta": 0.25},
+        "wavefunction": {"real": np.linspace(-1, 1, 7), "imag": np.zeros(7, dtype=np.float32)},
+        "pairs": [np.arange(3, dtype=np.float64), None],
+    }
+    decoded = decode_binary(encode_binary(payload))
+
+    assert decoded["word"] == "quantum"
+    assert decoded["params"] == {"alpha": 1.5, "beta": 0.25}
+    assert decoded["wavefunction"]["real"].dtype == np.float32
+    assert np.allclose(decoded["wavefunction"]["real"], np.linspace(-1, 1, 7))
+    assert np.array_equal(decoded["pairs"][0], [0.0, 1.0, 2.0])
+    assert decoded["pairs"][1] is None
+
+
+def test_integer_arrays_keep_their_dtype_and_exact_values():
+    counts = np.array([1, 2 ** 24 + 1, 2 ** 31 - 1], dtype=np.int64)
+    rows = np.array([0, 4_000_000_000], dtype=np.uint64)
+    decoded = decode_binary(encode_binary({"count": counts, "rows": rows}))
+
+    assert decoded["count"].dtype == np.int32
+    assert decoded["count"].tolist() == counts.tolist()
+    assert decoded["rows"].dtype == np.uint32
+    assert decoded["rows"].tolist() == rows.tolist()
+
+
+def test_boolean_arrays_are_padded_to_keep_alignment():
+    payload = {"mask": np.array([True, False, True]), "values": np.array([3.5, -1.0])}
+    data = encode_binary(payload)
+    (header_length,) = struct.unpack_from("<I", data, 0)
+    header = json.loads(data[4:4 + header_length])
+
+    assert (4 + header_length) % 4 == 0
+    assert header["payload"]["values"]["offset"] % 4 == 0
+    decoded = decode_binary(data)
+    assert decoded["mask"].tolist() == [1, 0, 1]
+    assert decoded["values"].tolist() == [3.5, -1.0]
+
+
+def test_empty_and_multidimensional_arrays_are_flattened():
+    decoded = decode_binary(encode_binary({"empty": np.empty(0), "grid": np.ones((2, 3), dtype=np.int32)}))
+    assert decoded["empty"].size == 0
+    assert decoded["grid"].tolist() == [1] * 6
+
+
+def test_out_of_range_integers_are_rejected():
+    with pytest.raises(ValueError):
+        encode_binary({"big": np.array([2 ** 40])})
+    with pytest.raises(ValueError):
+        encode_binary({"text": np.array(["a", "b"])})
+
+
+def test_to_jsonable_converts_numpy_values():
+    payload = {"a": np.arange(2), "b": (np.float32(0.5), [np.int64(3)])}
+    assert json.dumps(to_jsonable(payload)) == '{"a": [0, 1], "b": [0.5, [3]]}'
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, False),
+    ("application/json", False),
+    ("application/octet-stream", True),
+    ("text/html, application/octet-stream;q=0.5", True),
+    ("application/octet-stream;q=0", False),
+])
+def test_wants_binary(accept, expected):
+    assert wants_binary(accept) is expected
@@ -0,0 +1,166 @@
+"""
+Encoding of service payloads for the HTTP API.
+
+Service methods return payloads whose wavefunction components are NumPy
+arrays. They are sent either as JSON (arrays become lists) or in a compact
+binary format selected through the Accept header:
+
+    uint32 LE   header length H (header is space-padded so the arrays
+                that follow start on a 4-byte boundary)
+    H bytes     UTF-8 JSON: {"payload": ...} where every array is replaced
+                by {"$array": i, "dtype": d, "offset": o, "length": n}
+    ...         array i as n little-endian values of dtype d at byte offset o
+                (relative to the start of the array section), zero-padded
+                to a multiple of 4 bytes
+
+Floating point arrays are sent as "<f4", signed integers as "<i4", unsigned
+integers as "<u4" and booleans as "|u1", so a browser can view each array
+with new Float32Array / Int32Array / Uint32Array / Uint8Array(buffer,
+start + o, n).
+"""
+import json
+import struct
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+BINARY_DTYPES = {"f": "<f4", "i": "<i4", "u": "<u4", "b": "|u1"}
+
+
+def binary_dtype(array: np.ndarray) -> np.dtype:
+    """
+    Wire dtype of an array in the binary format.
+
+    Args:
+        array: Array to encode
+
+    Returns:
+        float32, int32, uint32 or uint8 (for booleans), by the array's kind
+
+    Raises:
+        ValueError: If the array is not numeric or its integers do not fit
+    """
+    code = BINARY_DTYPES.get(array.dtype.kind)
+    if code is None:
+        raise ValueError(f"Cannot encode {array.dtype} arrays in the binary format")
+    dtype = np.dtype(code)
+    if dtype.kind in "iu" and array.size:
+        limits = np.iinfo(dtype)
+        if array.min() < limits.min or array.max() > limits.max:
+            raise ValueError(f"Integer array values do not fit in {dtype}")
+    return dtype
+
+
+def wants_binary(accept: Optional[str]) -> bool:
+    """
+    Whether an Accept header asks for the binary format.
+
+    Args:
+        accept: Value of the Accept request header
+
+    Returns:
+        True if application/octet-stream is listed with a non-zero quality
+    """
+    if not accept:
+        return False
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        if media_type.strip().lower() != BINARY_MEDIA_TYPE:
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def to_jsonable(payload: Any) -> Any:
+    """
+    Convert NumPy arrays and scalars in a payload to plain Python values.
+
+    Args:
+        payload: Nested dicts/lists possibly containing NumPy values
+
+    Returns:
+        Structure that json.dumps can encode
+    """
+    if isinstance(payload, dict):
+        return {key: to_jsonable(value) for key, value in payload.items()}
+    if isinstance(payload, (list, tuple)):
+        return [to_jsonable(value) for value in payload]
+    if isinstance(payload, np.ndarray):
+        return payload.tolist()
+    if isinstance(payload, np.generic):
+        return payload.item()
+    return payload
+
+
+def encode_binary(payload: Dict[str, Any]) -> bytes:
+    """
+    Encode a payload in the binary transport format.
+
+    Args:
+        payload: Nested dicts/lists; NumPy arrays are sent as buffers of
+            their binary_dtype
+
+    Returns:
+        Encoded bytes
+
+    Raises:
+        ValueError: If an array cannot be encoded (see binary_dtype)
+    """
+    buffers: List[bytes] = []
+    offset = 0
+
+    def strip(value: Any) -> Any:
+        nonlocal offset
+        if isinstance(value, dict):
+            return {key: strip(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [strip(item) for item in value]
+        if isinstance(value, np.ndarray):
+            dtype = binary_dtype(value)
+            data = np.ascontiguousarray(value, dtype=dtype).ravel().tobytes()
+            ref = {"$array": len(buffers), "dtype": dtype.str, "offset": offset, "length": value.size}
+            data += b"\0" * (-len(data) % 4)
+            buffers.append(data)
+            offset += len(data)
+            return ref
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    header = json.dumps({"payload": strip(payload)}).encode("utf-8")
+    header += b" " * (-(4 + len(header)) % 4)
+    return struct.pack("<I", len(header)) + header + b"".join(buffers)
+
+
+def decode_binary(data: bytes) -> Dict[str, Any]:
+    """
+    Decode bytes produced by encode_binary.
+
+    Args:
+        data: Encoded bytes
+
+    Returns:
+        Payload with arrays restored as read-only NumPy arrays of their
+        wire dtype (flattened, as they were encoded)
+    """
+    (header_length,) = struct.unpack_from("<I", data, 0)
+    header = json.loads(data[4:4 + header_length].decode("utf-8"))
+    start = 4 + header_length
+
+    def restore(value: Any) -> Any:
+        if isinstance(value, dict):
+            if "$array" in value:
+                dtype = np.dtype(value["dtype"])
+                return np.frombuffer(data, dtype=dtype, count=value["length"], offset=start + value["offset"])
+            return {key: restore(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [restore(item) for item in value]
+        return value
+
+    return restore(header["payload"])